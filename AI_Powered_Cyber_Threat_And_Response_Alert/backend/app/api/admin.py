@@ -0,0 +1,97 @@
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.api.deps import get_current_admin
+from app.db.models import User
+from app.core import profiler
+from app.core.config import settings
+from app.services.ip_reputation import ip_reputation
+from app.services import asset_scanner
+
+router = APIRouter()
+
+
+# ============================================================
+#  SAMPLING PROFILER
+# ============================================================
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Samples every thread of the worker serving this request for `seconds`
+    and returns collapsed stacks (feed to flamegraph.pl or speedscope).
+    """
+    if not 0 < seconds <= profiler.MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {profiler.MAX_PROFILE_SECONDS}]")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+
+    running = profiler.try_start(interval=interval_ms / 1000)
+    if running is None:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+
+    try:
+        # Awaiting (not sleeping a thread) keeps this worker serving traffic while it is sampled
+        await asyncio.sleep(seconds)
+    finally:
+        collapsed = profiler.finish(running)
+
+    profile_id = profiler.save_profile(collapsed)
+    print(f"Profile {profile_id}: {running.sample_count} samples over {seconds}s by {current_user.email}")
+    return PlainTextResponse(collapsed, headers={"X-Profile-Id": profile_id})
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, current_user: User = Depends(get_current_admin)):
+    """Fetches a saved profile, e.g. one captured with the `X-Profile: 1` request header."""
+    collapsed = profiler.load_profile(profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return collapsed
+
+
+# ============================================================
+#  IP REPUTATION LISTS
+# ============================================================
+@router.post("/ip-reputation/reload")
+def reload_ip_reputation(current_user: User = Depends(get_current_admin)):
+    """Reloads the allow/deny lists on this worker now (others pick changes up within IP_REPUTATION_POLL_SECONDS)."""
+    try:
+        return ip_reputation.reload()
+    except Exception as e:
+        print(f"IP reputation reload failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to reload IP reputation lists")
+
+
+@router.get("/ip-reputation/lookup")
+def lookup_ip_reputation(ip: str, current_user: User = Depends(get_current_admin)):
+    verdict = ip_reputation.lookup(ip)
+    if verdict is None:
+        return {"ip": ip, "action": None}
+    return {"ip": ip, "action": verdict.action, "network": verdict.network, "reason": verdict.reason}
+
+
+# ============================================================
+#  ASSET DISCOVERY
+# ============================================================
+@router.post("/assets/scan", status_code=202)
+def start_asset_scan(
+    background_tasks: BackgroundTasks,
+    subnets: str = None,
+    ports: str = None,
+    current_user: User = Depends(get_current_admin)
+):
+    """Starts a sweep now (defaults: ASSET_SCAN_SUBNETS / ASSET_SCAN_PORTS); /api/network/devices shows the result."""
+    try:
+        networks = asset_scanner.parse_subnets(subnets if subnets is not None else settings.ASSET_SCAN_SUBNETS)
+        asset_scanner.parse_ports(ports or settings.ASSET_SCAN_PORTS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not networks:
+        raise HTTPException(status_code=400, detail="No subnets given and ASSET_SCAN_SUBNETS is empty")
+    background_tasks.add_task(asset_scanner.run_scan, subnets, ports)
+    print(f"Asset scan of {[str(n) for n in networks]} started by {current_user.email}")
+    return {"status": "started", "subnets": [str(n) for n in networks]}
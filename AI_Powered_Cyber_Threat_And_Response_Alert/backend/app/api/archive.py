@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from app.api.deps import get_current_user
+from app.db.models import User
+from app.services import alert_archive
+
+router = APIRouter()
+
+# Keeps a single request from decoding the whole archive into one response
+MAX_SEARCH_RESULTS = 5000
+
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    # Query strings may omit the offset; those are taken as UTC, like the stored timestamps
+    if ts is None:
+        return None
+    return ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _window(start: Optional[datetime], end: Optional[datetime]):
+    end = _utc(end) or datetime.now(timezone.utc)
+    start = _utc(start) or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+
+# ============================================================
+#  HISTORICAL SEARCH (Parquet cold archive)
+# ============================================================
+@router.get("/alerts")
+def search_archived_alerts(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    severity: Optional[str] = None,
+    src_ip: Optional[str] = None,
+    attack_cat: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    """Alerts that have aged out of the live table, newest first. Defaults to the last 30 days."""
+    start, end = _window(start, end)
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+    try:
+        return alert_archive.search(
+            current_user.id, start, end, severity=severity, src_ip=src_ip, attack_cat=attack_cat, limit=limit
+        )
+    except Exception as e:
+        print(f"Error searching alert archive: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search alert archive")
+
+
+@router.get("/stats")
+def aggregate_archived_alerts(
+    group_by: str = "severity",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    severity: Optional[str] = None,
+    src_ip: Optional[str] = None,
+    attack_cat: Optional[str] = None,
+    top: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Archived alert counts grouped by severity, prediction, status, src_ip, date, attack_cat or src_country."""
+    start, end = _window(start, end)
+    if group_by not in alert_archive.AGGREGATE_KEYS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(alert_archive.AGGREGATE_KEYS)}")
+    try:
+        buckets = alert_archive.aggregate(
+            current_user.id, start, end, group_by=group_by, severity=severity, src_ip=src_ip,
+            attack_cat=attack_cat, top=top
+        )
+    except Exception as e:
+        print(f"Error aggregating alert archive: {e}")
+        raise HTTPException(status_code=500, detail="Failed to aggregate alert archive")
+    return {"group_by": group_by, "start": start, "end": end, "buckets": buckets}
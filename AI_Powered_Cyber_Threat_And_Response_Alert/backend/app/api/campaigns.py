@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_user
+from app.db.session import get_db
+from app.db.models import Campaign, User
+from app.services import campaigns
+
+router = APIRouter()
+
+MAX_CAMPAIGNS = 500
+
+
+def _serialize(campaign: Campaign) -> dict:
+    return {
+        "id": campaign.id,
+        "prediction": campaign.prediction,
+        "severity": campaign.severity,
+        "status": campaign.status,
+        "alert_count": campaign.alert_count,
+        "sources": campaign.sources or [],
+        "destinations": campaign.destinations or [],
+        "first_seen": campaign.first_seen,
+        "last_seen": campaign.last_seen,
+    }
+
+
+# ============================================================
+#  CAMPAIGNS (alerts correlated at ingest)
+# ============================================================
+@router.get("")
+def list_campaigns(limit: int = 50, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Surviving campaigns (not merged into another), most recently active first."""
+    if not 1 <= limit <= MAX_CAMPAIGNS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_CAMPAIGNS}")
+    try:
+        rows = (
+            db.query(Campaign)
+            .filter(Campaign.user_id == current_user.id, Campaign.merged_into.is_(None))
+            .order_by(Campaign.last_seen.desc())
+            .limit(limit)
+            .all()
+        )
+        return [_serialize(c) for c in rows]
+    except Exception as e:
+        print(f"Error listing campaigns: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/{campaign_id}")
+def get_campaign(campaign_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """One campaign with per-member alert counts (itself plus merged campaigns) and its alert timeline."""
+    campaign = db.query(Campaign).filter(Campaign.id == campaign_id, Campaign.user_id == current_user.id).first()
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    # A merged id resolves to the campaign that absorbed it
+    while campaign.merged_into is not None:
+        campaign = db.get(Campaign, campaign.merged_into)
+    try:
+        detail = _serialize(campaign)
+        detail.update(campaigns.timeline(db, current_user.id, campaign.id))
+        return detail
+    except Exception as e:
+        print(f"Error getting campaign {campaign_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -5,7 +5,8 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db.models import User
 from app.core.config import settings
-from app.core.security import ALGORITHM
+from app.core.security import ALGORITHM, is_admin_email
+from app.core.metrics import STAGE_LATENCY
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -16,7 +17,8 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        with STAGE_LATENCY.time("jwt_decode"):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -24,7 +26,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         print(f"JWT Validation Error: {e}")
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    with STAGE_LATENCY.time("user_lookup"):
+        user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+def get_current_admin(current_user: User = Depends(get_current_user)):
+    if not is_admin_email(current_user.email):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -1,17 +1,32 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from app.api.deps import get_current_user
-from sqlalchemy.orm import Session
+from app.core.config import settings
+from sqlalchemy.orm import Session, undefer
 from sqlalchemy import func
 from app.db.session import get_db
-from app.db.models import Alert, User
-from app.schemas.traffic import TrafficData
+from app.db.models import Alert, Asset, User
+from app.schemas.traffic import TrafficData, RawFlow
 from app.services.ml_service import ml_engine
+from app.services.ip_reputation import ip_reputation
+from app.services.geoip import geoip
+from app.services.flow_features import flow_features
+from app.services.asset_scanner import device_status
+from app.services.campaigns import correlator
+from app.services.source_behavior import source_behavior
+from app.services.explainer import explanations
+from app.services.attack_category import attack_categorizer
+from app.services import alert_export
+from app.services.retrainer import record_feedback
+from app.services.log_analytics import log_analytics, SOURCE_TRAFFIC
+from app.services.security_log import security_log, search as search_security_logs, LEVELS
+from app.core.metrics import STAGE_LATENCY, REPUTATION_VERDICTS
 from app.services.email_service import send_alert_email, send_newsletter_subscription_email, send_mock_sms
 from datetime import datetime, timedelta, timezone
+import ipaddress
 import traceback
-from typing import List
+from typing import List, Optional
 import random
-import uuid
 from pydantic import BaseModel, EmailStr
 
 router = APIRouter()
@@ -22,16 +37,89 @@ router = APIRouter()
 # ============================================================
 @router.get("/alerts")
 @router.get("/alerts")
-def get_alerts(limit: int = 50, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_alerts(limit: int = 50, attack_cat: Optional[str] = None, db: Session = Depends(get_db),
+               current_user: User = Depends(get_current_user)):
     try:
         # Show only alerts belonging to the user
-        alerts = db.query(Alert).filter(Alert.user_id == current_user.id).order_by(Alert.timestamp.desc()).limit(limit).all()
+        query = db.query(Alert).filter(Alert.user_id == current_user.id)
+        if attack_cat:
+            query = query.filter(Alert.attack_cat == attack_cat)
+        alerts = query.order_by(Alert.timestamp.desc()).limit(limit).all()
         return alerts
     except Exception as e:
         print(f"Error getting alerts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch alerts")
 
 
+# ============================================================
+#  ALERT EXPORT (streamed)
+# ============================================================
+@router.get("/alerts/export")
+def export_alerts(
+    format: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    severity: Optional[str] = None,
+    status: Optional[str] = None,
+    attack_cat: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Streams the user's alerts as CSV, NDJSON or Parquet with constant memory, oldest first."""
+    if format not in alert_export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(alert_export.EXPORT_FORMATS)}")
+    media_type, extension = alert_export.EXPORT_FORMATS[format]
+    chunks = alert_export.export_alerts(format, current_user.id, start, end, severity, status, attack_cat)
+    filename = f"alerts_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.{extension}"
+    return StreamingResponse(
+        chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# ============================================================
+#  ALERT EXPLANATIONS (computed when viewed, cached)
+# ============================================================
+MAX_EXPLAIN_BATCH = 200
+
+
+class ExplanationRequest(BaseModel):
+    ids: List[int]
+    top: int = 10
+
+
+def _explain(db: Session, user_id: int, ids: list, top: int) -> dict:
+    if not 1 <= top <= 64:
+        raise HTTPException(status_code=400, detail="top must be between 1 and 64")
+    alerts = (
+        db.query(Alert).options(undefer(Alert.features))
+        .filter(Alert.user_id == user_id, Alert.id.in_(ids))
+        .all()
+    )
+    try:
+        return explanations.get_many(alerts, top=top)
+    except Exception as e:
+        print(f"Error explaining alerts: {e}")
+        raise HTTPException(status_code=500, detail="Failed to explain alerts")
+
+
+@router.get("/alerts/{alert_id}/explanation")
+def explain_alert(alert_id: int, top: int = 10, db: Session = Depends(get_db),
+                  current_user: User = Depends(get_current_user)):
+    """Which features pushed the model towards (positive) or away from (negative) calling this flow an attack."""
+    explained = _explain(db, current_user.id, [alert_id], top)
+    if alert_id not in explained:
+        raise HTTPException(status_code=404, detail="No stored features for this alert (only threat alerts keep them)")
+    return explained[alert_id]
+
+
+@router.post("/alerts/explanations")
+def explain_alerts(request: ExplanationRequest, db: Session = Depends(get_db),
+                   current_user: User = Depends(get_current_user)):
+    """Explanations for a page of alerts, scored as one batch. Alerts without stored features are left out."""
+    if len(request.ids) > MAX_EXPLAIN_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EXPLAIN_BATCH} ids per request")
+    return _explain(db, current_user.id, request.ids, request.top)
+
+
 # ============================================================
 #  REAL-TIME TRAFFIC ANALYSIS
 # ============================================================
@@ -43,44 +131,94 @@ async def analyze_traffic(
     current_user: User = Depends(get_current_user)
 ):
     try:
-        result = ml_engine.predict(data.dict())
+        # Known-good / known-bad ranges skip the forest entirely
+        with STAGE_LATENCY.time("reputation"):
+            verdict = ip_reputation.lookup(data.srcip)
+        if verdict is not None:
+            REPUTATION_VERDICTS.inc(verdict.action)
+            result = verdict.as_result()
+        else:
+            result = ml_engine.predict(data.dict())
+        # Recent activity of this source can raise what a single flow scored
+        with STAGE_LATENCY.time("behavior"):
+            behavior = source_behavior.observe(current_user.id, data.srcip, data.dstip, data.dsport, result['is_threat'])
+            behavior_reason = None
+            if verdict is None:
+                result, behavior_reason = source_behavior.escalate(result, behavior)
+        country, asn = geoip.enrich(data.srcip)
+        now = datetime.now(timezone.utc)
 
         new_alert = Alert(
             src_ip=data.srcip,
+            dst_ip=data.dstip,
             prediction="Attack" if result['is_threat'] else "Normal",
             confidence=result['confidence'],
             severity=result['severity'],
             status="Active" if result['is_threat'] else "Safe",
+            reason=verdict.describe() if verdict else behavior_reason,
+            src_country=country,
+            src_asn=asn,
+            timestamp=now,
             user_id=current_user.id  # Link to User
         )
-        db.add(new_alert)
-        db.commit()
-        db.refresh(new_alert)
+        if result['is_threat']:
+            # Kept for on-demand explanations; normal traffic stores nothing extra
+            features = new_alert.features = data.dict()
+            # Campaign rows are flushed in this transaction and commit with the alert
+            with STAGE_LATENCY.time("correlate"):
+                new_alert.campaign_id = correlator.assign(
+                    db, current_user.id, data.srcip, data.dstip, new_alert.prediction, result['severity'], now
+                )
+        with STAGE_LATENCY.time("db_commit"):
+            db.add(new_alert)
+            db.commit()
+            db.refresh(new_alert)
+        if result['is_threat']:
+            # Categorized in the background in batches; the response does not wait for it
+            attack_categorizer.submit(new_alert.id, now, features)
+            level = "ERROR" if result['severity'] in ["Critical", "High"] else "WARNING"
+            message = f"Threat detected: Attack ({result['severity']}) with {result['confidence']:.2f} confidence."
+        else:
+            level, message = "INFO", f"Traffic classified Normal with {result['confidence']:.2f} confidence."
+        if verdict is not None:
+            message += f" Matched {verdict.describe()}."
+        elif behavior_reason:
+            message += f" {behavior_reason}."
+        security_log.record(
+            level, new_alert.prediction, SOURCE_TRAFFIC, message,
+            user_id=current_user.id, actor="IDS/IPS", ip=data.srcip, trace_id=f"alert-{new_alert.id}"
+        )
 
         if result['is_threat'] and (result['severity'] == "Critical" or result['confidence'] > 0.8):
-            # Fetch subscribed users
-            subscribed_users = db.query(User).filter(User.email_alerts == True).all()
-            recipients = [u.email for u in subscribed_users]
-
-            if recipients:
-                alert_payload = data.dict()
-                alert_payload.update(result)
-                alert_payload['alert_id'] = new_alert.id
-                alert_payload['src_ip'] = data.srcip # Explicitly map for email template
-                background_tasks.add_task(send_alert_email, recipients, alert_payload)
-
-            # --- MOCK SMS NOTIFICATION ---
-            # --- MOCK SMS NOTIFICATION ---
-            # Send ONLY to the current user if they have SMS enabled
-            if current_user.sms_alerts:
-                 sms_msg = f"Alert: {result['prediction']} detected from {data.srcip}. Severity: {result['severity']}."
-                 background_tasks.add_task(send_mock_sms, current_user.email, sms_msg)
+            with STAGE_LATENCY.time("notify_enqueue"):
+                # Fetch subscribed users
+                subscribed_users = db.query(User).filter(User.email_alerts == True).all()
+                recipients = [u.email for u in subscribed_users]
+
+                if recipients:
+                    alert_payload = data.dict()
+                    alert_payload.update(result)
+                    alert_payload['alert_id'] = new_alert.id
+                    alert_payload['src_ip'] = data.srcip # Explicitly map for email template
+                    background_tasks.add_task(send_alert_email, recipients, alert_payload)
+
+                # --- MOCK SMS NOTIFICATION ---
+                # --- MOCK SMS NOTIFICATION ---
+                # Send ONLY to the current user if they have SMS enabled
+                if current_user.sms_alerts:
+                     sms_msg = f"Alert: {result['prediction']} detected from {data.srcip}. Severity: {result['severity']}."
+                     background_tasks.add_task(send_mock_sms, current_user.email, sms_msg)
 
         return {
             "id": new_alert.id,
             "is_threat": result['is_threat'],
             "confidence": result['confidence'],
             "severity": result['severity'],
+            "reason": new_alert.reason,
+            "src_country": country,
+            "src_asn": asn,
+            "campaign_id": new_alert.campaign_id,
+            "behavior": behavior,
             "timestamp": new_alert.timestamp
         }
 
@@ -91,30 +229,57 @@ async def analyze_traffic(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analyze/raw")
+async def analyze_raw_flow(
+    flow: RawFlow,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Like /analyze, but the ct_* window features are computed here from the tenant's recent flows."""
+    with STAGE_LATENCY.time("flow_features"):
+        features = flow_features.extract(current_user.id, flow.model_dump())
+    return await analyze_traffic(TrafficData(**features), background_tasks, db, current_user)
+
+
+@router.post("/flows/features")
+def compute_flow_features(flows: List[RawFlow], current_user: User = Depends(get_current_user)):
+    """Completes a batch of basic flow records (in time order) into full feature vectors."""
+    return [flow_features.extract(current_user.id, flow.model_dump()) for flow in flows]
+
+
 # ============================================================
 #  DASHBOARD STATS
 # ============================================================
 @router.get("/stats")
 @router.get("/stats")
-def get_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_stats(days: Optional[int] = Query(None, ge=1, le=settings.ALERT_RETENTION_DAYS),
+              db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Dashboard counts over the last `days` (STATS_WINDOW_DAYS by default; at most the retention window)."""
     try:
-        # Base query filtered by user
-        base_query = db.query(Alert).filter(Alert.user_id == current_user.id)
-
-        total_scans = base_query.count()
-        total_threats = base_query.filter(Alert.prediction == "Attack").count()
-
-        critical = base_query.filter(Alert.severity == "Critical").count()
-        high = base_query.filter(Alert.severity == "High").count()
-        medium = base_query.filter(Alert.severity == "Medium").count()
-        low = base_query.filter(Alert.severity == "Low").count()
-
-        active = base_query.filter(Alert.status == "Active").count()
-        remediated = base_query.filter(Alert.status == "Remediated").count()
+        days = days or settings.STATS_WINDOW_DAYS
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        # One grouped pass; the timestamp predicate prunes partitions outside the window
+        rows = (
+            db.query(Alert.prediction, Alert.severity, Alert.status, func.count(Alert.id))
+            .filter(Alert.user_id == current_user.id, Alert.timestamp >= since)
+            .group_by(Alert.prediction, Alert.severity, Alert.status)
+            .all()
+        )
+        total_scans = sum(n for *_, n in rows)
+        total_threats = sum(n for prediction, _, _, n in rows if prediction == "Attack")
+        severity = {}
+        status = {}
+        for _, sev, st, n in rows:
+            severity[sev] = severity.get(sev, 0) + n
+            status[st] = status.get(st, 0) + n
+        critical, high, medium, low = (severity.get(s, 0) for s in ("Critical", "High", "Medium", "Low"))
+        active, remediated = status.get("Active", 0), status.get("Remediated", 0)
 
         return {
             "total_scans": total_scans,
             "total_threats": total_threats,
+            "window_days": days,
             "severity_distribution": [
                 {"name": "Critical", "value": critical, "color": "#ef4444"},
                 {"name": "High", "value": high, "color": "#f97316"},
@@ -154,7 +319,7 @@ def get_remediation_tasks(db: Session = Depends(get_db)):
                 playbook = "WAF Rate Limiting"
 
             # Status logic
-            if alert.status in ["Remediated", "Safe"]:
+            if alert.status in ["Remediated", "Safe", "False Positive"]:
                 task_status = "Completed"
                 progress = 100
                 duration = "45s"
@@ -184,38 +349,28 @@ def get_remediation_tasks(db: Session = Depends(get_db)):
 
 # --- NEW ENDPOINT: NETWORK DEVICES ---
 @router.get("/network/devices")
-def get_network_devices():
+def get_network_devices(db: Session = Depends(get_db)):
     """
-    Returns a simulated list of network assets with dynamic statuses 
-    to mimic real-time health monitoring.
+    Returns the asset inventory from the last background sweep
+    (app/services/asset_scanner.py). Reading it never triggers a scan.
     """
     try:
-        # Base list of devices
-        devices = [
-            {"ip": "192.168.1.1", "hostname": "Gateway-Main", "type": "Gateway", "os": "Cisco IOS", "ports": [80, 443, 22]},
-            {"ip": "192.168.1.10", "hostname": "File-Server-01", "type": "Server", "os": "Ubuntu 22.04", "ports": [22, 445, 8080]},
-            {"ip": "192.168.1.45", "hostname": "Dev-Workstation", "type": "Desktop", "os": "Windows 11", "ports": [3389]},
-            {"ip": "192.168.1.102", "hostname": "Smart-Thermostat", "type": "IoT", "os": "Embedded Linux", "ports": [23, 80]},
-            {"ip": "192.168.1.15", "hostname": "Database-Prod", "type": "Server", "os": "RHEL 9", "ports": [5432]},
-            {"ip": "192.168.1.200", "hostname": "Guest-Mobile", "type": "Mobile", "os": "Android 14", "ports": []},
+        assets = db.query(Asset).all()
+        assets.sort(key=lambda a: (not a.is_up, ipaddress.ip_address(a.ip)))
+        return [
+            {
+                "ip": a.ip,
+                "hostname": a.hostname or a.ip,
+                "type": a.type,
+                "os": a.os,
+                "ports": a.ports or [],
+                "status": device_status(a),
+                "latency": f"{a.latency_ms:.0f}ms" if a.is_up and a.latency_ms is not None else "-",
+                "last_seen": a.last_seen,
+            }
+            for a in assets
         ]
 
-        # Add dynamic status (Simulation)
-        for device in devices:
-            # Randomly assign status
-            rand = random.random()
-            if rand > 0.9:
-                device["status"] = "Critical"
-            elif rand > 0.7:
-                device["status"] = "Warning"
-            else:
-                device["status"] = "Safe"
-                
-            # Randomly add "latency" or extra fields if needed
-            device["latency"] = f"{random.randint(2, 50)}ms"
-
-        return devices
-
     except Exception as e:
         print(f"Error fetching network devices: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch network devices")
@@ -247,62 +402,17 @@ async def subscribe_newsletter(
 
 # --- NEW ENDPOINT: LOG ANALYTICS ---
 @router.get("/logs/stats")
-def get_log_stats():
+def get_log_stats(current_user: User = Depends(get_current_user)):
     """
-    Returns dynamic statistics for the Log Analysis dashboard:
-    - Time-series histogram data
+    Statistics for the Log Analysis dashboard, read from the streaming
+    summaries in app/services/log_analytics.py (no table scan):
+    - 24h histogram with anomalous hours flagged
     - Log source distribution
-    - Top talkers (IPs)
+    - Top talkers (IPs) and distinct source count
     - Summary counts
     """
     try:
-        # 1. Simulate Time Series Data (24h)
-        # We regenerate this to simulate 'live' changes in the last hour
-        histogram = []
-        for i in range(24):
-            base_value = 500 if i < 8 else 1500 # Lower at night
-            noise = random.randint(-200, 300)
-            value = max(100, base_value + noise)
-            
-            # Simulate random anomalies
-            is_anomaly = False
-            if random.random() > 0.95:
-                value += 2000
-                is_anomaly = True
-                
-            histogram.append({
-                "label": f"{i:02}:00",
-                "value": value,
-                "isAnomaly": is_anomaly
-            })
-
-        # 2. Simulate Source Distribution
-        total_events = sum(d["value"] for d in histogram)
-        sources = [
-            {"label": "Firewall Logs", "count": int(total_events * 0.45), "color": "bg-orange-500"},
-            {"label": "Auth / Identity", "count": int(total_events * 0.25), "color": "bg-purple-500"},
-            {"label": "System / OS", "count": int(total_events * 0.20), "color": "bg-blue-500"},
-            {"label": "Database", "count": int(total_events * 0.10), "color": "bg-emerald-500"},
-        ]
-
-        # 3. Top Talkers+
-        talkers = [
-            {"ip": "192.168.140.253", "country": "Internal", "requests": random.randint(12000, 16000), "risk": "High"},
-            {"ip": "45.22.19.112", "country": "Russia", "requests": random.randint(6000, 9000), "risk": "Critical"},
-            {"ip": "10.0.0.55", "country": "Internal", "requests": random.randint(4000, 7000), "risk": "Low"},
-            {"ip": "203.0.113.44", "country": "China", "requests": random.randint(2000, 5000), "risk": "Medium"},
-            {"ip": "172.16.20.5", "country": "Internal", "requests": random.randint(1000, 3000), "risk": "Low"},
-        ]
-
-        return {
-            "total_events": total_events,
-            "data_ingested": f"{round(total_events * 0.0005, 2)} GB", # Approximate size
-            "anomalies": len([h for h in histogram if h["isAnomaly"]]),
-            "histogram": histogram,
-            "sources": sources,
-            "top_talkers": sorted(talkers, key=lambda x: x['requests'], reverse=True)
-        }
-
+        return log_analytics.snapshot(current_user.id)
     except Exception as e:
         print(f"Error fetching log stats: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch log stats")
@@ -340,14 +450,17 @@ def execute_playbook(db: Session = Depends(get_db)):
 #  NEW ENDPOINT: REMEDIATION ACTIONS
 # ============================================================
 @router.post("/remediations/{id}/action")
-def remediation_action(id: int, action_data: RemediationAction, db: Session = Depends(get_db)):
+def remediation_action(id: int, action_data: RemediationAction, db: Session = Depends(get_db),
+                       current_user: User = Depends(get_current_user)):
+    # Own alerts, or unowned playbook tasks (/remediations/execute)
+    alert = db.query(Alert).filter(
+        Alert.id == id, (Alert.user_id == current_user.id) | Alert.user_id.is_(None)
+    ).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="Task not found")
     try:
-        alert = db.query(Alert).filter(Alert.id == id).first()
-        if not alert:
-            raise HTTPException(status_code=404, detail="Task not found")
-
         action = action_data.action
-        
+
         if action == "Approve":
             alert.status = "Remediated"
         elif action == "Retry":
@@ -356,7 +469,11 @@ def remediation_action(id: int, action_data: RemediationAction, db: Session = De
             alert.status = "Active" # Rollback to active
         elif action == "Stop":
             alert.status = "Safe" # Mark as safe/stopped
-            
+        elif action == "FalsePositive":
+            alert.status = "False Positive" # Analyst verdict: the flow was benign
+
+        # Approve/FalsePositive are analyst verdicts; they feed the next feedback retrain
+        record_feedback(db, alert, action)
         db.commit()
         return {"message": f"Action {action} performed successfully", "status": alert.status}
     except Exception as e:
@@ -399,55 +516,49 @@ def get_remediation_logs(id: int):
 #  GET SECURITY LOGS (GENERAL)
 # ============================================================
 @router.get("/logs")
-def get_security_logs(limit: int = 100, db: Session = Depends(get_db)):
+def get_security_logs(
+    response: Response,
+    limit: int = 100,
+    q: Optional[str] = None,
+    level: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Security log search, newest first. `q` is full-text over event, message,
+    IP and actor. Pass the `X-Next-Cursor` response header back as `cursor`
+    for the next page.
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    if level and level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {', '.join(LEVELS)}")
     try:
-        # For now, we can reuse the alerts table or create a separate logs table.
-        # Since we don't have a dedicated logs table in the provided context, 
-        # we will simulate logs based on alerts + some random system events.
-        
-        alerts = db.query(Alert).order_by(Alert.timestamp.desc()).limit(limit).all()
-        logs = []
-        
-        for alert in alerts:
-            logs.append({
-                "id": f"log-{alert.id}",
-                "timestamp": alert.timestamp,
-                "level": "ERROR" if alert.severity in ["Critical", "High"] else "WARNING",
-                "event": alert.prediction,
-                "source": "IDS/IPS",
-                "user": "System",
-                "ip": alert.src_ip,
-                "message": f"Threat detected: {alert.prediction} with {alert.confidence} confidence.",
-                "trace_id": str(uuid.uuid4())
-            })
-            
-        # Add some simulated INFO/SUCCESS logs
-        base_time = datetime.now(timezone.utc)
-        system_events = [
-            ("INFO", "User Login", "Auth", "admin", "192.168.1.10"),
-            ("SUCCESS", "Backup Completed", "System", "backup-service", "localhost"),
-            ("INFO", "Health Check", "Monitor", "system", "localhost"),
-            ("WARNING", "High CPU Usage", "System", "kernel", "localhost"),
-        ]
-        
-        for i in range(20):
-            level, event, source, user, ip = random.choice(system_events)
-            logs.append({
-                "id": f"sys-{i}",
-                "timestamp": base_time - timedelta(minutes=random.randint(1, 60)),
-                "level": level,
-                "event": event,
-                "source": source,
-                "user": user,
-                "ip": ip,
-                "message": f"{event} event recorded.",
-                "trace_id": str(uuid.uuid4())
-            })
-            
-        # Sort by timestamp desc
-        logs.sort(key=lambda x: x['timestamp'], reverse=True)
-        return logs[:limit]
-
+        rows, next_cursor = search_security_logs(
+            db, current_user.id, q=q, level=level, start=start, end=end, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         print(f"Error fetching security logs: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch security logs")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to fetch security logs")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        {
+            "id": f"log-{row.id}",
+            "timestamp": row.timestamp,
+            "level": row.level,
+            "event": row.event,
+            "source": row.source,
+            "user": row.actor,
+            "ip": row.ip,
+            "message": row.message,
+            "trace_id": row.trace_id,
+        }
+        for row in rows
+    ]
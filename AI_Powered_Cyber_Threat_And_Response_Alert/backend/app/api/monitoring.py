@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
+from app.core.metrics import REGISTRY
+from app.services.ml_service import ml_engine
+from app.services.drift import drift_monitor
+
+router = APIRouter()
+
+
+# ============================================================
+#  PROMETHEUS METRICS
+# ============================================================
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Per-worker metrics in Prometheus text format: HTTP latency/status per
+    route, analyze pipeline stage latencies, inference batch sizes and cache
+    hit/miss counters.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# ============================================================
+#  READINESS
+# ============================================================
+@router.get("/ready")
+def readiness(request: Request):
+    """
+    200 once this worker has a current schema and warmed models, 503 before.
+    Point the load balancer / autoscaler health check here; "/" stays the liveness probe.
+    """
+    checks = {
+        "migrations": bool(getattr(request.app.state, "migrations_ready", False)),
+        "models": ml_engine.ready,
+    }
+    body = {
+        "status": "ready" if all(checks.values()) else "warming_up",
+        "checks": checks,
+        "model_version": ml_engine.version,
+        "model_load_seconds": ml_engine.load_seconds,
+    }
+    return JSONResponse(body, status_code=200 if all(checks.values()) else 503)
+
+
+# ============================================================
+#  FEATURE DRIFT
+# ============================================================
+@router.get("/model/drift")
+def feature_drift():
+    """
+    This worker's live model inputs vs the training baseline: PSI (and KS for
+    numeric features) per feature, worst first. The same values are exported
+    as model_feature_psi / model_feature_ks on /metrics.
+    """
+    try:
+        return drift_monitor.report()
+    except Exception as e:
+        print(f"Error computing drift report: {e}")
+        return JSONResponse({"detail": "Failed to compute drift report"}, status_code=500)
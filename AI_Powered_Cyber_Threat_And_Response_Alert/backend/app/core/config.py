@@ -12,6 +12,83 @@ class Settings(BaseSettings):
     MAIL_PORT: int = 587
     MAIL_SERVER: str = "smtp.gmail.com"
 
+    # Startup
+    RUN_MIGRATIONS_ON_STARTUP: bool = True  # Disable when a deploy step runs `python -m app.db.migrations`
+
+    # Alert Retention / Partitioning
+    ALERT_PARTITION_INTERVAL: str = "day"  # "day" or "week" (PostgreSQL partitions)
+    ALERT_PARTITIONS_AHEAD: int = 3  # Future partitions kept ready
+    ALERT_RETENTION_DAYS: int = 90  # Hot table window; older alerts move to the archive
+    ALERT_MAINTENANCE_INTERVAL_MINUTES: int = 60
+    ALERT_ARCHIVE_ENABLED: bool = True  # Copy expired alerts to Parquet before dropping them
+    ALERT_ARCHIVE_DIR: str = "archive/alerts"
+    ALERT_ARCHIVE_RETENTION_DAYS: int = 365
+    STATS_WINDOW_DAYS: int = 30  # /api/stats counts alerts this recent; keeps the query on the newest partitions
+
+    # Security Log / Log Analytics
+    SECURITY_LOG_FLUSH_SECONDS: float = 1.0  # Queued events are written in one batch this often
+    LOG_STATS_RESYNC_MINUTES: int = 0  # 0: build /api/logs/stats sketches from the log table at startup only; set it with several workers
+
+    # IP Reputation (CIDR per line, optional reason after it)
+    IP_ALLOWLIST_PATH: str = "data/ip_allowlist.txt"
+    IP_DENYLIST_PATH: str = "data/ip_denylist.txt"
+    IP_REPUTATION_POLL_SECONDS: int = 30  # Reload when either file's mtime changes
+
+    # GeoIP / ASN enrichment (build with `python -m app.services.geoip build ...`)
+    GEOIP_DB_PATH: str = "data/geoip.bin"
+    GEOIP_CACHE_SIZE: int = 65536  # LRU entries per worker
+    GEOIP_POLL_SECONDS: int = 60  # Remap when the file is replaced
+
+    # Per-Source Behavior (severity escalation from recent activity of a source IP)
+    SOURCE_MAX_TRACKED: int = 100000  # LRU bound per worker, about 500 bytes each
+    SOURCE_HALF_LIFE_SECONDS: float = 300  # Decay of flow/threat counts; distinct hosts/ports cover 1-2 of these
+    SOURCE_SCAN_PORTS: int = 20  # Distinct destination ports that make a source a port scanner
+    SOURCE_SCAN_HOSTS: int = 30  # Distinct destination hosts that make an attacking source a sweep
+    SOURCE_REPEAT_THREATS: float = 5  # Decayed threat count that raises severity one level
+    SOURCE_SNAPSHOT_PATH: str = "data/source_behavior.bin"
+    SOURCE_SNAPSHOT_SECONDS: int = 60
+
+    # Model Registry (versions published by ml_engine/train.py --publish)
+    MODEL_VERSION: str = ""  # Empty: registry/CURRENT, or the flat files in ml_engine/models without a registry
+    MODEL_POLL_SECONDS: int = 60  # Workers check registry/CURRENT this often and swap in a newly promoted version
+
+    # Feedback Retraining (analyst verdicts -> warm-started trees, see app/services/retrainer.py)
+    RETRAIN_INTERVAL_MINUTES: int = 60
+    RETRAIN_MIN_FEEDBACK: int = 200  # New labeled alerts needed before a retrain runs
+    RETRAIN_WINDOW: int = 20000  # Most recent labeled alerts a retrain fits on
+    RETRAIN_TREES: int = 20  # Trees fitted on the window; they replace the previous round's
+    RETRAIN_PROMOTE: bool = False  # Serve the new version automatically if it passes both checks below
+    RETRAIN_TEST_ROWS: int = 100000  # Rows of the original test split (ml_engine/models/encoded/test) checked
+    RETRAIN_MAX_TEST_DROP: float = 0.001  # Largest test-split accuracy loss vs the served model that still promotes
+
+    # Feature Drift (live model inputs vs the training baseline)
+    DRIFT_BASELINE_PATH: str = ""  # Empty: drift_baseline.json next to the model
+    DRIFT_BATCH: int = 256  # Scored rows buffered per vectorized histogram update
+    DRIFT_HALF_LIFE_FLOWS: int = 50000  # Older rows fade out of the live histograms
+    DRIFT_MIN_ROWS: int = 1000  # Below this the report says "warming_up"
+
+    # Attack Categorization (second stage, flagged flows only)
+    ATTACK_CATEGORY_BATCH: int = 64  # Alerts scored per predict_proba call
+    ATTACK_CATEGORY_MAX_WAIT_MS: int = 200  # Longest a queued alert waits for its batch to fill
+    ATTACK_CATEGORY_QUEUE_SIZE: int = 10000  # Beyond this, alerts are left uncategorized instead of slowing ingest
+
+    # Explanations (per-feature contributions for an alert's model score)
+    EXPLANATION_CACHE_SIZE: int = 10000  # Explained alerts kept per worker
+
+    # Alert Correlation
+    CAMPAIGN_WINDOW_MINUTES: int = 30  # Attacks sharing an IP this close together join one campaign
+
+    # Asset Discovery (TCP connect sweep of our own networks)
+    ASSET_SCAN_SUBNETS: str = ""  # Comma separated CIDRs, e.g. "192.168.1.0/24,10.20.0.0/16"; empty disables
+    ASSET_SCAN_PORTS: str = "22,23,80,443,445,3389,5432,8080"
+    ASSET_SCAN_CONCURRENCY: int = 1024  # Open connections at once (capped below the fd limit)
+    ASSET_SCAN_TIMEOUT_SECONDS: float = 0.5  # Per probe; silent hosts cost this much
+    ASSET_SCAN_INTERVAL_MINUTES: int = 30
+
+    # Admin / Operations
+    ADMIN_EMAILS: str = ""  # Comma separated; these users may call /admin endpoints
+    PROFILE_DIR: str = "profiles"  # Collapsed-stack output from the sampling profiler
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,177 @@
+"""
+On-demand sampling profiler for live workers.
+
+A background thread wakes every `interval` seconds, reads every thread's
+current Python stack via sys._current_frames() and counts identical stacks.
+The output is Brendan Gregg's collapsed format ("root;caller;callee 42"),
+which flamegraph.pl, speedscope and inferno all read directly.
+
+Nothing runs while idle: the sampler thread only exists for the duration
+of a profile, and only one profile runs per worker at a time.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from jose import jwt, JWTError
+
+from app.core.config import settings
+from app.core.security import ALGORITHM, is_admin_email
+
+MAX_PROFILE_SECONDS = 120
+DEFAULT_INTERVAL = 0.005  # 200 Hz
+PROFILE_HEADER = b"x-profile"
+
+# One profile per worker at a time; a second caller gets "busy" instead of doubling the overhead
+_profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            parts = code.co_filename.replace("\\", "/").split("/")
+            label = f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for tid, frame in sys._current_frames().items():
+            if tid == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(tid, f"thread-{tid}"))
+            stack.reverse()
+            self.samples[";".join(stack)] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def try_start(interval: float = DEFAULT_INTERVAL):
+    """Returns a running profiler, or None if this worker is already profiling."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    return profiler
+
+
+def finish(profiler: SamplingProfiler) -> str:
+    try:
+        return profiler.stop()
+    finally:
+        _profile_lock.release()
+
+
+# ============================================================
+#  STORAGE (shared by all workers on the host)
+# ============================================================
+def new_profile_id() -> str:
+    return f"{int(time.time())}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def save_profile(collapsed: str, profile_id: str = None) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile_id = profile_id or new_profile_id()
+    with open(os.path.join(settings.PROFILE_DIR, f"{profile_id}.collapsed"), "w") as f:
+        f.write(collapsed)
+    return profile_id
+
+
+def load_profile(profile_id: str):
+    # Ids are generated above; refuse anything that could walk out of PROFILE_DIR
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = os.path.join(settings.PROFILE_DIR, f"{profile_id}.collapsed")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
+
+
+# ============================================================
+#  PER-REQUEST PROFILING
+# ============================================================
+def _is_admin_request(headers) -> bool:
+    auth = headers.get(b"authorization", b"").decode()
+    if not auth.lower().startswith("bearer "):
+        return False
+    try:
+        payload = jwt.decode(auth[7:], settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    return is_admin_email(payload.get("sub"))
+
+
+class ProfileRequestMiddleware:
+    """
+    Profiles a single request when it carries `X-Profile: 1` and an admin
+    bearer token. The collapsed stacks are saved under PROFILE_DIR and the
+    response carries `X-Profile-Id` for GET /admin/profiles/{id}.
+    Requests without the header only pay for one header scan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true") or not _is_admin_request(headers):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = try_start(interval=0.001)
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Response headers are sent before the body finishes, so the profile id is reserved up front
+        profile_id = new_profile_id()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            save_profile(finish(profiler), profile_id)
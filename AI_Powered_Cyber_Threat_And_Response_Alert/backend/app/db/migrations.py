@@ -0,0 +1,198 @@
+"""
+Versioned schema migrations.
+
+Each migration runs exactly once per database and is recorded in
+`schema_migrations`. Workers check the recorded version first and only take
+the lock when something is pending, so a fleet of workers booting together
+costs one indexed SELECT each. On PostgreSQL the apply step is serialized
+with a session-level advisory lock; SQLite is single-writer already.
+
+Run ahead of a deploy with:
+    python -m app.db.migrations
+"""
+from datetime import datetime, timezone
+from sqlalchemy import inspect, text
+from app.db.session import engine, Base
+
+# Arbitrary constant identifying this app's migration lock in pg_locks
+ADVISORY_LOCK_KEY = 727_001
+
+
+def add_column_if_missing(connection, table: str, column: str, ddl: str):
+    """Portable `ALTER TABLE ... ADD COLUMN IF NOT EXISTS` (SQLite lacks IF NOT EXISTS)."""
+    existing = {c["name"] for c in inspect(connection).get_columns(table)}
+    if column not in existing:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# ============================================================
+#  MIGRATIONS (append only - never edit an applied one)
+# ============================================================
+def _create_base_tables(connection):
+    # Import here so every model module is registered on Base.metadata
+    from app.db import models  # noqa: F401
+    Base.metadata.create_all(bind=connection)
+
+
+def _user_profile_columns(connection):
+    # Columns that used to be added by the ad-hoc startup ALTERs
+    add_column_if_missing(connection, "users", "avatar", "VARCHAR")
+    add_column_if_missing(connection, "users", "mfa_enabled", "BOOLEAN DEFAULT FALSE")
+    add_column_if_missing(connection, "users", "api_key", "VARCHAR")
+    add_column_if_missing(connection, "users", "email_alerts", "BOOLEAN DEFAULT TRUE")
+    add_column_if_missing(connection, "users", "sms_alerts", "BOOLEAN DEFAULT FALSE")
+    add_column_if_missing(connection, "users", "weekly_reports", "BOOLEAN DEFAULT TRUE")
+    add_column_if_missing(connection, "users", "mfa_secret", "VARCHAR")
+
+
+def _partition_alerts(connection):
+    if connection.dialect.name == "postgresql":
+        from app.db.partitions import convert_alerts_to_partitioned
+        convert_alerts_to_partitioned(connection)
+    else:
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_user_ts ON alerts (user_id, timestamp)"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_timestamp ON alerts (timestamp)"))
+
+
+def _security_log_store(connection):
+    from app.db.models import SecurityLog
+    SecurityLog.__table__.create(bind=connection, checkfirst=True)
+
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(
+            "ALTER TABLE security_logs ADD COLUMN IF NOT EXISTS search tsvector GENERATED ALWAYS AS ("
+            "to_tsvector('simple', coalesce(event, '') || ' ' || coalesce(message, '') || ' ' "
+            "|| coalesce(ip, '') || ' ' || coalesce(actor, ''))) STORED"
+        ))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_security_logs_search ON security_logs USING GIN (search)"))
+    else:
+        # External-content FTS5 index kept in sync by triggers (the table is append-only)
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS security_logs_fts USING fts5("
+            "event, message, ip, actor, content='security_logs', content_rowid='id')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS security_logs_ai AFTER INSERT ON security_logs BEGIN "
+            "INSERT INTO security_logs_fts (rowid, event, message, ip, actor) "
+            "VALUES (new.id, new.event, new.message, new.ip, new.actor); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS security_logs_ad AFTER DELETE ON security_logs BEGIN "
+            "INSERT INTO security_logs_fts (security_logs_fts, rowid, event, message, ip, actor) "
+            "VALUES ('delete', old.id, old.event, old.message, old.ip, old.actor); END"
+        ))
+
+
+def _alert_reason_column(connection):
+    add_column_if_missing(connection, "alerts", "reason", "VARCHAR")
+
+
+def _alert_geo_columns(connection):
+    add_column_if_missing(connection, "alerts", "src_country", "VARCHAR(2)")
+    add_column_if_missing(connection, "alerts", "src_asn", "INTEGER")
+
+
+def _asset_inventory(connection):
+    from app.db.models import Asset
+    Asset.__table__.create(bind=connection, checkfirst=True)
+
+
+def _alert_campaigns(connection):
+    from app.db.models import Campaign
+    Campaign.__table__.create(bind=connection, checkfirst=True)
+    add_column_if_missing(connection, "alerts", "dst_ip", "VARCHAR")
+    add_column_if_missing(connection, "alerts", "campaign_id", "INTEGER")
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_campaign_id ON alerts (campaign_id)"))
+
+
+def _alert_features(connection):
+    add_column_if_missing(connection, "alerts", "features", "JSON")
+
+
+def _alert_attack_category(connection):
+    add_column_if_missing(connection, "alerts", "attack_cat", "VARCHAR")
+    add_column_if_missing(connection, "alerts", "attack_cat_confidence", "FLOAT")
+
+
+def _alert_feedback(connection):
+    from app.db.models import AlertFeedback
+    AlertFeedback.__table__.create(bind=connection, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, "create_base_tables", _create_base_tables),
+    (2, "user_profile_columns", _user_profile_columns),
+    (3, "partition_alerts_by_time", _partition_alerts),
+    (4, "security_log_store", _security_log_store),
+    (5, "alert_reason_column", _alert_reason_column),
+    (6, "alert_geo_columns", _alert_geo_columns),
+    (7, "asset_inventory", _asset_inventory),
+    (8, "alert_campaigns", _alert_campaigns),
+    (9, "alert_features", _alert_features),
+    (10, "alert_attack_category", _alert_attack_category),
+    (11, "alert_feedback", _alert_feedback),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ============================================================
+#  RUNNER
+# ============================================================
+def _ensure_version_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " name VARCHAR NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL)"
+    ))
+    connection.commit()
+
+
+def current_version(connection) -> int:
+    if not inspect(connection).has_table("schema_migrations"):
+        return 0
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def run_migrations(bind=None) -> int:
+    """Applies pending migrations and returns how many ran (0 on the fast path)."""
+    bind = bind or engine
+    is_postgres = bind.dialect.name == "postgresql"
+
+    with bind.connect() as connection:
+        if current_version(connection) >= LATEST_VERSION:
+            return 0
+
+        if is_postgres:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            connection.commit()
+        try:
+            _ensure_version_table(connection)
+            # Re-read under the lock: another worker may have finished while we waited
+            applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+            ran = 0
+            for version, name, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                print(f"Applying migration {version}: {name}")
+                migrate(connection)
+                connection.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": datetime.now(timezone.utc)},
+                )
+                connection.commit()
+                ran += 1
+            print(f"Database schema at version {LATEST_VERSION} ({ran} migration(s) applied).")
+            return ran
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            if is_postgres:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                connection.commit()
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, JSON
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -36,7 +37,113 @@ class Alert(Base):
     confidence = Column(Float)
     severity = Column(String)
     status = Column(String, default="Active")
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Partition key on PostgreSQL (see app/db/partitions.py)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     # Link to User
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
\ No newline at end of file
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    # Why the verdict was reached without the model, e.g. "denylist 203.0.113.0/24 (tor exit)"
+    reason = Column(String, nullable=True)
+
+    # Offline GeoIP/ASN enrichment of src_ip at ingest (app/services/geoip.py)
+    src_country = Column(String(2), nullable=True)
+    src_asn = Column(Integer, nullable=True)
+
+    dst_ip = Column(String, nullable=True)
+    # Set at ingest by the correlator (app/services/campaigns.py); may point at a merged campaign
+    campaign_id = Column(Integer, nullable=True, index=True)
+
+    # Model input of threat alerts, for on-demand explanations (app/services/explainer.py).
+    # Deferred: listing alerts neither loads nor returns it
+    features = deferred(Column(JSON, nullable=True))
+
+    # Second-stage category of threat alerts, filled in shortly after ingest (app/services/attack_category.py)
+    attack_cat = Column(String, nullable=True)
+    attack_cat_confidence = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # Serves "latest alerts for this user" with one ordered index scan per partition
+        Index("ix_alerts_user_ts", "user_id", "timestamp"),
+    )
+
+
+class SecurityLog(Base):
+    """Append-only security event log (auth events, detections). Searchable via FTS, see migration 4."""
+    __tablename__ = "security_logs"
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    level = Column(String, nullable=False)    # INFO | SUCCESS | WARNING | ERROR
+    event = Column(String, nullable=False)    # e.g. "Login Failed", "Attack"
+    source = Column(String, nullable=False)   # e.g. "Auth / Identity", "Traffic Analysis"
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    actor = Column(String, nullable=True)
+    ip = Column(String, nullable=True)
+    message = Column(String, nullable=True)
+    trace_id = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination: newest (highest id) first within a tenant
+        Index("ix_security_logs_user_id", "user_id", "id"),
+        Index("ix_security_logs_timestamp", "timestamp"),
+    )
+
+
+class Asset(Base):
+    """Network inventory, written by the asset scanner (app/services/asset_scanner.py)."""
+    __tablename__ = "assets"
+    id = Column(Integer, primary_key=True)
+    ip = Column(String, unique=True, nullable=False)
+    hostname = Column(String, nullable=True)
+    type = Column(String, nullable=True)         # Gateway | Server | Desktop | IoT | Unknown
+    os = Column(String, nullable=True)           # best guess from the open ports
+    ports = Column(JSON, nullable=False, default=list)
+    latency_ms = Column(Float, nullable=True)    # TCP connect round trip of the fastest probe
+    is_up = Column(Boolean, default=True)        # answered in the most recent sweep of its subnet
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+
+
+class Campaign(Base):
+    """
+    A cluster of related attack alerts. When two campaigns turn out to be one,
+    the smaller gets merged_into = the surviving campaign and its alerts keep
+    their campaign_id, so membership is the merged_into tree under a root.
+    """
+    __tablename__ = "campaigns"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    prediction = Column(String, nullable=False)
+    severity = Column(String, nullable=False)    # highest severity seen
+    status = Column(String, default="Active")   # Active | Merged
+    alert_count = Column(Integer, nullable=False, default=0)
+    sources = Column(JSON, nullable=False, default=list)       # first CAMPAIGN_MAX_LISTED distinct IPs
+    destinations = Column(JSON, nullable=False, default=list)
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+    merged_into = Column(Integer, ForeignKey("campaigns.id"), nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_campaigns_user_last_seen", "user_id", "last_seen"),
+    )
+
+
+class AlertFeedback(Base):
+    """
+    An analyst's verdict on an alert, taken from remediation actions, with the
+    model input the alert was scored on. Training labels for app/services/retrainer.py.
+    """
+    __tablename__ = "alert_feedback"
+    id = Column(Integer, primary_key=True)
+    alert_id = Column(Integer, unique=True, nullable=False)  # alerts are partitioned, so no FK; latest verdict wins
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    action = Column(String, nullable=False)      # remediation action that produced the label
+    label = Column(Integer, nullable=False)      # 1 = confirmed attack, 0 = false positive
+    prediction = Column(String, nullable=True)   # model verdict at ingest
+    features = Column(JSON, nullable=True)       # Alert.features; NULL when none was stored
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    model_version = Column(String, nullable=True)  # first registry version trained on it; NULL = pending
+
+    __table_args__ = (
+        Index("ix_alert_feedback_created_at", "created_at"),
+    )
@@ -0,0 +1,253 @@
+"""
+Time partitioning and retention for the alerts table.
+
+PostgreSQL: `alerts` is a native RANGE partitioned table on `timestamp`
+(see migration 3). Maintenance pre-creates the next few daily or weekly
+partitions and retires expired ones with DETACH + DROP. Nothing is deleted
+row by row, so no dead tuples or index bloat build up as history grows.
+Rows that reached the DEFAULT partition before their range existed are
+moved into the new partition when it is created.
+Queries with a time predicate are pruned to the partitions they need, and
+"latest N" queries read the newest partition first through the
+(user_id, timestamp) index.
+
+SQLite (local dev) has no partitioning. Retention there is a batched
+DELETE over the timestamp index.
+
+With ALERT_ARCHIVE_ENABLED, expired data is copied to the Parquet cold
+archive (app/services/alert_archive.py) before it leaves the table.
+
+Maintenance runs from the app lifespan every ALERT_MAINTENANCE_INTERVAL_MINUTES,
+guarded by an advisory lock so only one worker does it. It can also be run
+from cron:
+    python -m app.db.partitions
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, text
+from app.core.config import settings
+from app.db.session import engine
+from app.services import alert_archive
+
+PARTITION_PREFIX = "alerts_p"
+DEFAULT_PARTITION = "alerts_default"
+MAINTENANCE_LOCK_KEY = 727_002
+SQLITE_DELETE_BATCH = 10_000
+
+_NAME_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{8}})$")
+
+
+def _interval():
+    return timedelta(weeks=1) if settings.ALERT_PARTITION_INTERVAL == "week" else timedelta(days=1)
+
+
+def partition_start(ts: datetime) -> datetime:
+    """Start of the day (or ISO week) containing `ts`, in UTC."""
+    ts = ts.astimezone(timezone.utc)
+    start = datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+    if settings.ALERT_PARTITION_INTERVAL == "week":
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def create_partition(connection, start: datetime):
+    """
+    Creates the partition for [start, start + interval) unless it exists.
+    Rows for that range that already landed in the DEFAULT partition would
+    make CREATE ... PARTITION OF fail, so they are moved into a plain table
+    first and that table is attached in their place.
+    """
+    end = start + _interval()
+    name = partition_name(start)
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar() is None:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF alerts {bounds}"))
+        return
+
+    in_range = {"start": start, "end": end}
+    # Blocks inserts into the default until commit, so nothing new lands in the range mid-move
+    connection.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+    stray = connection.execute(text(
+        f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"
+    ), in_range).scalar()
+    if not stray:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF alerts {bounds}"))
+        return
+    print(f"Alert partitions: {stray} row(s) for {name} are in {DEFAULT_PARTITION}; moving them")
+    connection.execute(text(f"CREATE TABLE {name} (LIKE alerts INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), in_range)
+    # Indexes and the primary key of the parent are built on the table as it attaches
+    connection.execute(text(f"ALTER TABLE alerts ATTACH PARTITION {name} {bounds}"))
+
+
+def list_partitions(connection):
+    """Returns [(name, start)] for every dated partition of alerts."""
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'alerts'"
+    ))
+    partitions = []
+    for (name,) in rows:
+        match = _NAME_RE.match(name)
+        if match:
+            partitions.append((name, datetime.strptime(match.group(1), "%Y%m%d").replace(tzinfo=timezone.utc)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'alerts'"
+    )).scalar())
+
+
+# ============================================================
+#  MAINTENANCE
+# ============================================================
+def ensure_partitions(connection, now: datetime = None):
+    """Creates the current partition plus ALERT_PARTITIONS_AHEAD future ones."""
+    now = now or datetime.now(timezone.utc)
+    start = partition_start(now)
+    for i in range(settings.ALERT_PARTITIONS_AHEAD + 1):
+        try:
+            create_partition(connection, start + i * _interval())
+        except Exception as e:
+            connection.rollback()
+            print(f"ALERT PARTITIONS: could not create {partition_name(start + i * _interval())}; "
+                  f"inserts for that range go to {DEFAULT_PARTITION}: {e}")
+            raise
+        connection.commit()
+
+
+def expired_partitions(connection, now: datetime = None):
+    """Partitions whose whole range is older than the retention cutoff."""
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.ALERT_RETENTION_DAYS)
+    return [(name, start) for name, start in list_partitions(connection) if start + _interval() <= cutoff]
+
+
+def drop_partition(connection, name: str):
+    if settings.ALERT_ARCHIVE_ENABLED:
+        alert_archive.archive_partition(connection, name)
+    connection.execute(text(f"ALTER TABLE alerts DETACH PARTITION {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+    connection.commit()
+
+
+def purge_expired_rows(connection, now: datetime = None) -> int:
+    """Fallback for unpartitioned backends: batched DELETE over the timestamp index."""
+    now = now or datetime.now(timezone.utc)
+    # Naive UTC string: matches how SQLite stores both server_default and ORM-set timestamps
+    cutoff = (now - timedelta(days=settings.ALERT_RETENTION_DAYS)).astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    total = 0
+    while True:
+        if settings.ALERT_ARCHIVE_ENABLED:
+            # Delete exactly the ids that reached Parquet, nothing that arrived in between
+            ids = alert_archive.archive_rows_before(connection, cutoff, SQLITE_DELETE_BATCH)
+            deleted = connection.execute(
+                text("DELETE FROM alerts WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            ).rowcount if ids else 0
+        else:
+            deleted = connection.execute(text(
+                "DELETE FROM alerts WHERE id IN "
+                "(SELECT id FROM alerts WHERE timestamp < :cutoff LIMIT :batch)"
+            ), {"cutoff": cutoff, "batch": SQLITE_DELETE_BATCH}).rowcount
+        connection.commit()
+        total += deleted
+        if deleted < SQLITE_DELETE_BATCH:
+            return total
+
+
+def run_maintenance(bind=None, now: datetime = None) -> dict:
+    """Creates upcoming partitions and retires expired data. Safe to call from every worker."""
+    bind = bind or engine
+    report = {"created_through": None, "dropped": [], "deleted_rows": 0, "archive_days_pruned": []}
+
+    with bind.connect() as connection:
+        if not is_partitioned(connection):
+            report["deleted_rows"] = purge_expired_rows(connection, now)
+        else:
+            got_lock = connection.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": MAINTENANCE_LOCK_KEY}).scalar()
+            connection.commit()
+            if not got_lock:
+                return report  # another worker is on it
+            try:
+                ensure_partitions(connection, now)
+                report["created_through"] = partition_name(
+                    partition_start(now or datetime.now(timezone.utc)) + settings.ALERT_PARTITIONS_AHEAD * _interval()
+                )
+                for name, _ in expired_partitions(connection, now):
+                    drop_partition(connection, name)
+                    report["dropped"].append(name)
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MAINTENANCE_LOCK_KEY})
+                connection.commit()
+
+    # Not under the lock: pruning is idempotent and concurrent removals are ignored
+    report["archive_days_pruned"] = alert_archive.prune_archive(now)
+
+    if report["dropped"] or report["deleted_rows"]:
+        print(f"Alert retention: dropped {report['dropped']} / deleted {report['deleted_rows']} rows")
+    return report
+
+
+# ============================================================
+#  MIGRATION HELPER
+# ============================================================
+def convert_alerts_to_partitioned(connection):
+    """
+    One-off conversion of a plain `alerts` table into a RANGE partitioned one.
+    The primary key becomes (id, timestamp) because PostgreSQL requires the
+    partition key in every unique constraint. ids still come from the same
+    sequence, so they stay unique and the ORM can keep treating id as the key.
+    """
+    if is_partitioned(connection):
+        return
+
+    connection.execute(text("ALTER TABLE alerts RENAME TO alerts_legacy"))
+    connection.execute(text("ALTER SEQUENCE IF EXISTS alerts_id_seq OWNED BY NONE"))
+    connection.execute(text("UPDATE alerts_legacy SET timestamp = now() WHERE timestamp IS NULL"))
+    connection.execute(text(
+        "CREATE TABLE alerts (LIKE alerts_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+    ))
+    connection.execute(text("ALTER TABLE alerts ADD PRIMARY KEY (id, timestamp)"))
+    connection.execute(text("ALTER TABLE alerts ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF alerts DEFAULT"))
+
+    # Partitions covering existing history, then the usual look-ahead
+    oldest = connection.execute(text("SELECT MIN(timestamp) FROM alerts_legacy")).scalar()
+    now = datetime.now(timezone.utc)
+    start = partition_start(oldest if oldest is not None else now)
+    while start <= now:
+        create_partition(connection, start)
+        start += _interval()
+    for i in range(1, settings.ALERT_PARTITIONS_AHEAD + 1):
+        create_partition(connection, partition_start(now) + i * _interval())
+
+    connection.execute(text("INSERT INTO alerts SELECT * FROM alerts_legacy"))
+    connection.execute(text("DROP TABLE alerts_legacy"))
+    connection.execute(text("ALTER SEQUENCE IF EXISTS alerts_id_seq OWNED BY alerts.id"))
+
+    # Created on the parent, so every current and future partition inherits them
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_id ON alerts (id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_src_ip ON alerts (src_ip)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_user_ts ON alerts (user_id, timestamp)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_alerts_timestamp ON alerts (timestamp)"))
+
+
+if __name__ == "__main__":
+    print(run_maintenance())
@@ -1,47 +1,126 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import text
-from app.db.session import engine, Base
-from app.api import auth, endpoints
-import os
+from starlette.concurrency import run_in_threadpool
+from app.api import auth, endpoints, monitoring, admin, archive, campaigns
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.profiler import ProfileRequestMiddleware
+from app.db.migrations import run_migrations
+from app.db.partitions import run_maintenance
+from app.services.ml_service import ml_engine
+from app.services.log_analytics import log_analytics
+from app.services.security_log import security_log
+from app.services.ip_reputation import ip_reputation
+from app.services.geoip import geoip
+from app.services.asset_scanner import run_scan
+from app.services.campaigns import correlator
+from app.services.source_behavior import source_behavior
+from app.services.attack_category import attack_categorizer
+from app.services import retrainer
+
+# Importing this module has no side effects: no DB connections, no model
+# loading, no mail config. Everything below runs once per worker on startup.
+
+async def run_periodically(name: str, job, interval_seconds: float):
+    """Runs a blocking `job` in the threadpool forever, `interval_seconds` apart."""
+    while True:
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            print(f"{name} failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+async def run_once(name: str, job):
+    """Runs a blocking `job` in the threadpool once, logging instead of raising."""
+    try:
+        await run_in_threadpool(job)
+    except Exception as e:
+        print(f"{name} failed: {e}")
+
+def resync_log_stats():
+    log_analytics.rebuild(flush=security_log.flush)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 1. Ensure upload directory exists
+    os.makedirs("uploads", exist_ok=True)
 
-# 1. Ensure upload directory exists
-os.makedirs("uploads", exist_ok=True)
+    # 2. Schema migrations (versioned; a no-op SELECT when already current)
+    app.state.migrations_ready = False
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        try:
+            await run_in_threadpool(run_migrations)
+            app.state.migrations_ready = True
+        except Exception as e:
+            print(f"Migration error: {e}")
+    else:
+        app.state.migrations_ready = True
 
-# 2. Run Auto-Migration for new columns
-def run_migrations():
+    # 2b. Campaign correlator state for alerts still inside the window (once; incremental afterwards)
+    if app.state.migrations_ready:
+        try:
+            await run_in_threadpool(correlator.rebuild)
+        except Exception as e:
+            print(f"Campaign correlator rebuild failed: {e}")
+
+    # 2c. Per-source behavior from the last snapshot (decay continues over the downtime)
     try:
-        with engine.connect() as connection:
-            # Avatar
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar VARCHAR"))
-            
-            # Security Settings
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS mfa_enabled BOOLEAN DEFAULT FALSE"))
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS api_key VARCHAR"))
-            
-            # Notification Preferences
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS email_alerts BOOLEAN DEFAULT TRUE"))
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS sms_alerts BOOLEAN DEFAULT FALSE"))
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS weekly_reports BOOLEAN DEFAULT TRUE"))
-            
-            # ... existing migrations ...
-            connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS mfa_secret VARCHAR"))
-            connection.commit()
-            print("Database migration successful: All columns verified.")
+        loaded = await run_in_threadpool(source_behavior.load)
+        print(f"Source behavior: {loaded} source(s) restored")
     except Exception as e:
-        print(f"Migration warning: {e}")
+        print(f"Source behavior snapshot not loaded: {e}")
+
+    # 3. Load + warm models in the background; /ready reports when done
+    app.state.warmup_task = asyncio.create_task(asyncio.to_thread(ml_engine.warm_up))
+
+    # 4. Background jobs (each takes a DB advisory lock where only one worker should act)
+    background = [asyncio.create_task(run_periodically(
+        # First run loads the lists; afterwards only reloads when a file changed
+        "IP reputation reload", ip_reputation.reload_if_changed, settings.IP_REPUTATION_POLL_SECONDS
+    )), asyncio.create_task(run_periodically(
+        "GeoIP remap", geoip.reload_if_changed, settings.GEOIP_POLL_SECONDS
+    )), asyncio.create_task(run_periodically(
+        "Source behavior snapshot", source_behavior.save, settings.SOURCE_SNAPSHOT_SECONDS
+    )), asyncio.create_task(run_periodically(
+        # Picks up versions promoted by a retrain (or by hand) without a restart
+        "Model refresh", ml_engine.refresh, settings.MODEL_POLL_SECONDS
+    )), asyncio.create_task(attack_categorizer.run())]
+    if app.state.migrations_ready:
+        background.append(asyncio.create_task(run_periodically(
+            "Alert partition maintenance", run_maintenance, settings.ALERT_MAINTENANCE_INTERVAL_MINUTES * 60
+        )))
+        background.append(asyncio.create_task(run_periodically(
+            "Security log flush", security_log.flush, settings.SECURITY_LOG_FLUSH_SECONDS
+        )))
+        # Builds the /api/logs/stats sketches from the last 24h of the log; ingest keeps them current
+        if settings.LOG_STATS_RESYNC_MINUTES:
+            background.append(asyncio.create_task(run_periodically(
+                "Log analytics resync", resync_log_stats, settings.LOG_STATS_RESYNC_MINUTES * 60
+            )))
+        else:
+            background.append(asyncio.create_task(run_once("Log analytics rebuild", resync_log_stats)))
+        background.append(asyncio.create_task(retrainer.run()))
+        if settings.ASSET_SCAN_SUBNETS:
+            background.append(asyncio.create_task(run_periodically(
+                "Asset scan", run_scan, settings.ASSET_SCAN_INTERVAL_MINUTES * 60
+            )))
 
-# Run the migration
-run_migrations()
+    yield
 
-# Create other tables if they don't exist
-Base.metadata.create_all(bind=engine)
+    for task in background:
+        task.cancel()
+    await run_in_threadpool(source_behavior.save)
+    if app.state.migrations_ready:
+        await run_in_threadpool(security_log.flush)
 
-app = FastAPI(title="AI Cyber Defense Backend")
+app = FastAPI(title="AI Cyber Defense Backend", lifespan=lifespan)
 
-# 3. Mount the uploads directory to serve images
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Mount the uploads directory to serve images (created in lifespan, so don't check at import)
+app.mount("/uploads", StaticFiles(directory="uploads", check_dir=False), name="uploads")
 
 origins = [
     "http://localhost:5173",
@@ -56,9 +135,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfileRequestMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(endpoints.router, prefix="/api", tags=["Threat Analysis"])
+app.include_router(archive.router, prefix="/api/archive", tags=["Alert Archive"])
+app.include_router(campaigns.router, prefix="/api/campaigns", tags=["Campaigns"])
+app.include_router(monitoring.router, tags=["Monitoring"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 @app.get("/")
 def root():
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+import time
+from pydantic import BaseModel, model_validator
+from app.core.metrics import STAGE_LATENCY
 
 class TrafficData(BaseModel):
     srcip: str
@@ -48,4 +50,63 @@ class TrafficData(BaseModel):
     ct_src_dport_ltm: int
     ct_dst_sport_ltm: int
     ct_dst_src_ltm: int
-    simulation: bool = False
\ No newline at end of file
+    simulation: bool = False
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _timed_validation(cls, data, handler):
+        # Validation runs before the endpoint body, so it is timed here
+        start = time.perf_counter()
+        try:
+            return handler(data)
+        finally:
+            STAGE_LATENCY.observe("validation", value=time.perf_counter() - start)
+
+
+class RawFlow(BaseModel):
+    """
+    A basic flow record as a sensor sees it. The connection-window
+    features (ct_srv_src, ct_dst_ltm, ...) and is_sm_ips_ports are computed
+    server-side by app.services.flow_features.
+    """
+    srcip: str
+    sport: int
+    dstip: str
+    dsport: int
+    proto: str
+    state: str
+    dur: float
+    sbytes: int
+    dbytes: int
+    sttl: int
+    dttl: int
+    sloss: int
+    dloss: int
+    service: str
+    Sload: float
+    Dload: float
+    Spkts: int
+    Dpkts: int
+    swin: int
+    dwin: int
+    stcpb: int
+    dtcpb: int
+    smeansz: int
+    dmeansz: int
+    trans_depth: int
+    res_bdy_len: int
+    Sjit: float
+    Djit: float
+    Stime: int
+    Ltime: int
+    Sintpkt: float
+    Dintpkt: float
+    tcprtt: float
+    synack: float
+    ackdat: float
+    # Content features need payload inspection, so they still come from the sensor
+    ct_state_ttl: int = 0
+    ct_flw_http_mthd: int = 0
+    is_ftp_login: int = 0
+    ct_ftp_cmd: int = 0
+    simulation: bool = False
@@ -0,0 +1,287 @@
+"""
+Cold archive for aged alerts.
+
+Alerts that leave the hot table (see app/db/partitions.py) are written to
+Parquet under a hive layout, one directory per UTC day:
+
+    ALERT_ARCHIVE_DIR/date=2025-01-31/alerts_p20250131.parquet
+
+Rows inside a file are sorted by (user_id, timestamp) and written in
+ARCHIVE_ROW_GROUP_SIZE row groups. That lets a pyarrow dataset scan skip
+whole day directories on the `date` key and whole row groups on the min/max
+statistics of user_id, timestamp, severity and src_ip, so a search usually
+decodes only a small part of the year.
+
+File names are deterministic, so re-archiving the same partition or id range
+after a crash overwrites a file instead of duplicating rows.
+
+pyarrow (and the pandas it pulls in) is imported inside the functions to keep
+worker boot fast.
+"""
+import os
+import shutil
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from app.core.config import settings
+
+ARCHIVE_ROW_GROUP_SIZE = 64_000
+# Every Alert column except `features` (model input, only needed for live explanations).
+# New columns go at the end: write_rows indexes timestamp/user_id by position
+ARCHIVE_COLUMNS = [
+    "id", "src_ip", "prediction", "confidence", "severity", "status", "timestamp", "user_id",
+    "dst_ip", "reason", "src_country", "src_asn", "campaign_id", "attack_cat", "attack_cat_confidence",
+]
+AGGREGATE_KEYS = ("severity", "prediction", "status", "src_ip", "date", "attack_cat", "src_country")
+
+
+def arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("src_ip", pa.string()),
+        ("prediction", pa.string()),
+        ("confidence", pa.float64()),
+        ("severity", pa.string()),
+        ("status", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("user_id", pa.int64()),
+        ("dst_ip", pa.string()),
+        ("reason", pa.string()),
+        ("src_country", pa.string()),
+        ("src_asn", pa.int64()),
+        ("campaign_id", pa.int64()),
+        ("attack_cat", pa.string()),
+        ("attack_cat_confidence", pa.float64()),
+    ])
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive")
+
+
+def _as_utc(ts) -> Optional[datetime]:
+    if ts is None:
+        return None
+    if isinstance(ts, str):  # SQLite hands back text
+        ts = datetime.fromisoformat(ts)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def _day_dir(day: date) -> str:
+    return os.path.join(settings.ALERT_ARCHIVE_DIR, f"date={day.isoformat()}")
+
+
+# ============================================================
+#  WRITING
+# ============================================================
+def _table(rows, schema):
+    import pyarrow as pa
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema)
+
+
+def write_rows(rows, file_stem: str) -> int:
+    """
+    Writes alert rows (tuples in ARCHIVE_COLUMNS order) into per-day Parquet
+    files named `<file_stem>.parquet`. Returns the number of rows written.
+    """
+    import pyarrow.parquet as pq
+
+    by_day = {}
+    for row in rows:
+        row = list(row)
+        row[6] = _as_utc(row[6])
+        by_day.setdefault(row[6].date(), []).append(row)
+
+    schema = arrow_schema()
+    for day, day_rows in by_day.items():
+        day_rows.sort(key=lambda r: (r[7] is None, r[7] or 0, r[6]))
+        os.makedirs(_day_dir(day), exist_ok=True)
+        path = os.path.join(_day_dir(day), f"{file_stem}.parquet")
+        # Write-then-rename so a reader never sees a half written file (dot files are ignored by scans)
+        tmp_path = os.path.join(_day_dir(day), f".{file_stem}.parquet.tmp")
+        pq.write_table(_table(day_rows, schema), tmp_path, row_group_size=ARCHIVE_ROW_GROUP_SIZE, compression="zstd")
+        os.replace(tmp_path, path)
+    return sum(len(r) for r in by_day.values())
+
+
+class _DayWriters:
+    """
+    Streams rows already sorted by (user_id, timestamp) into one Parquet file
+    per UTC day, one ARCHIVE_ROW_GROUP_SIZE row group at a time. Holds at most
+    one pending row group per day (seven for a weekly partition).
+    """
+
+    def __init__(self, file_stem: str):
+        self.file_stem = file_stem
+        self.schema = arrow_schema()
+        self.days = {}  # day -> [writer, tmp path, pending rows]
+        self.rows = 0
+
+    def add(self, row):
+        import pyarrow.parquet as pq
+
+        row = list(row)
+        row[6] = _as_utc(row[6])
+        day = row[6].date()
+        if day not in self.days:
+            os.makedirs(_day_dir(day), exist_ok=True)
+            tmp_path = os.path.join(_day_dir(day), f".{self.file_stem}.parquet.tmp")
+            self.days[day] = [pq.ParquetWriter(tmp_path, self.schema, compression="zstd"), tmp_path, []]
+        entry = self.days[day]
+        entry[2].append(row)
+        self.rows += 1
+        if len(entry[2]) >= ARCHIVE_ROW_GROUP_SIZE:
+            self._flush(entry)
+
+    def _flush(self, entry):
+        writer, _, pending = entry
+        if pending:
+            writer.write_table(_table(pending, self.schema), row_group_size=len(pending))
+            pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for day, entry in self.days.items():
+            if exc_type is None:
+                self._flush(entry)
+            entry[0].close()
+            if exc_type is None:
+                os.replace(entry[1], os.path.join(_day_dir(day), f"{self.file_stem}.parquet"))
+            else:
+                os.remove(entry[1])
+        return False
+
+
+def archive_partition(connection, partition: str) -> int:
+    """
+    Copies one PostgreSQL partition to Parquet. Called before it is dropped.
+    Rows come through a server-side cursor in (user_id, timestamp) order, so
+    memory stays around one row group per day however large the partition.
+    """
+    result = connection.execute(
+        text(f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM {partition} ORDER BY user_id NULLS LAST, timestamp"),
+        execution_options={"stream_results": True, "yield_per": ARCHIVE_ROW_GROUP_SIZE},
+    )
+    with _DayWriters(partition) as writers:
+        for batch in result.partitions():
+            for row in batch:
+                writers.add(row)
+    return writers.rows
+
+
+def archive_rows_before(connection, cutoff: str, limit: int) -> list:
+    """
+    Archives the oldest `limit` rows older than `cutoff` (unpartitioned
+    backends) and returns their ids so the caller can delete exactly those.
+    """
+    rows = connection.execute(text(
+        f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM alerts WHERE timestamp < :cutoff ORDER BY id LIMIT :limit"
+    ), {"cutoff": cutoff, "limit": limit}).fetchall()
+    if rows:
+        write_rows(rows, f"alerts_ids_{rows[0][0]}_{rows[-1][0]}")
+    return [row[0] for row in rows]
+
+
+def prune_archive(now: datetime = None) -> list:
+    """Deletes day directories older than ALERT_ARCHIVE_RETENTION_DAYS."""
+    if not os.path.isdir(settings.ALERT_ARCHIVE_DIR):
+        return []
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=settings.ALERT_ARCHIVE_RETENTION_DAYS)).date()
+    removed = []
+    for name in os.listdir(settings.ALERT_ARCHIVE_DIR):
+        if not name.startswith("date="):
+            continue
+        try:
+            day = date.fromisoformat(name[5:])
+        except ValueError:
+            continue
+        if day < cutoff:
+            shutil.rmtree(os.path.join(settings.ALERT_ARCHIVE_DIR, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+# ============================================================
+#  QUERYING
+# ============================================================
+def _days(start: datetime, end: datetime):
+    """Existing day directories in [start, end], newest first."""
+    if not os.path.isdir(settings.ALERT_ARCHIVE_DIR):
+        return []
+    days = []
+    for name in os.listdir(settings.ALERT_ARCHIVE_DIR):
+        try:
+            day = date.fromisoformat(name[5:]) if name.startswith("date=") else None
+        except ValueError:
+            continue
+        if day is not None and start.date() <= day <= end.date():
+            days.append(day)
+    return sorted(days, reverse=True)
+
+
+def _row_filter(user_id: int, start: datetime, end: datetime, severity=None, src_ip=None, attack_cat=None):
+    import pyarrow.dataset as ds
+    expr = (ds.field("user_id") == user_id) & (ds.field("timestamp") >= start) & (ds.field("timestamp") <= end)
+    if severity:
+        expr &= ds.field("severity") == severity
+    if src_ip:
+        expr &= ds.field("src_ip") == src_ip
+    if attack_cat:
+        expr &= ds.field("attack_cat") == attack_cat
+    return expr
+
+
+def _dataset():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    # The hive `date` key is a virtual column, so it has to be part of the dataset schema
+    schema = arrow_schema().append(pa.field("date", pa.date32()))
+    return ds.dataset(settings.ALERT_ARCHIVE_DIR, format="parquet", schema=schema, partitioning=_partitioning())
+
+
+def search(user_id: int, start: datetime, end: datetime, severity: str = None, src_ip: str = None,
+           attack_cat: str = None, limit: int = 100):
+    """Newest-first archived alerts for one user. Scans one day at a time and stops once `limit` is reached."""
+    import pyarrow.dataset as ds
+
+    start, end = _as_utc(start), _as_utc(end)
+    expr = _row_filter(user_id, start, end, severity, src_ip, attack_cat)
+    results = []
+    for day in _days(start, end):
+        table = ds.dataset(_day_dir(day), format="parquet", schema=arrow_schema()).to_table(filter=expr)
+        if table.num_rows:
+            rows = table.sort_by([("timestamp", "descending")]).slice(0, limit - len(results)).to_pylist()
+            results.extend(rows)
+        if len(results) >= limit:
+            break
+    return results
+
+
+def aggregate(user_id: int, start: datetime, end: datetime, group_by: str = "severity",
+              severity: str = None, src_ip: str = None, attack_cat: str = None, top: int = 50):
+    """Alert counts grouped by `group_by` (one of AGGREGATE_KEYS), largest first."""
+    import pyarrow.dataset as ds
+
+    if group_by not in AGGREGATE_KEYS:
+        raise ValueError(f"group_by must be one of {', '.join(AGGREGATE_KEYS)}")
+    start, end = _as_utc(start), _as_utc(end)
+    if not _days(start, end):
+        return []
+
+    # The date predicate prunes whole directories before any file is opened
+    expr = _row_filter(user_id, start, end, severity, src_ip, attack_cat)
+    expr &= (ds.field("date") >= start.date()) & (ds.field("date") <= end.date())
+    table = _dataset().to_table(filter=expr, columns=[group_by, "id"])
+    counts = table.group_by(group_by).aggregate([("id", "count")]).sort_by([("id_count", "descending")])
+    return [
+        {"key": str(row[group_by]), "count": row["id_count"]}
+        for row in counts.slice(0, top).to_pylist()
+    ]
@@ -0,0 +1,261 @@
+"""
+Network asset discovery for /api/network/devices.
+
+A sweep makes a TCP connect probe to every (address, port) pair of
+ASSET_SCAN_SUBNETS x ASSET_SCAN_PORTS. It uses a fixed pool of
+ASSET_SCAN_CONCURRENCY asyncio workers pulling from one shared iterator, so
+memory and open sockets stay bounded however large the subnet is. Each probe
+ends in one of three ways:
+
+    connected   port open; the connect time is the host's latency
+    refused     port closed, but the host is up (it answered with a RST)
+    timeout     nothing answered within ASSET_SCAN_TIMEOUT_SECONDS
+
+So a sweep takes at most ceil(addresses * ports / concurrency) * timeout,
+e.g. a /16 with 8 ports at 1024 x 0.5s is bounded by 256s. Live networks
+finish much faster because closed ports answer at once.
+
+Sweeps run in the background (see main.lifespan) and write the `assets`
+table. The endpoint only reads that table, so polling it never sends a
+packet. On PostgreSQL an advisory lock makes sure one worker sweeps at a
+time.
+
+    python -m app.services.asset_scanner 192.168.1.0/24 --ports 22,80,443
+"""
+import argparse
+import asyncio
+import ipaddress
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.models import Asset
+from app.db.session import SessionLocal, engine
+
+SCAN_LOCK_KEY = 727_003
+# Sockets kept free for the rest of the worker when capping concurrency to the fd limit
+RESERVED_FDS = 256
+# Reverse DNS for live hosts only, with its own small bound
+RDNS_CONCURRENCY = 64
+RDNS_TIMEOUT_SECONDS = 1.0
+
+# Refuse subnets that could never be swept (an IPv6 /64 is 2^64 addresses)
+MAX_SWEEP_ADDRESSES = 1 << 20
+
+RISKY_PORTS = {21, 23, 3389, 5900}  # Cleartext or remote-desktop services worth a warning
+DATABASE_PORTS = {1433, 1521, 3306, 5432, 6379, 27017}
+
+_sweep_lock = threading.Lock()
+
+
+def parse_ports(spec: str) -> list:
+    return sorted({int(p) for p in spec.split(",") if p.strip()})
+
+
+def parse_subnets(spec: str) -> list:
+    networks = [ipaddress.ip_network(s.strip(), strict=False) for s in spec.split(",") if s.strip()]
+    if sum(n.num_addresses for n in networks) > MAX_SWEEP_ADDRESSES:
+        raise ValueError(f"Subnets {spec!r} exceed {MAX_SWEEP_ADDRESSES:,} addresses; split or narrow them")
+    return networks
+
+
+def _hosts(network):
+    # /31, /32 (and v6 equivalents) have no network/broadcast address to skip
+    return network.hosts() if network.num_addresses > 2 else iter(network)
+
+
+# ============================================================
+#  PROBING
+# ============================================================
+async def probe(ip: str, port: int, timeout: float):
+    """Returns ("open" | "closed", rtt seconds), or None when nothing answered."""
+    loop = asyncio.get_running_loop()
+    family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    started = time.perf_counter()
+    try:
+        async with asyncio.timeout(timeout):
+            await loop.sock_connect(sock, (ip, port))
+        # Reset instead of FIN so a large sweep does not leave thousands of TIME_WAIT sockets
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        return "open", time.perf_counter() - started
+    except ConnectionRefusedError:
+        return "closed", time.perf_counter() - started
+    except (TimeoutError, OSError):
+        return None
+    finally:
+        sock.close()
+
+
+def effective_concurrency(requested: int) -> int:
+    try:
+        # Unix only; on Windows the configured concurrency is used as is
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except ImportError:
+        return max(1, requested)
+    return max(1, min(requested, soft - RESERVED_FDS))
+
+
+async def sweep(networks, ports, concurrency: int, timeout: float) -> dict:
+    """
+    Probes every host/port pair and returns {ip: {"ports": [...], "latency_ms": float}}
+    for the hosts that answered at all.
+    """
+    targets = ((str(host), port) for network in networks for host in _hosts(network) for port in ports)
+    found = {}
+
+    async def worker():
+        # All workers share one generator: in a single event loop next() never interleaves
+        for ip, port in targets:
+            result = await probe(ip, port, timeout)
+            if result is None:
+                continue
+            state, rtt = result
+            host = found.setdefault(ip, {"ports": [], "latency_ms": None})
+            if state == "open":
+                host["ports"].append(port)
+            ms = rtt * 1000
+            if host["latency_ms"] is None or ms < host["latency_ms"]:
+                host["latency_ms"] = ms
+
+    total = sum(network.num_addresses for network in networks) * len(ports)
+    await asyncio.gather(*(worker() for _ in range(min(effective_concurrency(concurrency), total))))
+    for host in found.values():
+        host["ports"].sort()
+    return found
+
+
+async def resolve_names(ips) -> dict:
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(RDNS_CONCURRENCY)
+
+    async def one(ip):
+        async with limit:
+            try:
+                async with asyncio.timeout(RDNS_TIMEOUT_SECONDS):
+                    name, _ = await loop.getnameinfo((ip, 0), socket.NI_NAMEREQD)
+                return ip, name
+            except (TimeoutError, OSError):
+                return ip, None
+
+    return dict(await asyncio.gather(*(one(ip) for ip in ips)))
+
+
+def classify(ip: str, ports) -> tuple:
+    """(type, os) guessed from the address and open ports."""
+    ports = set(ports)
+    if ip.endswith(".1") or ip.endswith(".254"):
+        return "Gateway", "Unknown"
+    if 3389 in ports:
+        return "Desktop", "Windows"
+    if 445 in ports:
+        return "Server", "Windows"
+    if ports & DATABASE_PORTS:
+        return "Server", "Database host"
+    if 22 in ports:
+        return "Server", "Linux/Unix"
+    if 23 in ports:
+        return "IoT", "Embedded"
+    if ports:
+        return "Server", "Unknown"
+    return "Unknown", "Unknown"
+
+
+def device_status(asset) -> str:
+    if not asset.is_up:
+        return "Critical"
+    if RISKY_PORTS.intersection(asset.ports or []):
+        return "Warning"
+    return "Safe"
+
+
+# ============================================================
+#  INVENTORY
+# ============================================================
+def save_inventory(db, networks, found: dict, names: dict, now: datetime) -> dict:
+    """Upserts the hosts that answered and marks the rest of the swept subnets as down."""
+    existing = {a.ip: a for a in db.query(Asset).all()}
+    added = 0
+    for ip, host in found.items():
+        asset = existing.get(ip)
+        if asset is None:
+            asset = Asset(ip=ip, first_seen=now)
+            db.add(asset)
+            added += 1
+        asset.hostname = names.get(ip) or asset.hostname
+        asset.type, asset.os = classify(ip, host["ports"])
+        asset.ports = host["ports"]
+        asset.latency_ms = round(host["latency_ms"], 2)
+        asset.is_up = True
+        asset.last_seen = now
+    went_down = 0
+    for ip, asset in existing.items():
+        if ip not in found and asset.is_up and any(ipaddress.ip_address(ip) in n for n in networks):
+            asset.is_up = False
+            went_down += 1
+    db.commit()
+    return {"hosts_up": len(found), "added": added, "went_down": went_down}
+
+
+def run_scan(subnets: str = None, ports: str = None) -> dict:
+    """One full sweep plus inventory update. Blocking; the lifespan runs it in the threadpool."""
+    networks = parse_subnets(subnets if subnets is not None else settings.ASSET_SCAN_SUBNETS)
+    port_list = parse_ports(ports or settings.ASSET_SCAN_PORTS)
+    if not networks or not port_list:
+        return {"skipped": "no subnets configured"}
+    if not _sweep_lock.acquire(blocking=False):
+        return {"skipped": "a sweep is already running on this worker"}
+
+    connection = None
+    locked = False
+    try:
+        if engine.dialect.name == "postgresql":
+            connection = engine.connect()
+            locked = connection.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": SCAN_LOCK_KEY}).scalar()
+            connection.commit()  # session-level lock; do not sit idle in a transaction for the whole sweep
+            if not locked:
+                return {"skipped": "another worker is sweeping"}
+
+        started = time.perf_counter()
+        concurrency = effective_concurrency(settings.ASSET_SCAN_CONCURRENCY)
+
+        async def _run():
+            found = await sweep(networks, port_list, concurrency, settings.ASSET_SCAN_TIMEOUT_SECONDS)
+            return found, await resolve_names(list(found))
+
+        # Own event loop in this threadpool thread; the request loop is never blocked
+        found, names = asyncio.run(_run())
+        db = SessionLocal()
+        try:
+            report = save_inventory(db, networks, found, names, datetime.now(timezone.utc))
+        finally:
+            db.close()
+        report.update({
+            "subnets": [str(n) for n in networks],
+            "probes": sum(n.num_addresses for n in networks) * len(port_list),
+            "concurrency": concurrency,
+            "seconds": round(time.perf_counter() - started, 2),
+        })
+        print(f"Asset scan: {report['hosts_up']} host(s) up across {report['subnets']} in {report['seconds']}s")
+        return report
+    finally:
+        if connection is not None:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": SCAN_LOCK_KEY})
+                connection.commit()
+            connection.close()
+        _sweep_lock.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep subnets and update the asset inventory")
+    parser.add_argument("subnets", nargs="?", default=None, help="Comma separated CIDRs (default: ASSET_SCAN_SUBNETS)")
+    parser.add_argument("--ports", default=None, help="Comma separated ports (default: ASSET_SCAN_PORTS)")
+    args = parser.parse_args()
+    print(run_scan(args.subnets, args.ports))
@@ -0,0 +1,136 @@
+"""
+Second-stage attack categorization (DoS, Exploits, Reconnaissance, ...).
+
+The binary forest decides Attack vs Normal inline. Only alerts it flagged are
+handed to this stage, after the alert has been committed. They go through a
+bounded asyncio queue. One background task drains the queue in batches of
+up to ATTACK_CATEGORY_BATCH, waiting at most ATTACK_CATEGORY_MAX_WAIT_MS for
+a batch to fill. It encodes and scores each batch with one predict_proba call
+in the threadpool, then writes Alert.attack_cat with one executemany UPDATE.
+Benign traffic never touches any of this, and the analyze response never
+waits for it.
+
+The model is ml_engine/models/attack_cat_model.joblib, trained by
+ml_engine/train_attack_category.py. Without it the stage is off and alerts
+keep attack_cat = NULL. When the queue is full (the categorizer cannot keep
+up), alerts are skipped rather than slowing ingest. Queued alerts are lost on
+shutdown. Both cases are counted in attack_category_total.
+"""
+import asyncio
+import os
+import time
+
+from sqlalchemy import bindparam, update
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import ATTACK_CATEGORY_RESULTS, INFERENCE_BATCH
+from app.db.models import Alert
+from app.db.session import engine
+from app.services.ml_service import MODEL_PATH, ml_engine
+
+MODEL_FILE = "attack_cat_model.joblib"
+
+# Training labels (lower-cased attack_cat) -> stored name
+CATEGORY_NAMES = {
+    "analysis": "Analysis",
+    "backdoor": "Backdoor",
+    "dos": "DoS",
+    "exploits": "Exploits",
+    "fuzzers": "Fuzzers",
+    "generic": "Generic",
+    "reconnaissance": "Reconnaissance",
+    "shellcode": "Shellcode",
+    "worms": "Worms",
+    "other": "Other",
+}
+
+
+class AttackCategorizer:
+    def __init__(self):
+        self.model = None
+        self.labels = []
+        self._queue = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.model is not None and self._queue is not None
+
+    def load(self):
+        import joblib
+
+        path = os.path.join(MODEL_PATH, MODEL_FILE)
+        if not os.path.exists(path):
+            print(f"Attack categorization off: {path} not found (train it with ml_engine/train_attack_category.py)")
+            return
+        self.model = joblib.load(path)
+        self.labels = [CATEGORY_NAMES.get(str(c), str(c).title()) for c in self.model.classes_]
+        print(f"Attack categorization on: {len(self.labels)} categories")
+
+    def submit(self, alert_id: int, timestamp, features: dict):
+        """Queues a flagged alert; never blocks. Must be called on the event loop."""
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait((alert_id, timestamp, features))
+        except asyncio.QueueFull:
+            ATTACK_CATEGORY_RESULTS.inc("dropped")
+
+    async def run(self):
+        """Background task (see main.lifespan): drains the queue in batches until cancelled."""
+        await run_in_threadpool(self.load)
+        if self.model is None:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.ATTACK_CATEGORY_QUEUE_SIZE)
+        max_wait = settings.ATTACK_CATEGORY_MAX_WAIT_MS / 1000
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + max_wait
+            while len(batch) < settings.ATTACK_CATEGORY_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    async with asyncio.timeout(remaining):
+                        batch.append(await self._queue.get())
+                except TimeoutError:
+                    break
+            try:
+                await run_in_threadpool(self.classify_batch, batch)
+                ATTACK_CATEGORY_RESULTS.inc("classified", amount=len(batch))
+            except Exception as e:
+                ATTACK_CATEGORY_RESULTS.inc("failed", amount=len(batch))
+                print(f"Attack categorization of {len(batch)} alert(s) failed: {e}")
+
+    def predict(self, rows: list) -> list:
+        """[(category, probability)] for flow dicts, scored in one call."""
+        import pandas as pd
+
+        if not ml_engine.ready:
+            ml_engine.load()
+        encoded = ml_engine.preprocessor.transform(pd.DataFrame(rows))
+        proba = self.model.predict_proba(encoded)
+        INFERENCE_BATCH.observe("attack_cat", value=len(rows))
+        best = proba.argmax(axis=1)
+        return [(self.labels[k], float(proba[i, k])) for i, k in enumerate(best)]
+
+    def classify_batch(self, batch: list):
+        results = self.predict([features for _, _, features in batch])
+        # The timestamp lets PostgreSQL prune to one partition per row
+        stmt = (
+            update(Alert.__table__)
+            .where(Alert.__table__.c.id == bindparam("b_id"), Alert.__table__.c.timestamp == bindparam("b_ts"))
+            .values(attack_cat=bindparam("b_cat"), attack_cat_confidence=bindparam("b_conf"))
+        )
+        with engine.begin() as connection:
+            connection.execute(stmt, [
+                {"b_id": alert_id, "b_ts": ts, "b_cat": category, "b_conf": round(confidence, 4)}
+                for (alert_id, ts, _), (category, confidence) in zip(batch, results)
+            ])
+
+
+attack_categorizer = AttackCategorizer()
@@ -0,0 +1,284 @@
+"""
+Incremental alert correlation into campaigns.
+
+Two attack alerts of one tenant belong to the same campaign when they have
+the same prediction, share a source or a destination IP, and are less than
+CAMPAIGN_WINDOW_MINUTES apart. The relation is transitive, so it is a
+union-find problem. Each new alert:
+
+    1. looks up its keys (src IP, dst IP) in an index of keys seen inside
+       the window, each pointing at the campaign that last used it
+    2. no hit: starts a campaign. One hit: joins it. Several: unions them,
+       and the largest campaign survives
+    3. refreshes its keys in the index
+
+find() uses path halving and union is by size, so each step is amortized
+near-O(1). Keys and campaigns drop out of memory when the window passes
+them, via FIFO expiry queues, also amortized O(1). Nothing is ever
+recomputed in bulk. Only on worker start is the state rebuilt, once, from
+the alerts still inside the window.
+
+The in-memory state changes when an alert is assigned, before the request
+commits, so concurrent requests correlate against each other. If that
+transaction rolls back instead, the state may point at a campaign row or a
+merge that never happened. The session is flagged when assign() touches the
+state. A rollback of a flagged session marks the correlator stale, and the
+next assign() reloads the window from the database first.
+
+State is per worker. With several workers, one attacker's alerts can start
+separate campaigns on different workers. Each campaign is still correct,
+just split. Route a tenant's sensors to one worker where this matters.
+"""
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.models import Alert, Campaign
+from app.db.session import engine
+
+SEVERITY_RANK = {"Low": 0, "Medium": 1, "High": 2, "Critical": 3}
+MAX_LISTED = 20  # Distinct sources/destinations stored per campaign
+PENDING = "campaigns_pending"  # Session.info flag: this transaction changed correlator state
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class CampaignState:
+    __slots__ = ("id", "size", "first_seen", "last_seen", "severity", "sources", "destinations")
+
+    def __init__(self, cid: int, first_seen: datetime, severity: str, sources=(), destinations=(), size: int = 0):
+        self.id = cid
+        self.size = size
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.severity = severity
+        self.sources = list(sources)
+        self.destinations = list(destinations)
+
+    def add(self, src, dst, severity: str, ts: datetime):
+        self.size += 1
+        self.last_seen = max(self.last_seen, ts)
+        if SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(self.severity, 0):
+            self.severity = severity
+        for value, listed in ((src, self.sources), (dst, self.destinations)):
+            if value and len(listed) < MAX_LISTED and value not in listed:
+                listed.append(value)
+
+    def absorb(self, other: "CampaignState"):
+        self.size += other.size
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+        if SEVERITY_RANK.get(other.severity, 0) > SEVERITY_RANK.get(self.severity, 0):
+            self.severity = other.severity
+        for theirs, ours in ((other.sources, self.sources), (other.destinations, self.destinations)):
+            for value in theirs:
+                if len(ours) < MAX_LISTED and value not in ours:
+                    ours.append(value)
+
+
+class CampaignCorrelator:
+    def __init__(self, window_minutes: int = None):
+        self.window = timedelta(minutes=window_minutes or settings.CAMPAIGN_WINDOW_MINUTES)
+        self._lock = threading.Lock()
+        self.stale = False  # Set when a transaction that changed the state rolled back
+        self._reset()
+
+    def _reset(self):
+        self.parent = {}    # campaign id -> parent id (roots point at themselves)
+        self.touched = {}   # campaign id -> last time an alert was assigned to it directly
+        self.states = {}    # root id -> CampaignState
+        self.index = {}     # (user, prediction, "src"|"dst", ip) -> (campaign id, ts)
+        self._key_expiry = deque()       # (ts, key)
+        self._campaign_expiry = deque()  # (ts, campaign id)
+
+    # ---------- union-find ----------
+    def find(self, cid):
+        parent = self.parent
+        if cid not in parent:
+            return None
+        while parent[cid] != cid:
+            parent[cid] = parent[parent[cid]]  # path halving
+            cid = parent[cid]
+        return cid
+
+    def _expire(self, now: datetime):
+        cutoff = now - self.window
+        while self._key_expiry and self._key_expiry[0][0] < cutoff:
+            ts, key = self._key_expiry.popleft()
+            entry = self.index.get(key)
+            if entry is not None and entry[1] == ts:  # not refreshed since
+                del self.index[key]
+        while self._campaign_expiry and self._campaign_expiry[0][0] < cutoff:
+            ts, cid = self._campaign_expiry.popleft()
+            if self.touched.get(cid) == ts:
+                # Children stop being touched when merged, so they never outlive their root
+                del self.touched[cid]
+                del self.parent[cid]
+                self.states.pop(cid, None)
+
+    def _touch(self, cid: int, ts: datetime):
+        self.touched[cid] = ts
+        self._campaign_expiry.append((ts, cid))
+
+    def _index(self, key, cid: int, ts: datetime):
+        self.index[key] = (cid, ts)
+        self._key_expiry.append((ts, key))
+
+    # ---------- ingest ----------
+    def assign(self, db, user_id: int, src_ip: str, dst_ip: str, prediction: str, severity: str,
+               now: datetime = None) -> int:
+        """
+        Correlates one attack alert and returns its campaign id. Campaign rows
+        are written through `db`, so they commit together with the alert.
+        """
+        now = now or datetime.now(timezone.utc)
+        keys = [(user_id, prediction, kind, ip) for kind, ip in (("src", src_ip), ("dst", dst_ip)) if ip]
+        with self._lock:
+            if self.stale:
+                self.stale = False
+                self._load(engine, now)
+            db.info[PENDING] = True
+            self._expire(now)
+            roots = set()
+            for key in keys:
+                entry = self.index.get(key)
+                if entry is not None:
+                    root = self.find(entry[0])
+                    if root is not None:
+                        roots.add(root)
+
+            if not roots:
+                campaign = Campaign(user_id=user_id, prediction=prediction, severity=severity,
+                                    status="Active", alert_count=0, first_seen=now, last_seen=now)
+                db.add(campaign)
+                db.flush()  # assigns the id
+                root = campaign.id
+                self.parent[root] = root
+                self.states[root] = CampaignState(root, now, severity)
+            else:
+                root = max(roots, key=lambda r: (self.states[r].size, -r))
+                for other in roots - {root}:
+                    self.parent[other] = root
+                    self.states[root].absorb(self.states.pop(other))
+                    db.execute(update(Campaign).where(Campaign.id == other)
+                               .values(merged_into=root, status="Merged"))
+
+            state = self.states[root]
+            state.add(src_ip, dst_ip, severity, now)
+            db.execute(update(Campaign).where(Campaign.id == root).values(
+                alert_count=state.size, severity=state.severity, first_seen=state.first_seen,
+                last_seen=state.last_seen, sources=list(state.sources), destinations=list(state.destinations),
+            ))
+            self._touch(root, now)
+            for key in keys:
+                self._index(key, root, now)
+            return root
+
+    # ---------- warm start ----------
+    def rebuild(self, bind=None, now: datetime = None):
+        """Restores the in-window state from the database once, on worker start."""
+        with self._lock:
+            self.stale = False
+            self._load(bind or engine, now or datetime.now(timezone.utc))
+        print(f"Campaign correlator rebuilt: {len(self.states)} active campaign(s), {len(self.index)} keys")
+
+    def _load(self, bind, now: datetime):
+        """Replaces the state with the committed campaigns and alerts inside the window; caller holds the lock."""
+        cutoff = now - self.window
+        with bind.connect() as connection:
+            self._reset()
+            for row in connection.execute(select(Campaign).where(Campaign.last_seen >= cutoff)).mappings():
+                cid = row["id"]
+                self.parent[cid] = row["merged_into"] or cid
+                if row["merged_into"] is None:
+                    self.states[cid] = CampaignState(
+                        cid, _utc(row["first_seen"]), row["severity"], row["sources"] or [], row["destinations"] or [],
+                        size=row["alert_count"],
+                    )
+                    self.states[cid].last_seen = _utc(row["last_seen"])
+            # A merged campaign whose root already left the window is re-rooted on itself
+            for cid, parent in list(self.parent.items()):
+                if parent not in self.parent:
+                    self.parent[cid] = cid
+            stmt = (
+                select(Alert.user_id, Alert.prediction, Alert.src_ip, Alert.dst_ip, Alert.campaign_id, Alert.timestamp)
+                .where(Alert.timestamp >= cutoff, Alert.campaign_id.is_not(None))
+                .order_by(Alert.timestamp)
+            )
+            result = connection.execution_options(stream_results=True, yield_per=10_000).execute(stmt)
+            for user_id, prediction, src_ip, dst_ip, cid, ts in result:
+                root = self.find(cid)
+                if root is None or root not in self.states:
+                    continue
+                ts = _utc(ts)
+                self._touch(root, ts)
+                if cid != root:
+                    self._touch(cid, ts)  # so merged ids leave the parent map with the window
+                for kind, ip in (("src", src_ip), ("dst", dst_ip)):
+                    if ip:
+                        self._index((user_id, prediction, kind, ip), root, ts)
+
+
+correlator = CampaignCorrelator()
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    session.info.pop(PENDING, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _ended(session, transaction):
+    # Still flagged at the end of the outer transaction: rolled back or closed without a commit
+    if transaction.parent is None and session.info.pop(PENDING, None):
+        # Campaign rows or merges from this transaction are gone; resync before the next alert
+        correlator.stale = True
+
+
+# ============================================================
+#  QUERIES
+# ============================================================
+def member_alerts(user_id: int, root: int):
+    """Alerts of the root campaign and of every campaign merged (transitively) into it."""
+    members = (
+        select(Campaign.id).where(Campaign.id == root, Campaign.user_id == user_id)
+        .cte("members", recursive=True)
+    )
+    members = members.union_all(select(Campaign.id).join(members, Campaign.merged_into == members.c.id))
+    return (
+        select(Alert.timestamp, Alert.severity, Alert.campaign_id)
+        .where(Alert.campaign_id.in_(select(members.c.id)))
+        .order_by(Alert.timestamp)
+    )
+
+
+def timeline(db, user_id: int, root: int, max_buckets: int = 60) -> dict:
+    """
+    Alerts of a campaign and of everything merged (transitively) into it:
+    counts per member campaign, and per time bucket with at most `max_buckets`
+    buckets of at least a minute.
+    """
+    rows = db.execute(member_alerts(user_id, root)).all()
+    members = {}
+    buckets = {}
+    if rows:
+        first, last = _utc(rows[0][0]), _utc(rows[-1][0])
+        width = max(60, int((last - first).total_seconds() // max_buckets) + 1)
+        for ts, severity, cid in rows:
+            members[cid] = members.get(cid, 0) + 1
+            index = int((_utc(ts) - first).total_seconds() // width)
+            entry = buckets.get(index)
+            if entry is None:
+                entry = buckets[index] = {"start": first + timedelta(seconds=index * width), "count": 0,
+                                          "by_severity": {}}
+            entry["count"] += 1
+            entry["by_severity"][severity] = entry["by_severity"].get(severity, 0) + 1
+    return {
+        "members": [{"campaign_id": cid, "alerts": n} for cid, n in sorted(members.items())],
+        "timeline": [buckets[i] for i in sorted(buckets)],
+    }
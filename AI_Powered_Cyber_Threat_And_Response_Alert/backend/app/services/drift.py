@@ -0,0 +1,336 @@
+"""
+Feature drift monitor on the inference stream.
+
+Every row the model scores is also counted into fixed per-feature histograms
+and compared against the same histograms over the training data:
+
+    numeric      BINS bins in the preprocessor's MinMaxScaler space, plus an
+                 underflow and an overflow bin for values outside the
+                 training range. Features spanning several orders of
+                 magnitude (bytes, loads) get log-spaced edges, so the bulk
+                 of the traffic is not all in bin 0
+    categorical  frequency of each OneHotEncoder category, plus "other" for
+                 categories never seen in training
+
+    PSI   sum (p - q) * ln(p / q) over bins; < 0.1 stable, 0.1-0.25 shifting,
+          > 0.25 drifted (the usual credit-scoring thresholds)
+    KS    max |CDF_live - CDF_train| over bin edges (numeric only)
+
+The hot path only copies the encoded row into a preallocated buffer. Every
+DRIFT_BATCH rows, the whole buffer is binned with a few numpy operations.
+Counts decay with a half-life of DRIFT_HALF_LIFE_FLOWS rows, so the
+histograms follow the recent mix. Memory is fixed: one count array per
+feature. State is per worker.
+
+Build the baseline once per trained model (the chunked reader never holds
+the dataset in memory):
+    python -m app.services.drift baseline ../ml_engine/data/processed/cleaned_data.parquet
+    python -m app.services.drift baseline ../ml_engine/data/raw/UNSW-NB15_1.csv ...
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from app.core.config import settings
+from app.core.metrics import DRIFT_PSI, DRIFT_KS, DRIFT_ROWS
+from app.schemas.traffic import TrafficData
+
+BINS = 20
+LOG_SPAN = 1000  # Ranges wider than this times the minimum (or 1) get log-spaced bins
+PSI_SHIFTING = 0.1
+PSI_DRIFTED = 0.25
+EPSILON = 1e-4  # Floor on bin shares so empty bins do not make PSI infinite
+
+# Raw UNSW-NB15 CSVs are headerless; TrafficData lists the first 47 columns in file order
+RAW_COLUMNS = [name for name in TrafficData.model_fields if name != "simulation"] + ["attack_cat", "Label"]
+
+
+def baseline_path() -> str:
+    # ml_service imports this module, so its MODEL_PATH is looked up late
+    from app.services.ml_service import MODEL_PATH
+    return settings.DRIFT_BASELINE_PATH or os.path.join(MODEL_PATH, "drift_baseline.json")
+
+
+class FeatureLayout:
+    """Where each raw feature sits in the encoded row, and its bin edges."""
+
+    def __init__(self, preprocessor):
+        import numpy as np
+
+        self.numeric, self.numeric_columns, edges = [], [], []
+        self.categorical, self.category_values, self.category_columns = [], [], []
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == "num":
+                for i, feature in enumerate(columns):
+                    self.numeric.append(feature)
+                    self.numeric_columns.append(offset + i)
+                    edges.append(self._edges(transformer.data_min_[i], transformer.data_max_[i]))
+                offset += len(columns)
+            elif name == "cat":
+                for feature, categories in zip(columns, transformer.categories_):
+                    self.categorical.append(feature)
+                    self.category_values.append([str(c) for c in categories])
+                    self.category_columns.append(list(range(offset, offset + len(categories))))
+                    offset += len(categories)
+        # (numeric features, BINS + 1) edges in scaled space; bin k is [edge k-1, edge k)
+        self.edges = np.array(edges)
+
+    @staticmethod
+    def _edges(low: float, high: float):
+        import numpy as np
+
+        if high <= low:
+            return np.linspace(0.0, 1.0, BINS + 1)
+        if low >= 0 and high - low > LOG_SPAN * max(low, 1.0):
+            raw = np.expm1(np.linspace(np.log1p(low), np.log1p(high), BINS + 1))
+            scaled = (raw - low) / (high - low)
+        else:
+            scaled = np.linspace(0.0, 1.0, BINS + 1)
+        scaled[0], scaled[-1] = 0.0, np.nextafter(1.0, 2.0)  # the training max lands in the last bin
+        return scaled
+
+    def empty_counts(self):
+        import numpy as np
+
+        return (
+            np.zeros((len(self.numeric), BINS + 2)),
+            [np.zeros(len(values) + 1) for values in self.category_values],  # last slot: "other"
+        )
+
+    def count(self, encoded, numeric_counts, category_counts, weight: float = 1.0):
+        """Adds the rows of an encoded batch to the counts, in place."""
+        import numpy as np
+
+        values = encoded[:, self.numeric_columns]
+        # Bin index 0 = underflow, 1..BINS, BINS + 1 = overflow
+        index = (values[:, :, None] >= self.edges[None, :, :]).sum(axis=2)
+        flat = (np.arange(len(self.numeric)) * (BINS + 2))[None, :] + index
+        numeric_counts += weight * np.bincount(flat.ravel(), minlength=numeric_counts.size).reshape(
+            numeric_counts.shape
+        )
+        for columns, counts in zip(self.category_columns, category_counts):
+            hits = encoded[:, columns].sum(axis=0)
+            counts[:-1] += weight * hits
+            counts[-1] += weight * (len(encoded) - hits.sum())
+
+
+def _shares(counts):
+    import numpy as np
+
+    total = counts.sum(axis=-1, keepdims=True)
+    return np.maximum(counts / np.maximum(total, 1e-12), EPSILON)
+
+
+def psi(live, baseline):
+    import numpy as np
+
+    p, q = _shares(live), _shares(baseline)
+    return ((p - q) * np.log(p / q)).sum(axis=-1)
+
+
+def ks(live, baseline):
+    import numpy as np
+
+    def cdf(c):
+        return np.cumsum(c, axis=-1) / np.maximum(c.sum(axis=-1, keepdims=True), 1e-12)
+
+    return np.abs(cdf(live) - cdf(baseline)).max(axis=-1)
+
+
+def _status(value: float) -> str:
+    return "drifted" if value > PSI_DRIFTED else "shifting" if value > PSI_SHIFTING else "stable"
+
+
+# ============================================================
+#  LIVE MONITOR
+# ============================================================
+class DriftMonitor:
+    def __init__(self, batch: int = None, half_life: float = None):
+        self.batch = batch or settings.DRIFT_BATCH
+        self.half_life = half_life or settings.DRIFT_HALF_LIFE_FLOWS
+        self.layout = None
+        self.baseline = None
+        self.baseline_error = None
+        self._preprocessor = None
+        self._buffer = None
+        self._buffered = 0
+        self._numeric = self._categorical = None
+        self.rows = 0.0  # decayed row count behind the current histograms
+        self._lock = threading.Lock()
+
+    def _setup(self, preprocessor, width: int):
+        import numpy as np
+
+        self.layout = FeatureLayout(preprocessor)
+        self._numeric, self._categorical = self.layout.empty_counts()
+        self._buffer = np.empty((self.batch, width))
+        self._buffered = 0
+        self.rows = 0.0
+        self._preprocessor = preprocessor
+        self.baseline, self.baseline_error = load_baseline(self.layout)
+
+    def observe(self, encoded, preprocessor):
+        """Called by the model with the encoded rows it just scored; copies them into the buffer."""
+        with self._lock:
+            if preprocessor is not self._preprocessor:
+                self._setup(preprocessor, encoded.shape[1])
+            for row in encoded:
+                self._buffer[self._buffered] = row
+                self._buffered += 1
+                if self._buffered == self.batch:
+                    self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        n = self._buffered
+        decay = 0.5 ** (n / self.half_life)
+        self._numeric *= decay
+        for counts in self._categorical:
+            counts *= decay
+        self.layout.count(self._buffer[:n], self._numeric, self._categorical)
+        self.rows = self.rows * decay + n
+        self._buffered = 0
+        self._publish()
+
+    def _publish(self):
+        if self.baseline is None:
+            return
+        DRIFT_ROWS.set(value=round(self.rows, 1))
+        numeric_psi = psi(self._numeric, self.baseline["numeric"])
+        numeric_ks = ks(self._numeric, self.baseline["numeric"])
+        for feature, p, k in zip(self.layout.numeric, numeric_psi, numeric_ks):
+            DRIFT_PSI.set(feature, value=round(float(p), 4))
+            DRIFT_KS.set(feature, value=round(float(k), 4))
+        for feature, live, base in zip(self.layout.categorical, self._categorical, self.baseline["categorical"]):
+            DRIFT_PSI.set(feature, value=round(float(psi(live, base)), 4))
+
+    def report(self) -> dict:
+        """PSI/KS per feature against the baseline, worst first. Flushes the partial buffer first."""
+        with self._lock:
+            if self.layout is None:
+                return {"status": "no_data", "detail": "No rows scored by the model on this worker yet"}
+            self._flush()
+            if self.baseline is None:
+                # Picks up a baseline built after this worker started
+                self.baseline, self.baseline_error = load_baseline(self.layout)
+            if self.baseline is None:
+                return {"status": "no_baseline", "detail": self.baseline_error, "rows": round(self.rows, 1)}
+            features = []
+            numeric_psi = psi(self._numeric, self.baseline["numeric"])
+            numeric_ks = ks(self._numeric, self.baseline["numeric"])
+            for feature, p, k in zip(self.layout.numeric, numeric_psi, numeric_ks):
+                features.append({"feature": feature, "kind": "numeric", "psi": round(float(p), 4),
+                                 "ks": round(float(k), 4), "status": _status(p)})
+            for feature, values, live, base in zip(self.layout.categorical, self.layout.category_values,
+                                                   self._categorical, self.baseline["categorical"]):
+                p = float(psi(live, base))
+                shares = _shares(live)
+                top = sorted(zip(values + ["other"], shares), key=lambda item: -item[1])[:5]
+                features.append({"feature": feature, "kind": "categorical", "psi": round(p, 4), "ks": None,
+                                 "status": _status(p), "top": {v: round(float(s), 4) for v, s in top}})
+            rows = self.rows
+        features.sort(key=lambda f: -f["psi"])
+        enough = rows >= settings.DRIFT_MIN_ROWS
+        drifted = [f["feature"] for f in features if f["status"] == "drifted"]
+        return {
+            "status": ("drifted" if drifted else "stable") if enough else "warming_up",
+            "rows": round(rows, 1),
+            "min_rows": settings.DRIFT_MIN_ROWS,
+            "half_life_rows": self.half_life,
+            "drifted": drifted,
+            "features": features,
+        }
+
+
+# ============================================================
+#  BASELINE
+# ============================================================
+def load_baseline(layout: FeatureLayout, path: str = None):
+    """(baseline counts, None) or (None, reason) if missing or built for another preprocessor."""
+    import numpy as np
+
+    path = path or baseline_path()
+    if not os.path.exists(path):
+        return None, f"No baseline at {path}; build it with `python -m app.services.drift baseline <data>`"
+    with open(path) as f:
+        stored = json.load(f)
+    if (stored.get("numeric_features") != layout.numeric
+            or stored.get("categorical_features") != layout.categorical
+            or stored.get("category_values") != layout.category_values
+            or not np.allclose(stored.get("edges"), layout.edges)):
+        return None, f"Baseline at {path} was built for a different preprocessor; rebuild it"
+    return {
+        "numeric": np.array(stored["numeric_counts"]),
+        "categorical": [np.array(c) for c in stored["category_counts"]],
+    }, None
+
+
+def _training_chunks(paths, chunk_rows: int):
+    """DataFrames of cleaned training rows from processed Parquet or raw UNSW-NB15 CSVs."""
+    import pandas as pd
+
+    for path in paths:
+        if path.rstrip("/").endswith(".parquet"):
+            # A single file or the part-file directory written by ml_engine/preprocess.py
+            import pyarrow.dataset as ds
+            for batch in ds.dataset(path, format="parquet").to_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+        else:
+            for chunk in pd.read_csv(path, header=None, names=RAW_COLUMNS, chunksize=chunk_rows, low_memory=False):
+                for column in ("proto", "service", "state"):
+                    chunk[column] = chunk[column].fillna("none").astype(str).str.strip().str.lower()
+                for column in ("ct_flw_http_mthd", "is_ftp_login", "ct_ftp_cmd"):
+                    chunk[column] = pd.to_numeric(chunk[column], errors="coerce").fillna(0).astype(int)
+                yield chunk
+
+
+def build_baseline(paths, out_path: str = None, chunk_rows: int = 200_000) -> dict:
+    from app.services.ml_service import ml_engine
+
+    ml_engine.load()
+    if not ml_engine.ready:
+        raise SystemExit("Model artifacts could not be loaded")
+    layout = FeatureLayout(ml_engine.preprocessor)
+    numeric, categorical = layout.empty_counts()
+    rows = 0
+    started = time.perf_counter()
+    for chunk in _training_chunks(paths, chunk_rows):
+        layout.count(ml_engine.preprocessor.transform(chunk), numeric, categorical)
+        rows += len(chunk)
+        print(f"  {rows:,} rows")
+    out_path = out_path or baseline_path()
+    stored = {
+        "rows": rows,
+        "sources": [os.path.basename(p) for p in paths],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "numeric_features": layout.numeric,
+        "categorical_features": layout.categorical,
+        "category_values": layout.category_values,
+        "edges": layout.edges.tolist(),
+        "numeric_counts": numeric.tolist(),
+        "category_counts": [c.tolist() for c in categorical],
+    }
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stored, f)
+    os.replace(tmp_path, out_path)
+    print(f"Baseline of {rows:,} rows written to {out_path} in {time.perf_counter() - started:.1f}s")
+    return stored
+
+
+drift_monitor = DriftMonitor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feature drift baseline for the current model")
+    sub = parser.add_subparsers(dest="command", required=True)
+    baseline = sub.add_parser("baseline", help="Histogram the training data through the current preprocessor")
+    baseline.add_argument("paths", nargs="+", help="Processed .parquet or raw UNSW-NB15 .csv files")
+    baseline.add_argument("--out", default=None, help="Output JSON (default: DRIFT_BASELINE_PATH or next to the model)")
+    baseline.add_argument("--chunk-rows", type=int, default=200_000)
+    args = parser.parse_args()
+    build_baseline(args.paths, args.out, args.chunk_rows)
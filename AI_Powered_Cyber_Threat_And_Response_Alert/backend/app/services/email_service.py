@@ -1,21 +1,25 @@
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from app.core.config import settings
 import logging
+from functools import lru_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
-)
+@lru_cache(maxsize=1)
+def get_mail_config():
+    """Built on first send rather than at import, so app startup never pays for it."""
+    return ConnectionConfig(
+        MAIL_USERNAME=settings.MAIL_USERNAME,
+        MAIL_PASSWORD=settings.MAIL_PASSWORD,
+        MAIL_FROM=settings.MAIL_FROM,
+        MAIL_PORT=settings.MAIL_PORT,
+        MAIL_SERVER=settings.MAIL_SERVER,
+        MAIL_STARTTLS=True,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True
+    )
 
 async def send_alert_email(recipients: list, data: dict):
     """
@@ -81,7 +85,7 @@ async def send_alert_email(recipients: list, data: dict):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message)
         logger.info(f"📧 Security Alert sent to {len(recipients)} recipients")
 
@@ -117,7 +121,7 @@ async def send_otp_email(email: str, otp: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message)
         logger.info(f"📧 OTP sent to {email}")
 
@@ -153,7 +157,7 @@ async def send_password_reset_email(email: str, otp: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message)
         logger.info(f"📧 Password reset OTP sent to {email}")
 
@@ -190,7 +194,7 @@ async def send_newsletter_subscription_email(email: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message)
         logger.info(f"📧 Newsletter confirmation sent to {email}")
 
@@ -225,7 +229,7 @@ async def send_mock_sms(email: str, message_text: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message)
         logger.info(f"📱 Mock SMS sent to {email}")
 
@@ -0,0 +1,179 @@
+"""
+Per-prediction explanations for the RandomForest.
+
+Path attribution (Saabas): walking a tree from the root to a leaf, every
+split moves the attack probability from the parent node's value to the
+child's. That change is credited to the feature the parent split on. Per
+tree, the leaf value is the root value plus the changes along the path. The
+forest averages its trees, so
+
+    P(attack | x) = bias + sum_f contribution_f(x)
+
+exactly, where bias is the mean root value (the training attack rate).
+
+Nothing per tree is walked in Python. Once per model, every node's change
+(value - parent value) / n_trees is written into one sparse matrix D of shape
+(all nodes of all trees, raw features), a split on a one-hot column counting
+for its raw feature (proto, service, state). For a batch,
+forest.decision_path gives the sparse node indicator P (rows x all nodes),
+and the contributions are the single sparse product P @ D. Compressed flat
+forests (flat_forest.py) number their nodes the same way and have their own
+decision_path, so they are explained the same way.
+
+Explanations are only computed when an analyst opens an alert, never at
+ingest, and are cached per (model, alert id). Ingest only stores the flow's
+features on threat alerts (Alert.features).
+"""
+import threading
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.services.flat_forest import FlatForest, tree_arrays
+from app.services.ml_service import ml_engine
+
+
+class ForestExplainer:
+    def __init__(self, model, preprocessor):
+        import numpy as np
+        from scipy import sparse
+
+        self.model = model
+        self.preprocessor = preprocessor
+
+        # Encoded column -> raw feature it came from
+        raw_names, self.raw_features = self._raw_feature_map(preprocessor)
+        feature_to_raw = np.array([self.raw_features.index(r) for r in raw_names])
+
+        p, left, right, feature, roots = self._nodes(model)
+        rows, cols, deltas = [], [], []
+        for children in (left, right):
+            internal = np.flatnonzero(children >= 0)
+            child = children[internal]
+            rows.append(child)
+            cols.append(feature_to_raw[feature[internal]])
+            deltas.append((p[child] - p[internal]) / len(roots))
+        self.bias = float(np.mean(p[roots]))
+        self.node_contributions = sparse.csr_matrix(
+            (np.concatenate(deltas), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(p), len(self.raw_features)),
+        )
+
+    @staticmethod
+    def _nodes(model):
+        """Attack probability, children (-1 at leaves) and split feature per node in global ids, plus tree roots."""
+        import numpy as np
+
+        if isinstance(model, FlatForest):
+            leaf = model.is_leaf
+            return (model.value.astype(np.float64), np.where(leaf, -1, model.left), np.where(leaf, -1, model.right),
+                    model.feature, model.roots)
+        positive = list(model.classes_).index(1)
+        columns, roots, offset = [], [], 0
+        for estimator in model.estimators_:
+            tree = tree_arrays(estimator, positive)
+            shift = np.where(tree["left"] >= 0, offset, 0)
+            columns.append((tree["value"], tree["left"] + shift, tree["right"] + shift, tree["feature"]))
+            roots.append(offset)
+            offset += len(tree["left"])
+        return (*(np.concatenate(c) for c in zip(*columns)), np.array(roots))
+
+    @staticmethod
+    def _raw_feature_map(preprocessor):
+        """(raw feature per encoded column, ordered unique raw features)."""
+        encoded = list(preprocessor.get_feature_names_out())
+        categorical = []
+        for name, _, columns in preprocessor.transformers_:
+            if name == "cat":
+                categorical = list(columns)
+        raw = []
+        for column in encoded:
+            _, _, feature = column.partition("__")
+            for category in categorical:
+                if feature.startswith(category + "_"):
+                    feature = category
+                    break
+            raw.append(feature)
+        return raw, list(dict.fromkeys(raw))
+
+    def contributions(self, rows: list):
+        """(contributions matrix rows x raw features, attack probabilities) for a batch of flow dicts."""
+        import pandas as pd
+
+        encoded = self.preprocessor.transform(pd.DataFrame(rows))
+        indicator, _ = self.model.decision_path(encoded)
+        contrib = (indicator @ self.node_contributions).toarray()
+        return contrib, self.bias + contrib.sum(axis=1)
+
+    def explain(self, rows: list, top: int = 10):
+        """Yields one explanation dict per row; the batch is scored at once, dicts are built as consumed."""
+        import numpy as np
+
+        contrib, probability = self.contributions(rows)
+        for i in range(len(rows)):
+            order = np.argsort(-np.abs(contrib[i]))[:top]
+            yield {
+                "model_probability": round(float(probability[i]), 4),
+                "base_rate": round(self.bias, 4),
+                "contributions": [
+                    {
+                        "feature": self.raw_features[j],
+                        "value": rows[i].get(self.raw_features[j]),
+                        "contribution": round(float(contrib[i, j]), 4),
+                    }
+                    for j in order if contrib[i, j] != 0
+                ],
+            }
+
+
+class ExplanationCache:
+    """LRU of explanations by alert id, dropped whenever the served model changes."""
+
+    def __init__(self, size: int = None):
+        self.size = size or settings.EXPLANATION_CACHE_SIZE
+        self._explainer = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _current(self) -> ForestExplainer:
+        if not ml_engine.ready:
+            ml_engine.load()
+        model = ml_engine.model
+        if model is None:
+            raise RuntimeError("Model is not loaded")
+        with self._lock:
+            if self._explainer is None or self._explainer.model is not model:
+                self._explainer = None
+                self._entries.clear()
+        if self._explainer is None:
+            explainer = ForestExplainer(model, ml_engine.preprocessor)  # tens of ms; outside the lock
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = explainer
+        return self._explainer
+
+    def get_many(self, alerts: list, top: int = 10) -> dict:
+        """{alert id: explanation} for alerts with stored features; misses are explained in one batch."""
+        explainer = self._current()
+        found, missing = {}, []
+        with self._lock:
+            for alert in alerts:
+                key = (alert.id, top)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[alert.id] = self._entries[key]
+                    record_cache("explanation", True)
+                elif alert.features:
+                    missing.append(alert)
+                    record_cache("explanation", False)
+        if missing:
+            explained = list(explainer.explain([a.features for a in missing], top=top))
+            with self._lock:
+                for alert, explanation in zip(missing, explained):
+                    found[alert.id] = self._entries[(alert.id, top)] = explanation
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return found
+
+
+explanations = ExplanationCache()
@@ -0,0 +1,209 @@
+"""
+Flat forest: a RandomForest stored as a few column arrays, for fast loading
+and fast per-flow scoring.
+
+File layout (rf_model.flat, written by ml_engine/compress.py):
+
+    header     magic, byte-order marker, nodes, trees, features, max depth,
+               the two class labels                                 (48 bytes)
+    feature    i32[nodes]   split column; leaves point at a padding column
+    threshold  f32[nodes]   go left when x <= threshold
+    left       i32[nodes]   global node ids; a leaf's children are itself
+    right      i32[nodes]
+    value      f32[nodes]   positive-class probability at the node
+    roots      i32[trees]
+
+That is 20 bytes a node, against about 80 in a pickled sklearn tree. The file
+is mmapped and the columns are numpy views over it, so loading reads no data
+up front.
+
+Scoring walks every tree of every row at once. Each step is a few gathers
+over the (tree, row) pairs that have not reached a leaf yet, so a step costs
+what is still active, not the whole forest. There is no per-tree Python loop
+and no per-call input validation, which is where sklearn spends most of a
+single-row predict.
+
+Thresholds are float32, rounded down from sklearn's float64 midpoints.
+sklearn compares float32 inputs, so x <= t64 and x <= floor32(t64) agree for
+every input, and an uncompressed conversion predicts exactly as the original.
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"CTFLATF1"
+HEADER = struct.Struct("=8sIIIIIqq4x")  # magic, byte-order marker, nodes, trees, features, max depth, classes
+BYTE_ORDER_MARK = 0x01020304
+COLUMNS = (("feature", np.int32), ("threshold", np.float32), ("left", np.int32), ("right", np.int32),
+           ("value", np.float32))
+
+
+def node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Depth of every node of one tree (root 0, -1 children for leaves), one level at a time."""
+    depth = np.zeros(len(left), dtype=np.int32)
+    level, d = np.array([0]), 0
+    while level.size:
+        depth[level] = d
+        internal = level[left[level] >= 0]
+        level = np.concatenate([left[internal], right[internal]])
+        d += 1
+    return depth
+
+
+def tree_arrays(estimator, positive: int) -> dict:
+    """One fitted sklearn tree as local arrays: feature, threshold, left, right, value (-1 children = leaf)."""
+    tree = estimator.tree_
+    value = tree.value[:, 0, :]
+    return {
+        "feature": tree.feature.astype(np.int32),
+        "threshold": tree.threshold.copy(),
+        "left": tree.children_left.astype(np.int32),
+        "right": tree.children_right.astype(np.int32),
+        "value": value[:, positive] / value.sum(axis=1),
+    }
+
+
+def _floor_float32(threshold: np.ndarray) -> np.ndarray:
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, n_features: int, max_depth: int, classes):
+        self.feature, self.threshold, self.left, self.right, self.value = feature, threshold, left, right, value
+        self.roots = roots
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+        self.classes_ = np.asarray(classes)
+        self.n_trees = len(roots)
+        self._mm = None
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def is_leaf(self) -> np.ndarray:
+        return self.left == np.arange(self.n_nodes)
+
+    # ============================================================
+    #  BUILD
+    # ============================================================
+    @classmethod
+    def from_trees(cls, trees: list, n_features: int, classes) -> "FlatForest":
+        """Concatenates per-tree local arrays (see tree_arrays) into the flat layout."""
+        columns = {name: [] for name, _ in COLUMNS}
+        roots, offset, max_depth = [], 0, 0
+        for tree in trees:
+            n = len(tree["left"])
+            ids = np.arange(n, dtype=np.int32) + offset
+            leaf = tree["left"] < 0
+            columns["feature"].append(np.where(leaf, n_features, tree["feature"]).astype(np.int32))
+            columns["threshold"].append(np.where(leaf, np.float32(np.inf), _floor_float32(tree["threshold"])))
+            columns["left"].append(np.where(leaf, ids, tree["left"] + offset).astype(np.int32))
+            columns["right"].append(np.where(leaf, ids, tree["right"] + offset).astype(np.int32))
+            columns["value"].append(np.asarray(tree["value"], dtype=np.float32))
+            roots.append(offset)
+            max_depth = max(max_depth, int(node_depths(tree["left"], tree["right"]).max()))
+            offset += n
+        arrays = [np.concatenate(columns[name]).astype(dtype) for name, dtype in COLUMNS]
+        return cls(*arrays, np.array(roots, dtype=np.int32), n_features, max_depth, classes)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        positive = list(model.classes_).index(1)
+        return cls.from_trees([tree_arrays(e, positive) for e in model.estimators_], model.n_features_in_,
+                              model.classes_)
+
+    # ============================================================
+    #  FILE
+    # ============================================================
+    def to_bytes(self) -> bytes:
+        header = HEADER.pack(MAGIC, BYTE_ORDER_MARK, self.n_nodes, self.n_trees, self.n_features_in_,
+                             self.max_depth, int(self.classes_[0]), int(self.classes_[1]))
+        return header + b"".join(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes()
+                                 for name, dtype in COLUMNS) + self.roots.astype(np.int32).tobytes()
+
+    def save(self, path: str) -> int:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bom, nodes, trees, features, max_depth, class0, class1 = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a flat forest")
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{path} was written on a machine with a different byte order; re-export it here")
+        offset, arrays = HEADER.size, []
+        for _, dtype in COLUMNS:
+            arrays.append(np.frombuffer(mm, dtype=dtype, count=nodes, offset=offset))
+            offset += 4 * nodes
+        roots = np.frombuffer(mm, dtype=np.int32, count=trees, offset=offset)
+        forest = cls(*arrays, roots, features, max_depth, [class0, class1])
+        forest._mm = mm
+        return forest
+
+    # ============================================================
+    #  SCORING (same interface as the sklearn forest where the app uses it)
+    # ============================================================
+    def _padded(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        padded = np.zeros((X.shape[0], self.n_features_in_ + 1), dtype=np.float32)
+        padded[:, :self.n_features_in_] = X
+        return padded
+
+    def _walk(self, X, keep_path: bool = False):
+        """Leaf per (tree, row); with keep_path also every (row, node) passed on the way."""
+        padded = self._padded(X)
+        n_rows, width = padded.shape
+        flat_x = padded.ravel()
+        # Tree-major: position t * n_rows + r is tree t on row r
+        node = np.repeat(self.roots, n_rows)
+        row_offset = np.tile(np.arange(n_rows) * width, self.n_trees)
+        active = np.arange(node.size)
+        path = [(active % n_rows, node.copy())] if keep_path else None
+        for _ in range(self.max_depth):
+            current = node[active]
+            go_left = flat_x[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            if keep_path:
+                path.append((active % n_rows, current))
+            # Only (tree, row) pairs still above a leaf take the next step
+            active = active[self.feature[current] != self.n_features_in_]
+            if not active.size:
+                break
+        return node.reshape(self.n_trees, n_rows), path
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf id within its tree per (row, tree), like RandomForestClassifier.apply."""
+        return (self._walk(X)[0] - self.roots[:, None]).T
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.value[self._walk(X)[0]].mean(axis=0, dtype=np.float64)
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+    def decision_path(self, X):
+        """(rows x nodes sparse indicator, tree offsets), like RandomForestClassifier.decision_path."""
+        from scipy import sparse
+
+        _, path = self._walk(X, keep_path=True)
+        rows = np.concatenate([r for r, _ in path])
+        nodes = np.concatenate([n for _, n in path])
+        indicator = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, nodes)), shape=(np.asarray(X).shape[0], self.n_nodes),
+        )
+        return indicator, np.append(self.roots, self.n_nodes)
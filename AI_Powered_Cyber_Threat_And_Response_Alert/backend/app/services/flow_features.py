@@ -0,0 +1,122 @@
+"""
+Server-side UNSW-NB15 connection-window features.
+
+The `ct_*_src/dst/ltm` features count, among the last WINDOW connections
+ordered by time, those that share a key with the current one (the current
+connection included, so the smallest value is 1):
+
+    ct_srv_src          same service and source address
+    ct_srv_dst          same service and destination address
+    ct_dst_ltm          same destination address
+    ct_src_ltm          same source address
+    ct_src_dport_ltm    same source address and destination port
+    ct_dst_sport_ltm    same destination address and source port
+    ct_dst_src_ltm      same source and destination address
+
+Each tenant (sensor owner) keeps a ring buffer of the last WINDOW
+connections' key hashes and one hash -> count dict per feature. A new flow
+evicts the oldest slot (decrementing its counters) and increments its own,
+so an update is O(1) and a window holds at most WINDOW entries per counter,
+whatever the traffic volume.
+
+The windows live in the worker process and count flows in arrival order.
+Each sensor should post to one worker (sticky routing), so a sensor's
+flows reach the same window.
+
+Per-flow content features (ct_state_ttl, ct_flw_http_mthd, is_ftp_login,
+ct_ftp_cmd) cannot be derived from flow headers. They come from the sensor
+as before and default to 0.
+"""
+import threading
+from array import array
+
+WINDOW = 100
+
+# feature -> fields whose values form the key
+WINDOW_FEATURES = (
+    ("ct_srv_src", ("service", "srcip")),
+    ("ct_srv_dst", ("service", "dstip")),
+    ("ct_dst_ltm", ("dstip",)),
+    ("ct_src_ltm", ("srcip",)),
+    ("ct_src_dport_ltm", ("srcip", "dsport")),
+    ("ct_dst_sport_ltm", ("dstip", "sport")),
+    ("ct_dst_src_ltm", ("srcip", "dstip")),
+)
+FEATURE_NAMES = tuple(name for name, _ in WINDOW_FEATURES)
+
+
+class ConnectionWindow:
+    """Counts over the last `size` connections of one tenant."""
+
+    __slots__ = ("size", "ring", "filled", "head", "counters", "lock")
+
+    def __init__(self, size: int = WINDOW):
+        self.size = size
+        width = len(WINDOW_FEATURES)
+        self.ring = array("q", bytes(8 * size * width))  # key hashes, `width` per slot
+        self.filled = 0
+        self.head = 0
+        self.counters = [{} for _ in range(width)]
+        self.lock = threading.Lock()
+
+    def add(self, flow: dict) -> dict:
+        """Pushes one connection and returns its ct_* values."""
+        # The feature index is part of the hash so equal values in different features never share a counter
+        hashes = [
+            hash((i, *(flow[field] for field in fields))) for i, (_, fields) in enumerate(WINDOW_FEATURES)
+        ]
+        width = len(hashes)
+        out = {}
+        with self.lock:
+            base = self.head * width
+            if self.filled == self.size:
+                for i, counter in enumerate(self.counters):
+                    old = self.ring[base + i]
+                    left = counter[old] - 1
+                    if left:
+                        counter[old] = left
+                    else:
+                        del counter[old]
+            else:
+                self.filled += 1
+            for i, (h, counter) in enumerate(zip(hashes, self.counters)):
+                self.ring[base + i] = h
+                count = counter.get(h, 0) + 1
+                counter[h] = count
+                out[FEATURE_NAMES[i]] = count
+            self.head = (self.head + 1) % self.size
+        return out
+
+
+class FlowFeatureEngine:
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self.tenants = {}
+        self._lock = threading.Lock()
+
+    def _window(self, tenant_id) -> ConnectionWindow:
+        window = self.tenants.get(tenant_id)
+        if window is None:
+            with self._lock:
+                window = self.tenants.setdefault(tenant_id, ConnectionWindow(self.window))
+        return window
+
+    def extract(self, tenant_id, flow: dict) -> dict:
+        """
+        Completes a basic flow record (RawFlow fields) into a full TrafficData
+        feature dict, updating the tenant's window.
+        """
+        features = dict(flow)
+        features.update(self._window(tenant_id).add(flow))
+        features["is_sm_ips_ports"] = int(flow["srcip"] == flow["dstip"] and flow["sport"] == flow["dsport"])
+        return features
+
+    def reset(self, tenant_id=None):
+        with self._lock:
+            if tenant_id is None:
+                self.tenants = {}
+            else:
+                self.tenants.pop(tenant_id, None)
+
+
+flow_features = FlowFeatureEngine()
@@ -0,0 +1,258 @@
+"""
+Offline GeoIP / ASN enrichment.
+
+The range database is one binary file (GEOIP_DB_PATH) with sorted,
+non-overlapping [start, end] address ranges stored column by column:
+
+    header   magic, byte-order marker, v4 count, v6 count          (32 bytes)
+    v4       starts u32[n] | ends u32[n] | asn u32[n] | country 2s[n]
+    v6       starts 16s[n] | ends 16s[n] | asn u32[n] | country 2s[n]
+
+It is opened read-only with mmap, so every worker on a host shares the
+same page-cache pages; nothing is copied into the Python heap. A lookup is
+a bisect over the starts column. IPv4 starts are read through a
+memoryview cast, about 0.5 microseconds; IPv6 starts are big-endian 16-byte strings,
+so bytes comparison is numeric comparison. An LRU cache sits in front
+because ingest and export see the same few thousand source IPs over and
+over.
+
+Build the file from the free iptoasn.com dump (ip2asn-combined.tsv[.gz]):
+    python -m app.services.geoip build ip2asn-combined.tsv.gz
+    python -m app.services.geoip lookup 8.8.8.8
+
+The builder writes a temp file and renames it over the old one. Workers
+notice the new mtime (see main.lifespan) and remap; lookups already running
+keep the old mapping, which stays valid until it is closed.
+"""
+import argparse
+import gzip
+import mmap
+import os
+import socket
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+
+MAGIC = b"CTGEOIP1"
+HEADER = struct.Struct("=8sIII12x")  # magic, byte-order marker, v4 count, v6 count
+BYTE_ORDER_MARK = 0x01020304
+UNKNOWN_COUNTRY = b"--"
+
+
+class GeoRecord(NamedTuple):
+    country: Optional[str]  # ISO 3166 alpha-2, e.g. "DE"
+    asn: Optional[int]
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _Fixed16:
+    """Read-only sequence view of n 16-byte items, so bisect can walk the IPv6 starts."""
+
+    __slots__ = ("buf", "offset", "n")
+
+    def __init__(self, buf, offset: int, n: int):
+        self.buf, self.offset, self.n = buf, offset, n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i: int) -> bytes:
+        at = self.offset + 16 * i
+        return self.buf[at:at + 16]
+
+
+# ============================================================
+#  READER
+# ============================================================
+class GeoTable:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bom, n4, n6 = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a GeoIP range table")
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{path} was built on a machine with a different byte order; rebuild it here")
+        view = memoryview(self._mm)
+        offset = HEADER.size
+        self.v4_count, self.v6_count = n4, n6
+
+        self._v4_starts = view[offset:offset + 4 * n4].cast("I")
+        self._v4_ends = view[offset + 4 * n4:offset + 8 * n4].cast("I")
+        self._v4_asn = view[offset + 8 * n4:offset + 12 * n4].cast("I")
+        self._v4_country = offset + 12 * n4
+        offset = _align(offset + 14 * n4)
+
+        self._v6_starts = _Fixed16(self._mm, offset, n6)
+        self._v6_ends = _Fixed16(self._mm, offset + 16 * n6, n6)
+        self._v6_asn = view[offset + 32 * n6:offset + 36 * n6].cast("I")
+        self._v6_country = offset + 36 * n6
+
+    def _record(self, asn_column, country_offset: int, i: int) -> GeoRecord:
+        at = country_offset + 2 * i
+        country = self._mm[at:at + 2]
+        return GeoRecord(
+            None if country == UNKNOWN_COUNTRY else country.decode("ascii"),
+            asn_column[i] or None,
+        )
+
+    def lookup(self, ip: str) -> Optional[GeoRecord]:
+        try:
+            if ":" in ip:
+                packed = socket.inet_pton(socket.AF_INET6, ip)
+                i = bisect_right(self._v6_starts, packed) - 1
+                if i >= 0 and packed <= self._v6_ends[i]:
+                    return self._record(self._v6_asn, self._v6_country, i)
+            else:
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+                i = bisect_right(self._v4_starts, value) - 1
+                if i >= 0 and value <= self._v4_ends[i]:
+                    return self._record(self._v4_asn, self._v4_country, i)
+        except (OSError, TypeError):
+            pass
+        return None
+
+
+# ============================================================
+#  BUILDER
+# ============================================================
+def read_ip2asn(path: str):
+    """Yields (range_start, range_end, asn, country) from an iptoasn.com TSV dump."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 4 or parts[2] == "0":
+                continue  # "Not routed" ranges carry no information
+            yield parts[0], parts[1], int(parts[2]), parts[3]
+
+
+def build(rows, out_path: str) -> dict:
+    """
+    rows: iterable of (first ip, last ip, asn, country code). Ranges may
+    come in any order. One that overlaps an earlier range is dropped.
+    """
+    v4, v6 = [], []
+    for start, end, asn, country in rows:
+        code = country.strip().upper().encode("ascii", "replace")
+        if len(code) != 2 or code == b"ZZ":
+            code = UNKNOWN_COUNTRY  # iptoasn uses "None" / "ZZ" for unassigned
+        try:
+            if ":" in start:
+                v6.append((socket.inet_pton(socket.AF_INET6, start), socket.inet_pton(socket.AF_INET6, end), asn, code))
+            else:
+                v4.append((int.from_bytes(socket.inet_pton(socket.AF_INET, start), "big"),
+                           int.from_bytes(socket.inet_pton(socket.AF_INET, end), "big"), asn, code))
+        except OSError:
+            continue
+
+    dropped = 0
+    tables = []
+    for ranges in (v4, v6):
+        ranges.sort()
+        kept = []
+        for r in ranges:
+            if r[1] < r[0] or (kept and r[0] <= kept[-1][1]):
+                dropped += 1
+                continue
+            kept.append(r)
+        tables.append(kept)
+    v4, v6 = tables
+
+    tmp_path = out_path + ".tmp"
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, BYTE_ORDER_MARK, len(v4), len(v6)))
+        for column in (0, 1, 2):
+            f.write(array("I", (r[column] for r in v4)).tobytes())
+        f.write(b"".join(r[3] for r in v4))
+        f.write(b"\0" * (_align(f.tell()) - f.tell()))
+        f.write(b"".join(r[0] for r in v6))
+        f.write(b"".join(r[1] for r in v6))
+        f.write(array("I", (r[2] for r in v6)).tobytes())
+        f.write(b"".join(r[3] for r in v6))
+    os.replace(tmp_path, out_path)
+    return {"v4_ranges": len(v4), "v6_ranges": len(v6), "dropped": dropped, "bytes": os.path.getsize(out_path)}
+
+
+# ============================================================
+#  SERVICE
+# ============================================================
+class GeoIP:
+    def __init__(self):
+        self.table = None
+        self._cached_lookup = None
+        self._stamp = None
+        self._reload_lock = threading.Lock()
+
+    def _current_stamp(self):
+        try:
+            st = os.stat(settings.GEOIP_DB_PATH)
+            return st.st_ino, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        with self._reload_lock:
+            stamp = self._current_stamp()
+            if stamp == self._stamp:
+                return
+            table = GeoTable(settings.GEOIP_DB_PATH) if stamp else None
+            # One cache per table, so a rebuilt database never serves stale answers
+            self._cached_lookup = lru_cache(maxsize=settings.GEOIP_CACHE_SIZE)(table.lookup) if table else None
+            self.table = table
+            self._stamp = stamp
+            if table:
+                print(f"GeoIP: mapped {table.v4_count:,} IPv4 and {table.v6_count:,} IPv6 ranges")
+
+    def lookup(self, ip: Optional[str]) -> Optional[GeoRecord]:
+        cached = self._cached_lookup
+        if cached is None or not ip:
+            return None
+        # lru_cache only counts in total; the delta tells this call apart (approximate under threads)
+        hits = cached.cache_info().hits
+        record = cached(ip)
+        record_cache("geoip", cached.cache_info().hits > hits)
+        return record
+
+    def enrich(self, ip: Optional[str]):
+        """(country, asn) for an address; (None, None) when unknown or no database is installed."""
+        record = self.lookup(ip)
+        return (record.country, record.asn) if record else (None, None)
+
+
+geoip = GeoIP()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the GeoIP/ASN range table")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Build the table from an iptoasn.com ip2asn-combined.tsv[.gz] dump")
+    b.add_argument("source")
+    b.add_argument("--out", default=settings.GEOIP_DB_PATH)
+    q = sub.add_parser("lookup", help="Look up addresses in the current table")
+    q.add_argument("ips", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(build(read_ip2asn(args.source), args.out))
+    else:
+        if not os.path.exists(settings.GEOIP_DB_PATH):
+            sys.exit(f"No table at {settings.GEOIP_DB_PATH}; run the build command first")
+        table = GeoTable(settings.GEOIP_DB_PATH)
+        for ip in args.ips:
+            print(ip, table.lookup(ip))
+
+
+if __name__ == "__main__":
+    main()
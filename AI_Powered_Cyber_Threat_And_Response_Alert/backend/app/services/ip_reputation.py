@@ -0,0 +1,257 @@
+"""
+IP reputation prefilter in front of ml_engine.predict.
+
+Allow and deny lists are plain text files, one IPv4 or IPv6 CIDR per line
+with an optional reason after it:
+
+    # comments and blank lines are ignored
+    203.0.113.0/24   tor exit relays
+    2001:db8::/32    bulletproof hosting
+    198.51.100.7     scanner seen in honeypot   (bare address = /32 or /128)
+
+Both lists are merged into one table per address family. The prefixes are
+flattened into sorted, non-overlapping [start, end] intervals, and each
+interval points at the most specific prefix that covers it. So an allowed
+/24 inside a denied /8 wins, and a deny beats an allow of the same prefix.
+A lookup is one bisect over the interval starts, O(log n), a few
+microseconds even with millions of prefixes. All per-prefix data is held in
+flat arrays, not objects; see benchmarks/bench_ip_reputation.py.
+
+Reload is atomic: a new table is built off to the side and swapped in
+with one reference assignment, so concurrent lookups see either the old
+table or the new one, never a half-built one. Every worker polls the file
+mtimes (see main.lifespan), so an edit reaches the whole fleet without a
+restart.
+"""
+import ipaddress
+import os
+import socket
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import NamedTuple, Optional
+
+from app.core.config import settings
+
+ALLOW = "allow"
+DENY = "deny"
+
+
+class Verdict(NamedTuple):
+    action: str      # ALLOW | DENY
+    network: str     # matching prefix, e.g. "203.0.113.0/24"
+    reason: str      # free text from the list file
+
+    def as_result(self) -> dict:
+        """Same shape as MLEngine.predict, so callers can use either."""
+        denied = self.action == DENY
+        return {
+            "is_threat": denied,
+            "prediction": "Attack" if denied else "Normal",
+            "confidence": 1.0 if denied else 0.0,
+            "severity": "Critical" if denied else "Low",
+        }
+
+    def describe(self) -> str:
+        text = f"{self.action}list {self.network}"
+        return f"{text} ({self.reason})" if self.reason else text
+
+
+def parse_cidr(cidr: str):
+    """'203.0.113.9/24' -> (version, first address int, last address int, prefix length)."""
+    addr, _, plen = cidr.partition("/")
+    if ":" in addr:
+        version, bits, packed = 6, 128, socket.inet_pton(socket.AF_INET6, addr)
+    else:
+        version, bits, packed = 4, 32, socket.inet_pton(socket.AF_INET, addr)
+    length = int(plen) if plen else bits
+    if not 0 <= length <= bits:
+        raise ValueError(f"bad prefix length {length}")
+    host_mask = (1 << (bits - length)) - 1
+    first = int.from_bytes(packed, "big") & ~host_mask
+    return version, first, first | host_mask, length
+
+
+class _FamilyTable:
+    """
+    One address family. Prefix data is columnar (no object per prefix);
+    `entries` maps each flattened interval back to its owning prefix.
+    """
+
+    __slots__ = ("version", "starts", "ends", "entries", "p_first", "p_len", "p_action", "p_reason")
+
+    def __init__(self, version: int):
+        self.version = version
+        compact = version == 4
+        # IPv4 fits in 64-bit slots; IPv6 (128-bit) stays in Python lists
+        self.p_first = array("Q") if compact else []
+        self.p_len = bytearray()
+        self.p_action = bytearray()  # 1 = deny, 0 = allow
+        self.p_reason = array("I")
+        self.starts = array("Q") if compact else []
+        self.ends = array("Q") if compact else []
+        self.entries = array("I")
+
+    def add_prefix(self, first: int, length: int, deny: bool, reason_idx: int):
+        self.p_first.append(first)
+        self.p_len.append(length)
+        self.p_action.append(deny)
+        self.p_reason.append(reason_idx)
+
+    def _sorted_prefixes(self):
+        """Prefix indices ordered by (first address, widest first, allow before deny)."""
+        n = len(self.p_len)
+        if self.version == 4 and n:
+            import numpy as np
+            first = np.frombuffer(self.p_first, dtype=np.uint64)
+            length = np.frombuffer(bytes(self.p_len), dtype=np.uint8)
+            action = np.frombuffer(bytes(self.p_action), dtype=np.uint8)
+            return np.lexsort((action, length, first)).tolist()
+        return sorted(range(n), key=lambda i: (self.p_first[i], self.p_len[i], self.p_action[i]))
+
+    def flatten(self):
+        """
+        CIDRs are either nested or disjoint, so a stack sweep over them in
+        sorted order splits them into non-overlapping intervals owned by the
+        innermost prefix. For identical prefixes the deny is pushed last and wins.
+        """
+        bits = 32 if self.version == 4 else 128
+        starts, ends, entries = self.starts, self.ends, self.entries
+
+        def emit(a, b, idx):
+            if a <= b:
+                if entries and entries[-1] == idx and ends[-1] + 1 == a:
+                    ends[-1] = b  # adjacent interval with the same owner: extend it
+                else:
+                    starts.append(a)
+                    ends.append(b)
+                    entries.append(idx)
+
+        stack = []
+        pos = 0
+        for idx in self._sorted_prefixes():
+            start = self.p_first[idx]
+            end = start | ((1 << (bits - self.p_len[idx])) - 1)
+            while stack and stack[-1][0] < start:
+                top_end, top_idx = stack.pop()
+                emit(pos, top_end, top_idx)
+                pos = top_end + 1
+            if stack:
+                emit(pos, start - 1, stack[-1][1])
+            stack.append((end, idx))
+            pos = start
+        while stack:
+            top_end, top_idx = stack.pop()
+            emit(pos, top_end, top_idx)
+            pos = top_end + 1
+
+    def find(self, value: int) -> int:
+        i = bisect_right(self.starts, value) - 1
+        if i >= 0 and value <= self.ends[i]:
+            return self.entries[i]
+        return -1
+
+
+class ReputationTable:
+    def __init__(self):
+        self.v4 = _FamilyTable(4)
+        self.v6 = _FamilyTable(6)
+        self.reasons = []
+        self.prefix_count = 0
+
+    def lookup(self, ip: str) -> Optional[Verdict]:
+        # inet_pton instead of ipaddress.ip_address: ~10x cheaper on the hot path
+        try:
+            if ":" in ip:
+                table, family = self.v6, socket.AF_INET6
+            else:
+                table, family = self.v4, socket.AF_INET
+            packed = socket.inet_pton(family, ip)
+        except (OSError, TypeError):
+            return None
+        idx = table.find(int.from_bytes(packed, "big"))
+        if idx < 0:
+            return None
+        width = 4 if table.version == 4 else 16
+        network = socket.inet_ntop(family, table.p_first[idx].to_bytes(width, "big"))
+        action = DENY if table.p_action[idx] else ALLOW
+        return Verdict(action, f"{network}/{table.p_len[idx]}", self.reasons[table.p_reason[idx]])
+
+
+def build_table(sources) -> ReputationTable:
+    """
+    sources: [(action, iterable of lines)]. Lines are consumed lazily, so a
+    list file is streamed rather than read into memory. Reasons are interned
+    because real lists repeat a handful of them across millions of prefixes.
+    """
+    table = ReputationTable()
+    reason_ids = {}
+    for action, lines in sources:
+        deny = action == DENY
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            # Any whitespace separates the reason (lists are space- or tab-separated)
+            cidr, *rest = line.split(None, 1)
+            try:
+                version, first, _, length = parse_cidr(cidr)
+            except (OSError, ValueError):
+                print(f"IP reputation: skipping invalid {action} entry on line {lineno}: {cidr!r}")
+                continue
+            reason = rest[0].strip() if rest else ""
+            reason_idx = reason_ids.get(reason)
+            if reason_idx is None:
+                reason_idx = reason_ids[reason] = len(table.reasons)
+                table.reasons.append(reason)
+            (table.v4 if version == 4 else table.v6).add_prefix(first, length, deny, reason_idx)
+            table.prefix_count += 1
+    table.v4.flatten()
+    table.v6.flatten()
+    return table
+
+
+# ============================================================
+#  SERVICE
+# ============================================================
+class IPReputation:
+    def __init__(self):
+        self.table = ReputationTable()
+        self.loaded_at = None
+        self._mtimes = None
+        self._reload_lock = threading.Lock()
+
+    def _paths(self):
+        return [(ALLOW, settings.IP_ALLOWLIST_PATH), (DENY, settings.IP_DENYLIST_PATH)]
+
+    def _current_mtimes(self):
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for _, p in self._paths())
+
+    def reload(self) -> dict:
+        """Rebuilds from the list files and swaps the table in atomically."""
+        with self._reload_lock:
+            started = time.perf_counter()
+            mtimes = self._current_mtimes()
+            files = [(action, open(path)) for action, path in self._paths() if os.path.exists(path)]
+            try:
+                table = build_table(files)
+            finally:
+                for _, f in files:
+                    f.close()
+            self.table = table
+            self._mtimes = mtimes
+            self.loaded_at = time.time()
+            elapsed = time.perf_counter() - started
+            print(f"IP reputation: loaded {table.prefix_count:,} prefixes in {elapsed:.2f}s")
+            return {"prefixes": table.prefix_count, "load_seconds": round(elapsed, 3)}
+
+    def reload_if_changed(self):
+        if self._current_mtimes() != self._mtimes:
+            self.reload()
+
+    def lookup(self, ip: str) -> Optional[Verdict]:
+        return self.table.lookup(ip)
+
+
+ip_reputation = IPReputation()
@@ -0,0 +1,327 @@
+"""
+Streaming log analytics behind /api/logs/stats.
+
+Every ingested event (an analyzed flow, an auth event) updates a small
+fixed-size summary per tenant (user):
+
+    - HourlyRing:   event and anomaly counts for the last 24 hours
+    - SpaceSaving:  top talkers by source IP (Metwally et al.), k counters
+    - HyperLogLog:  distinct source IPs, 2^p one-byte registers (~1.6% error at p=12)
+
+Each tenant's memory is bounded (about 4 KB plus k counters), however much
+traffic it sees. Reading the stats costs O(k + 2^p), under a millisecond, not a table scan.
+
+The histogram and source split are an exact sliding 24h window. Top talkers
+and the distinct count are not windowed: they cover everything since the
+last rebuild. The summaries live in the worker process. Events reach them
+through security_log.record().
+
+The summaries are built once from the last 24 hours of the security_logs
+table when a worker starts (see main.lifespan). After that, ingest alone
+keeps them current. Each worker then counts the events it ingested itself.
+With several workers, LOG_STATS_RESYNC_MINUTES repeats the rebuild, so each
+worker also sees the others' events. Events recorded while a rebuild scans
+are journaled and replayed into the new summaries, so none are lost.
+"""
+import hashlib
+import ipaddress
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from app.db.models import SecurityLog
+from app.db.session import engine
+from app.services.geoip import geoip
+
+HOURS = 24
+TOP_K = 64
+HLL_PRECISION = 12
+AVG_EVENT_BYTES = 512  # Rough size of one stored log record, for the "data ingested" tile
+
+SOURCE_TRAFFIC = "Traffic Analysis"
+SOURCE_AUTH = "Auth / Identity"
+# Security log levels counted as threats
+THREAT_LEVELS = ("WARNING", "ERROR")
+
+SOURCE_COLORS = {
+    SOURCE_TRAFFIC: "bg-orange-500",
+    SOURCE_AUTH: "bg-purple-500",
+}
+
+
+def _hour(ts: datetime) -> int:
+    """Hours since the epoch; identifies a ring slot."""
+    return int(ts.timestamp()) // 3600
+
+
+# ============================================================
+#  SKETCHES
+# ============================================================
+class HourlyRing:
+    """Event, threat and per-source counts for the last HOURS hours in fixed slots."""
+
+    __slots__ = ("hours", "counts", "threats", "sources")
+
+    def __init__(self):
+        self.hours = [-1] * HOURS
+        self.counts = [0] * HOURS
+        self.threats = [0] * HOURS
+        self.sources = [{} for _ in range(HOURS)]
+
+    def add(self, ts: datetime, source: str, threat: bool):
+        hour = _hour(ts)
+        slot = hour % HOURS
+        if self.hours[slot] != hour:
+            # Slot still holds an hour from a previous day; recycle it
+            self.hours[slot] = hour
+            self.counts[slot] = 0
+            self.threats[slot] = 0
+            self.sources[slot] = {}
+        self.counts[slot] += 1
+        self.threats[slot] += threat
+        self.sources[slot][source] = self.sources[slot].get(source, 0) + 1
+
+    def series(self, now: datetime):
+        """[(hour_start, count, threats)] oldest first, zeros for empty hours."""
+        current = _hour(now)
+        out = []
+        for hour in range(current - HOURS + 1, current + 1):
+            slot = hour % HOURS
+            if self.hours[slot] == hour:
+                out.append((hour, self.counts[slot], self.threats[slot]))
+            else:
+                out.append((hour, 0, 0))
+        return out
+
+    def source_totals(self, now: datetime) -> dict:
+        current = _hour(now)
+        totals = {}
+        for slot, hour in enumerate(self.hours):
+            if current - HOURS < hour <= current:
+                for source, count in self.sources[slot].items():
+                    totals[source] = totals.get(source, 0) + count
+        return totals
+
+
+class SpaceSaving:
+    """
+    Top-k heavy hitters. Any item whose true count exceeds N/k is guaranteed
+    to be tracked, and each reported count overestimates by at most `error`.
+    """
+
+    __slots__ = ("k", "counts", "errors", "threats")
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+        self.threats = {}
+
+    def add(self, item: str, threat: bool = False):
+        if item in self.counts:
+            self.counts[item] += 1
+        elif len(self.counts) < self.k:
+            self.counts[item] = 1
+            self.errors[item] = 0
+            self.threats[item] = 0
+        else:
+            # Replace the minimum; the newcomer inherits its count as possible error
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            del self.errors[victim], self.threats[victim]
+            self.counts[item] = floor + 1
+            self.errors[item] = floor
+            self.threats[item] = 0
+        self.threats[item] += threat
+
+    def top(self, n: int):
+        """[(item, count, threats)] largest first."""
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(item, count, self.threats[item]) for item, count in ranked]
+
+
+class HyperLogLog:
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item: str):
+        x = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+
+class TenantStats:
+    __slots__ = ("hourly", "talkers", "distinct", "lock")
+
+    def __init__(self):
+        self.hourly = HourlyRing()
+        self.talkers = SpaceSaving()
+        self.distinct = HyperLogLog()
+        self.lock = threading.Lock()
+
+    def add(self, source: str, ip: str, ts: datetime, threat: bool):
+        with self.lock:
+            self.hourly.add(ts, source, threat)
+            if ip:
+                self.talkers.add(ip, threat)
+                self.distinct.add(ip)
+
+
+# ============================================================
+#  REGISTRY
+# ============================================================
+class LogAnalytics:
+    def __init__(self):
+        self.tenants = {}
+        self._lock = threading.Lock()
+        # (tenant, source, ip, ts, threat) recorded while a rebuild scans; None otherwise
+        self._journal = None
+
+    def _tenant(self, tenant_id: int) -> TenantStats:
+        stats = self.tenants.get(tenant_id)
+        if stats is None:
+            with self._lock:
+                stats = self.tenants.setdefault(tenant_id, TenantStats())
+        return stats
+
+    def record(self, tenant_id: int, source: str, ip: str = None, threat: bool = False, ts: datetime = None):
+        """Ingest hook: call once per event (about 5 microseconds)."""
+        if tenant_id is None:
+            return
+        ts = ts or datetime.now(timezone.utc)
+        if self._journal is not None:
+            # Rare (only during a rebuild): journal and count under the lock the swap takes
+            with self._lock:
+                if self._journal is not None:
+                    self._journal.append((tenant_id, source, ip, ts, threat))
+                    self.tenants.setdefault(tenant_id, TenantStats()).add(source, ip, ts, threat)
+                    return
+        self._tenant(tenant_id).add(source, ip, ts, threat)
+
+    def rebuild(self, bind=None, flush=None):
+        """
+        Replaces all summaries with ones built from the last 24h of the
+        security log. `flush` (security_log.flush) runs after journaling
+        starts: queued events written by it are in the scan. Events with a
+        timestamp at or after the cutoff are replayed from the journal.
+        """
+        bind = bind or engine
+        with self._lock:
+            self._journal = []
+        try:
+            cutoff = datetime.now(timezone.utc)
+            if flush is not None:
+                flush()
+            tenants = self._scan(bind, cutoff)
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            for tenant_id, source, ip, ts, threat in self._journal:
+                if ts >= cutoff:
+                    tenants.setdefault(tenant_id, TenantStats()).add(source, ip, ts, threat)
+            self._journal = None
+            self.tenants = tenants
+        print(f"Log analytics rebuilt for {len(tenants)} tenant(s)")
+
+    @staticmethod
+    def _scan(bind, cutoff: datetime) -> dict:
+        tenants = {}
+        stmt = (
+            select(SecurityLog.user_id, SecurityLog.source, SecurityLog.ip, SecurityLog.level, SecurityLog.timestamp)
+            .where(SecurityLog.timestamp >= cutoff - timedelta(hours=HOURS), SecurityLog.timestamp < cutoff)
+        )
+        with bind.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=10_000).execute(stmt)
+            for user_id, source, ip, level, ts in result:
+                if user_id is None:
+                    continue
+                if ts.tzinfo is None:
+                    ts = ts.replace(tzinfo=timezone.utc)
+                stats = tenants.get(user_id)
+                if stats is None:
+                    stats = tenants[user_id] = TenantStats()
+                stats.add(source, ip, ts, level in THREAT_LEVELS)
+        return tenants
+
+    def snapshot(self, tenant_id: int, now: datetime = None, top: int = 5) -> dict:
+        """The /api/logs/stats payload for one tenant."""
+        now = now or datetime.now(timezone.utc)
+        stats = self.tenants.get(tenant_id) or TenantStats()
+        with stats.lock:
+            series = stats.hourly.series(now)
+            sources = stats.hourly.source_totals(now)
+            talkers = stats.talkers.top(top)
+            distinct = stats.distinct.count()
+
+        counts = [c for _, c, _ in series]
+        mean = sum(counts) / HOURS
+        std = math.sqrt(sum((c - mean) ** 2 for c in counts) / HOURS)
+        histogram = [
+            {
+                "label": f"{datetime.fromtimestamp(hour * 3600, timezone.utc):%H}:00",
+                "value": count,
+                # Spike against the rest of the day, or an hour dominated by threats
+                "isAnomaly": count >= 10 and (count > mean + 3 * std or threats > count / 2),
+            }
+            for hour, count, threats in series
+        ]
+        total = sum(counts)
+
+        return {
+            "total_events": total,
+            "data_ingested": f"{round(total * AVG_EVENT_BYTES / 1e9, 2)} GB",
+            "anomalies": sum(h["isAnomaly"] for h in histogram),
+            "unique_sources": distinct,
+            "histogram": histogram,
+            "sources": [
+                {"label": label, "count": count, "color": SOURCE_COLORS.get(label, "bg-blue-500")}
+                for label, count in sorted(sources.items(), key=lambda kv: kv[1], reverse=True)
+            ],
+            "top_talkers": [
+                {"ip": ip, **_origin(ip), "requests": count, "risk": _risk(threats / count)}
+                for ip, count, threats in talkers
+            ],
+        }
+
+
+def _origin(ip: str) -> dict:
+    """Country code and ASN from the GeoIP table; private and unlisted addresses fall back to a scope."""
+    country, asn = geoip.enrich(ip)
+    if country is None:
+        try:
+            country = "Internal" if ipaddress.ip_address(ip).is_private else "Unknown"
+        except ValueError:
+            country = "Unknown"
+    return {"country": country, "asn": asn}
+
+
+def _risk(threat_ratio: float) -> str:
+    if threat_ratio >= 0.75:
+        return "Critical"
+    if threat_ratio >= 0.5:
+        return "High"
+    if threat_ratio >= 0.2:
+        return "Medium"
+    return "Low"
+
+
+log_analytics = LogAnalytics()
@@ -1,25 +1,117 @@
 import joblib
-import pandas as pd
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.metrics import STAGE_LATENCY, INFERENCE_BATCH
+from app.services.drift import drift_monitor
+from app.services.flat_forest import FlatForest
 
 # Path to the ml_engine folder (Sibling to backend)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "../../../ml_engine/models")
+REGISTRY_PATH = os.path.join(MODEL_PATH, "registry")
+
+
+def resolve_model_dir() -> tuple:
+    """(directory holding rf_model/preprocessor, registry version or None)."""
+    version = settings.MODEL_VERSION
+    if not version:
+        try:
+            with open(os.path.join(REGISTRY_PATH, "CURRENT")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return MODEL_PATH, None
+    return os.path.join(REGISTRY_PATH, version), version
+
 
 class MLEngine:
     def __init__(self):
+        # Nothing is read from disk here: importing the app must stay cheap.
+        # Artifacts load on warm_up() (app startup) or on the first predict().
+        self.model = None
+        self.preprocessor = None
+        self.ready = False
+        self.version = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(model_dir: str) -> tuple:
+        # Imported before the threads start: two unpicklers importing sklearn at once can
+        # see its modules half-initialised (circular import error)
+        import sklearn.compose, sklearn.ensemble  # noqa: F401
+        # Both files are independent; joblib/numpy release the GIL while reading
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # Compressed exports (ml_engine/compress.py) ship a flat forest instead of the pickle
+            flat_file = os.path.join(model_dir, "rf_model.flat")
+            if os.path.exists(flat_file):
+                model = pool.submit(FlatForest.load, flat_file)
+            else:
+                model = pool.submit(joblib.load, os.path.join(model_dir, "rf_model.joblib"))
+            preprocessor = pool.submit(joblib.load, os.path.join(model_dir, "preprocessor.joblib"))
+            return model.result(), preprocessor.result()
+
+    def load(self):
+        with self._lock:
+            if self.ready:
+                return
+            started = time.perf_counter()
+            try:
+                model_dir, version = resolve_model_dir()
+                print(f"Loading models from {model_dir}...")
+                self.model, self.preprocessor = self._read(model_dir)
+                self.version = version
+                self.ready = True
+                self.load_seconds = time.perf_counter() - started
+                print(f"Models loaded in {self.load_seconds:.2f}s")
+            except Exception as e:
+                print(f"Error loading models: {e}")
+
+    def refresh(self) -> bool:
+        """Swaps in a newly promoted registry version; requests keep using the old one until then."""
+        if not self.ready:
+            return False
+        model_dir, version = resolve_model_dir()
+        if version == self.version:
+            return False
+        model, preprocessor = self._read(model_dir)
+        with self._lock:
+            self.model, self.preprocessor, self.version = model, preprocessor, version
+        print(f"Now serving model version {version}")
+        return True
+
+    def warm_up(self):
+        """Loads artifacts and runs one throwaway prediction so the first real request is not the slow one."""
+        self.load()
+        if not self.ready:
+            return
         try:
-            print(f"Loading models from {MODEL_PATH}...")
-            self.model = joblib.load(os.path.join(MODEL_PATH, "rf_model.joblib"))
-            self.preprocessor = joblib.load(os.path.join(MODEL_PATH, "preprocessor.joblib"))
+            import pandas as pd
+            columns = list(getattr(self.preprocessor, "feature_names_in_", []))
+            row = {c: ("none" if c in ("proto", "service", "state") else 0) for c in columns}
+            self.model.predict_proba(self.preprocessor.transform(pd.DataFrame([row])))
         except Exception as e:
-            print(f"Error loading models: {e}")
+            print(f"Model warm-up prediction skipped: {e}")
 
     def predict(self, data: dict):
-        df = pd.DataFrame([data])
-        processed = self.preprocessor.transform(df)
-        pred = self.model.predict(processed)[0]
-        prob = self.model.predict_proba(processed)[0][1]
+        if not self.ready:
+            self.load()
+        # pandas costs ~0.3s to import; deferring it keeps worker boot fast (warm_up imports it early)
+        import pandas as pd
+        # One pair for the whole call, even if refresh() swaps versions meanwhile
+        model, preprocessor = self.model, self.preprocessor
+        with STAGE_LATENCY.time("encode"):
+            df = pd.DataFrame([data])
+            processed = preprocessor.transform(df)
+        with STAGE_LATENCY.time("inference"):
+            pred = model.predict(processed)[0]
+            prob = model.predict_proba(processed)[0][1]
+        INFERENCE_BATCH.observe("rf", value=len(df))
+        if not data.get('simulation'):
+            # Copies the row into the drift buffer; histograms update once per DRIFT_BATCH rows
+            drift_monitor.observe(processed, preprocessor)
 
         if data.get('simulation'):
             # Override for Demo Simulation - Randomize for "Real-Time" feel
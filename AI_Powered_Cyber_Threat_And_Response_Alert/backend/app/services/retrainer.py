@@ -0,0 +1,283 @@
+"""
+Retraining from analyst feedback.
+
+Two remediation actions are verdicts: "Approve" (run the playbook) confirms
+an attack and "FalsePositive" (Threats page) calls the flow benign. "Stop"
+only halts a playbook and says nothing about the flow. record_feedback()
+stores each verdict in alert_feedback together with the features the alert
+was scored on (Alert.features; threat alerts only, see analyze). Only the
+signed-in owner of an alert can act on it. An alert acted on twice keeps its
+latest verdict.
+
+Once RETRAIN_MIN_FEEDBACK new labeled alerts have accumulated, a retrain runs
+in its own process (python -m app.services.retrainer run), so fitting never
+competes with request handling:
+
+    - base: the served forest's original trees. Trees added by an earlier
+      retrain are dropped, so the forest stays at base + RETRAIN_TREES
+      instead of growing every round.
+    - warm start: RETRAIN_TREES new trees are fitted on the most recent
+      RETRAIN_WINDOW labeled alerts (20% held out). The original trees are
+      not refitted.
+    - publish: the result becomes ml_engine/models/registry/<version>/
+      (rf_model.joblib, preprocessor.joblib, manifest.json). It is promoted
+      (registry/CURRENT) only when RETRAIN_PROMOTE is set (off by default)
+      and it passes two checks. It must be at least as accurate as the
+      served model on the held-out feedback; a window too small for a
+      holdout never promotes. Its accuracy on the original test split
+      (ml_engine/models/encoded/test) must also be within
+      RETRAIN_MAX_TEST_DROP of the served model's.
+
+Workers poll CURRENT every MODEL_POLL_SECONDS and swap the new version in
+(ml_engine.refresh). A file lock in the registry makes sure only one
+retrain runs at a time, however many workers ask for one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.models import AlertFeedback
+from app.db.session import SessionLocal
+from app.services.ml_service import MODEL_PATH, REGISTRY_PATH, MLEngine, ml_engine, resolve_model_dir
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ML_ENGINE_DIR = os.path.normpath(os.path.join(MODEL_PATH, ".."))
+LOCK_FILE = os.path.join(REGISTRY_PATH, ".retrain.lock")
+
+# Remediation action -> label; Stop/Retry/Rollback say nothing about the verdict
+FEEDBACK_LABELS = {"Approve": 1, "FalsePositive": 0}
+MIN_PER_CLASS = 10  # New trees need both verdicts to learn from
+
+
+def record_feedback(db, alert, action: str):
+    """Adds or updates the alert's feedback row; the caller commits."""
+    label = FEEDBACK_LABELS.get(action)
+    if label is None:
+        return None
+    feedback = db.query(AlertFeedback).filter(AlertFeedback.alert_id == alert.id).first()
+    if feedback is None:
+        feedback = AlertFeedback(alert_id=alert.id, user_id=alert.user_id, prediction=alert.prediction)
+        db.add(feedback)
+    feedback.action = action
+    feedback.label = label
+    feedback.features = alert.features
+    feedback.created_at = datetime.now(timezone.utc)
+    # A changed verdict counts as new
+    feedback.model_version = None
+    return feedback
+
+
+def pending_count(db) -> int:
+    return db.query(func.count(AlertFeedback.id)).filter(
+        AlertFeedback.model_version.is_(None), AlertFeedback.features.isnot(None)
+    ).scalar()
+
+
+# ============================================================
+#  RETRAIN (own process)
+# ============================================================
+def _load_window(db, limit: int) -> list:
+    return (
+        db.query(AlertFeedback)
+        .filter(AlertFeedback.features.isnot(None))
+        .order_by(AlertFeedback.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _publish(model, preprocessor_file: str, manifest: dict) -> str:
+    import joblib
+
+    version = manifest["version"]
+    path = os.path.join(REGISTRY_PATH, version)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    joblib.dump(model, os.path.join(tmp_path, "rf_model.joblib"))
+    shutil.copy2(preprocessor_file, os.path.join(tmp_path, "preprocessor.joblib"))
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _promote(version: str):
+    tmp_path = os.path.join(REGISTRY_PATH, "CURRENT.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(REGISTRY_PATH, "CURRENT"))
+
+
+def _test_accuracy(models: list, rows: int) -> tuple:
+    """(accuracy per model on the first rows of the original test split, rows used); Nones without the split."""
+    import numpy as np
+
+    if ML_ENGINE_DIR not in sys.path:
+        sys.path.append(ML_ENGINE_DIR)
+    from artifacts import load_split
+
+    try:
+        test = load_split("test")
+    except FileNotFoundError as e:
+        print(f"Retrain: {e}")
+        return [None] * len(models), 0
+    rows = min(rows, len(test))
+    correct = [0] * len(models)
+    for start in range(0, rows, 50_000):
+        stop = min(start + 50_000, rows)
+        X, y = test.dense(start, stop), np.asarray(test.y[start:stop])
+        for i, model in enumerate(models):
+            correct[i] += int((model.predict(X) == y).sum())
+    return [c / rows if rows else None for c in correct], rows
+
+
+def retrain(force: bool = False) -> dict:
+    import fcntl
+    import joblib
+    import numpy as np
+    import pandas as pd
+
+    os.makedirs(REGISTRY_PATH, exist_ok=True)
+    with open(LOCK_FILE, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return {"skipped": "another retrain is running"}
+
+        db = SessionLocal()
+        try:
+            pending = pending_count(db)
+            if not force and pending < settings.RETRAIN_MIN_FEEDBACK:
+                return {"skipped": f"{pending} new labeled alert(s), need {settings.RETRAIN_MIN_FEEDBACK}"}
+            window = _load_window(db, settings.RETRAIN_WINDOW)
+            labels = np.array([f.label for f in window])
+            if min((labels == 0).sum(), (labels == 1).sum()) < MIN_PER_CLASS:
+                return {"skipped": f"need {MIN_PER_CLASS} of each verdict in the window"}
+
+            started = time.perf_counter()
+            model_dir, served_version = resolve_model_dir()
+            manifest_file = os.path.join(model_dir, "manifest.json")
+            manifest = {}
+            if os.path.exists(manifest_file):
+                with open(manifest_file) as f:
+                    manifest = json.load(f)
+            # A compressed (flat) export cannot be warm-started; fall back to the trained pickle
+            source_dir = model_dir if os.path.exists(os.path.join(model_dir, "rf_model.joblib")) else MODEL_PATH
+            model = joblib.load(os.path.join(source_dir, "rf_model.joblib"))
+            preprocessor_file = os.path.join(source_dir, "preprocessor.joblib")
+            preprocessor = joblib.load(preprocessor_file)
+            base_trees = manifest.get("base_trees", len(model.estimators_)) if source_dir == model_dir \
+                else len(model.estimators_)
+
+            X = preprocessor.transform(pd.DataFrame([f.features for f in window])).astype(np.float32)
+            rng = np.random.default_rng(42)
+            order = rng.permutation(len(window))
+            holdout = order[:len(window) // 5] if len(window) >= 50 else order[:0]
+            train = order[len(holdout):]
+            served_accuracy = float((model.predict(X[holdout]) == labels[holdout]).mean()) if len(holdout) else None
+
+            model.estimators_ = model.estimators_[:base_trees]
+            model.set_params(warm_start=True, n_estimators=base_trees + settings.RETRAIN_TREES, n_jobs=-1)
+            model.fit(X[train], labels[train])
+            model.set_params(warm_start=False, n_jobs=None)
+            accuracy = float((model.predict(X[holdout]) == labels[holdout]).mean()) if len(holdout) else None
+
+            # Feedback only covers flows the served model flagged, so the original test split
+            # is what shows whether the new trees cost accuracy on traffic in general
+            served_model, _ = MLEngine._read(model_dir)
+            (test_accuracy, served_test_accuracy), test_rows = _test_accuracy(
+                [model, served_model], settings.RETRAIN_TEST_ROWS
+            )
+            held_back = []
+            if not len(holdout):
+                held_back.append("no feedback holdout (window under 50 alerts)")
+            elif accuracy < served_accuracy:
+                held_back.append("less accurate on held-out feedback")
+            if test_accuracy is None:
+                held_back.append("no test split to check against")
+            elif test_accuracy < served_test_accuracy - settings.RETRAIN_MAX_TEST_DROP:
+                held_back.append("less accurate on the test split")
+            promote = settings.RETRAIN_PROMOTE and not held_back
+
+            version = time.strftime("%Y%m%d-%H%M%S") + "-feedback"
+            report = {
+                "version": version,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "format": "sklearn",
+                "parent": served_version,
+                "base_trees": base_trees,
+                "feedback_trees": settings.RETRAIN_TREES,
+                "feedback_rows": len(train),
+                "holdout_rows": len(holdout),
+                "holdout_accuracy": accuracy,
+                "served_holdout_accuracy": served_accuracy,
+                "test_rows": test_rows,
+                "test_accuracy": test_accuracy,
+                "served_test_accuracy": served_test_accuracy,
+                "held_back": held_back,
+                "fit_seconds": round(time.perf_counter() - started, 2),
+                "promoted": promote,
+            }
+            path = _publish(model, preprocessor_file, report)
+            for feedback in window:
+                if feedback.model_version is None:
+                    feedback.model_version = version
+            db.commit()
+            if promote:
+                _promote(version)
+            print(f"Retrain: published {path} ({len(train)} feedback rows; holdout accuracy {accuracy} vs "
+                  f"served {served_accuracy}; test accuracy {test_accuracy} vs served {served_test_accuracy})")
+            if promote:
+                print("Retrain: promoted")
+            elif not held_back:
+                print(f"Retrain: passed both checks; serve it with MODEL_VERSION={version} or RETRAIN_PROMOTE=true")
+            else:
+                print(f"Retrain: not promoted: {'; '.join(held_back)}")
+            return report
+        finally:
+            db.close()
+
+
+# ============================================================
+#  BACKGROUND TASK (every worker)
+# ============================================================
+def _pending() -> int:
+    db = SessionLocal()
+    try:
+        return pending_count(db)
+    finally:
+        db.close()
+
+
+async def run():
+    """Lifespan task: launches a retrain process when enough feedback is pending."""
+    while True:
+        await asyncio.sleep(settings.RETRAIN_INTERVAL_MINUTES * 60)
+        try:
+            if await run_in_threadpool(_pending) < settings.RETRAIN_MIN_FEEDBACK:
+                continue
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "app.services.retrainer", "run", cwd=BACKEND_DIR
+            )
+            await process.wait()
+            # Don't wait for the next poll in the worker that asked
+            await run_in_threadpool(ml_engine.refresh)
+        except Exception as e:
+            print(f"Feedback retrain failed: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm-start the served forest on analyst feedback")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="Retrain now if enough feedback is pending")
+    run_parser.add_argument("--force", action="store_true", help="Ignore RETRAIN_MIN_FEEDBACK")
+    args = parser.parse_args()
+    print(retrain(force=args.force))
@@ -0,0 +1,135 @@
+"""
+Persistent, append-only security event log.
+
+Writers call `security_log.record(...)` from request handlers. The event is
+queued in memory and the lifespan flushes the queue with one multi-row
+INSERT every SECURITY_LOG_FLUSH_SECONDS, so logging never adds a DB round
+trip to /api/analyze or /auth/login. Every event also feeds the per-tenant
+sketches in log_analytics.
+
+Search uses the full-text index created by migration 4: a generated tsvector
+with a GIN index on PostgreSQL, and an FTS5 table on SQLite. Results are
+newest first with keyset pagination on id, so deep pages cost the same as
+the first page.
+"""
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert, select, text
+from app.db.models import SecurityLog
+from app.db.session import engine
+from app.services.log_analytics import log_analytics, THREAT_LEVELS
+
+LEVELS = ("INFO", "SUCCESS", "WARNING", "ERROR")
+# Bound on events held while the database is unreachable; the oldest are dropped beyond it
+MAX_PENDING = 100_000
+
+
+class SecurityLogWriter:
+    def __init__(self):
+        self._pending = []
+        self._lock = threading.Lock()
+        # One flush at a time: when flush() returns, everything queued before it is committed
+        # (log_analytics.rebuild relies on this)
+        self._flush_lock = threading.Lock()
+
+    def record(self, level: str, event: str, source: str, message: str, user_id: Optional[int] = None,
+               actor: Optional[str] = None, ip: Optional[str] = None, trace_id: Optional[str] = None):
+        now = datetime.now(timezone.utc)
+        row = {
+            "timestamp": now, "level": level, "event": event, "source": source, "user_id": user_id,
+            "actor": actor, "ip": ip, "message": message, "trace_id": trace_id or uuid.uuid4().hex,
+        }
+        with self._lock:
+            self._pending.append(row)
+        log_analytics.record(user_id, source, ip=ip, threat=level in THREAT_LEVELS, ts=now)
+
+    def flush(self, bind=None) -> int:
+        """Writes everything queued so far. Called periodically and on shutdown."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                with (bind or engine).begin() as connection:
+                    connection.execute(insert(SecurityLog), rows)
+            except Exception:
+                with self._lock:
+                    self._pending = (rows + self._pending)[-MAX_PENDING:]
+                raise
+            return len(rows)
+
+
+security_log = SecurityLogWriter()
+
+
+# ============================================================
+#  SEARCH
+# ============================================================
+# Matching FTS rowids are fetched newest first in growing chunks, so a common
+# term stops after the first chunk and a rare one after a single pass
+FTS_FIRST_CHUNK = 1_000
+FTS_MAX_CHUNK = 64_000
+
+
+def _fts_query(q: str) -> str:
+    # Every term quoted: FTS5 operators in user input are matched literally, IPs become phrases
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+def _sqlite_fts_search(db, stmt, q: str, before_id: Optional[int], limit: int):
+    rows = []
+    chunk = FTS_FIRST_CHUNK
+    upper = before_id
+    while len(rows) < limit:
+        fts = "SELECT rowid FROM security_logs_fts WHERE security_logs_fts MATCH :q"
+        params = {"q": _fts_query(q), "n": chunk}
+        if upper is not None:
+            fts += " AND rowid < :upper"
+            params["upper"] = upper
+        ids = [r[0] for r in db.execute(text(fts + " ORDER BY rowid DESC LIMIT :n"), params)]
+        if ids:
+            rows += db.execute(
+                stmt.where(SecurityLog.id.in_(ids)).order_by(SecurityLog.id.desc()).limit(limit - len(rows))
+            ).scalars().all()
+        if len(ids) < chunk:
+            break
+        upper = ids[-1]
+        chunk = min(chunk * 4, FTS_MAX_CHUNK)
+    return rows
+
+
+def search(db, user_id: int, q: Optional[str] = None, level: Optional[str] = None,
+           start: Optional[datetime] = None, end: Optional[datetime] = None,
+           cursor: Optional[str] = None, limit: int = 100):
+    """
+    Returns (rows, next_cursor), newest first. Rows are ordered by id, i.e.
+    the order they were written. The cursor is the last id returned, and
+    next_cursor is None on the last page.
+    """
+    before_id = int(cursor) if cursor else None
+    stmt = select(SecurityLog).where(SecurityLog.user_id == user_id)
+    if level:
+        stmt = stmt.where(SecurityLog.level == level)
+    if start is not None:
+        stmt = stmt.where(SecurityLog.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(SecurityLog.timestamp < end)
+    if before_id is not None:
+        stmt = stmt.where(SecurityLog.id < before_id)
+
+    if q and q.strip() and db.bind.dialect.name != "postgresql":
+        rows = _sqlite_fts_search(db, stmt, q, before_id, limit + 1)
+    else:
+        if q and q.strip():
+            stmt = stmt.where(text("search @@ websearch_to_tsquery('simple', :q)").bindparams(q=q))
+        rows = db.execute(stmt.order_by(SecurityLog.id.desc()).limit(limit + 1)).scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].id)
+    return rows, next_cursor
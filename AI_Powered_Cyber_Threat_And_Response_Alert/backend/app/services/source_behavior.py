@@ -0,0 +1,238 @@
+"""
+Per-source behavioral state for severity escalation.
+
+The model scores each flow alone, so a slow port scan looks like a string of
+harmless single flows. This store keeps a small record per (tenant, source
+IP) and updates it on every analyzed flow, in O(1):
+
+    flows, threats      exponentially decayed counts with half-life
+                        SOURCE_HALF_LIFE_SECONDS. A source sending r flows/s
+                        settles at r * half_life / ln 2
+    hosts, ports        distinct destination IPs / ports over the last one
+                        to two half-lives: two 128-bit bitmaps per dimension
+                        (current and previous epoch, rotated each half-life),
+                        estimated by linear counting. Saturates around 600,
+                        far above the escalation thresholds
+
+Records live in an LRU of at most SOURCE_MAX_TRACKED entries (about 500
+bytes each), so memory has a hard bound however many sources are seen; the
+least recently active source is dropped first.
+
+analyze_traffic feeds the signals to escalate():
+
+    - a flow the model calls an attack, from a source with repeated threat
+      verdicts, goes up one severity level
+    - a flow from a source touching many ports (port scan) is an attack of at
+      least Medium severity even if the model called the flow normal; at
+      least High if the model agreed
+    - an attack from a source touching many hosts (host sweep) is at least High
+
+The state is per worker. It is written to SOURCE_SNAPSHOT_PATH every
+SOURCE_SNAPSHOT_SECONDS and at shutdown, and loaded at startup, so it
+survives restarts (the decay just continues over the downtime).
+"""
+import itertools
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+from app.core.config import settings
+
+SEVERITIES = ("Low", "Medium", "High", "Critical")
+BITMAP_BITS = 128
+_BITMAP_MASK = BITMAP_BITS - 1
+
+MAGIC = b"CTSRCST2"  # 2: source IPs stored with an offsets column
+HEADER = struct.Struct("=8sIQd")  # magic, byte-order marker, record count, half-life
+BYTE_ORDER_MARK = 0x01020304
+
+
+def _host_bit(ip: str) -> int:
+    # crc32, not hash(): str hashes are salted per process and snapshots must stay valid
+    return 1 << (zlib.crc32(ip.encode()) & _BITMAP_MASK)
+
+
+def _port_bit(port: int) -> int:
+    return 1 << (((port * 0x9E3779B1) & 0xFFFFFFFF) >> 25)
+
+
+def _distinct(bits: int) -> int:
+    """Linear counting estimate of the items hashed into a BITMAP_BITS bitmap."""
+    zeros = BITMAP_BITS - bits.bit_count()
+    if zeros == 0:
+        return round(BITMAP_BITS * math.log(BITMAP_BITS))
+    return round(-BITMAP_BITS * math.log(zeros / BITMAP_BITS))
+
+
+class SourceState:
+    __slots__ = ("updated", "epoch", "flows", "threats", "hosts", "hosts_prev", "ports", "ports_prev")
+
+    def __init__(self, now: float, epoch: int):
+        self.updated = now
+        self.epoch = epoch
+        self.flows = 0.0
+        self.threats = 0.0
+        self.hosts = self.hosts_prev = 0
+        self.ports = self.ports_prev = 0
+
+    def signals(self) -> dict:
+        return {
+            "flows": round(self.flows, 2),
+            "threats": round(self.threats, 2),
+            "distinct_hosts": _distinct(self.hosts | self.hosts_prev),
+            "distinct_ports": _distinct(self.ports | self.ports_prev),
+        }
+
+
+class SourceBehavior:
+    def __init__(self, max_tracked: int = None, half_life: float = None):
+        self.max_tracked = max_tracked or settings.SOURCE_MAX_TRACKED
+        self.half_life = half_life or settings.SOURCE_HALF_LIFE_SECONDS
+        self._states = OrderedDict()  # (tenant, ip) -> SourceState, least recently active first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def observe(self, tenant_id: int, src_ip: str, dst_ip: str, dst_port: int, threat: bool,
+                now: float = None) -> dict:
+        """Records one flow and returns the source's signals, this flow included."""
+        now = time.time() if now is None else now
+        epoch = int(now // self.half_life)
+        key = (tenant_id, src_ip)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = SourceState(now, epoch)
+                if len(self._states) > self.max_tracked:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(key)
+                decay = 0.5 ** (max(now - state.updated, 0.0) / self.half_life)
+                state.flows *= decay
+                state.threats *= decay
+                state.updated = now
+                if epoch != state.epoch:
+                    # One epoch later the current bitmaps become the previous ones; later still, both expire
+                    state.hosts_prev = state.hosts if epoch == state.epoch + 1 else 0
+                    state.ports_prev = state.ports if epoch == state.epoch + 1 else 0
+                    state.hosts = state.ports = 0
+                    state.epoch = epoch
+            state.flows += 1.0
+            if threat:
+                state.threats += 1.0
+            if dst_ip:
+                state.hosts |= _host_bit(dst_ip)
+            state.ports |= _port_bit(dst_port)
+            return state.signals()
+
+    def escalate(self, result: dict, signals: dict) -> tuple:
+        """
+        Returns (result, reason): `result` with is_threat/severity raised per the
+        rules in the module docstring, and a short reason, or None if no rule fired.
+        """
+        rank = SEVERITIES.index(result["severity"]) if result["severity"] in SEVERITIES else 0
+        floor, reasons = rank, []
+        if signals["distinct_ports"] >= settings.SOURCE_SCAN_PORTS:
+            floor = max(floor, 2 if result["is_threat"] else 1)
+            reasons.append(f"port scan ({signals['distinct_ports']} ports)")
+        if result["is_threat"]:
+            if signals["distinct_hosts"] >= settings.SOURCE_SCAN_HOSTS:
+                floor = max(floor, 2)
+                reasons.append(f"host sweep ({signals['distinct_hosts']} hosts)")
+            # The flow itself is one of the counted threats
+            if signals["threats"] >= settings.SOURCE_REPEAT_THREATS:
+                floor = max(floor, min(rank + 1, len(SEVERITIES) - 1))
+                reasons.append(f"repeat offender ({signals['threats']:.0f} recent threats)")
+        if not reasons:
+            return result, None
+        return dict(result, is_threat=True, severity=SEVERITIES[floor]), "Behavior: " + ", ".join(reasons)
+
+    # ============================================================
+    #  SNAPSHOTS
+    # ============================================================
+    def save(self, path: str = None) -> int:
+        """
+        Writes all records column by column, in LRU order, to a temp file and
+        renames it over `path`. Returns the number of records.
+        """
+        path = path or settings.SOURCE_SNAPSHOT_PATH
+        tenants, updated, epochs = array("q"), array("d"), array("q")
+        flows, threats = array("d"), array("d")
+        ips, bitmaps = [], bytearray()
+        with self._lock:
+            items = list(self._states.items())  # serialize outside the lock; ingest keeps running
+        for (tenant_id, ip), s in items:
+            tenants.append(tenant_id)
+            ips.append(ip)
+            updated.append(s.updated)
+            epochs.append(s.epoch)
+            flows.append(s.flows)
+            threats.append(s.threats)
+            for bits in (s.hosts, s.hosts_prev, s.ports, s.ports_prev):
+                bitmaps += bits.to_bytes(BITMAP_BITS // 8, "little")
+        # Offsets, not a separator: srcip is free-form text and may contain anything
+        encoded = [ip.encode() for ip in ips]
+        ip_ends = array("Q", itertools.accumulate(len(b) for b in encoded))
+        ip_blob = b"".join(encoded)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, BYTE_ORDER_MARK, len(tenants), self.half_life))
+            for column in (tenants, updated, epochs, flows, threats):
+                column.tofile(f)
+            f.write(bitmaps)
+            ip_ends.tofile(f)
+            f.write(ip_blob)
+        os.replace(tmp_path, path)
+        return len(tenants)
+
+    def load(self, path: str = None) -> int:
+        """Replaces the in-memory state with a snapshot. A missing file is an empty state."""
+        path = path or settings.SOURCE_SNAPSHOT_PATH
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            magic, bom, n, half_life = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or bom != BYTE_ORDER_MARK:
+                raise ValueError(f"{path} is not a source behavior snapshot for this version and platform")
+            columns = []
+            for typecode in ("q", "d", "q", "d", "d"):
+                column = array(typecode)
+                column.fromfile(f, n)
+                columns.append(column)
+            width = BITMAP_BITS // 8
+            bitmaps = f.read(4 * width * n)
+            ip_ends = array("Q")
+            ip_ends.fromfile(f, n)
+            ip_blob = f.read(ip_ends[-1] if n else 0)
+            ips = [ip_blob[start:end].decode() for start, end in zip([0, *ip_ends[:-1]], ip_ends)]
+
+        if half_life != self.half_life:
+            print(f"Source behavior snapshot used a {half_life}s half-life; counters carried over as is")
+        states = OrderedDict()
+        tenants, updated, epochs, flows, threats = columns
+        for i in range(n):
+            state = SourceState(updated[i], epochs[i])
+            state.flows, state.threats = flows[i], threats[i]
+            at = 4 * width * i
+            state.hosts, state.hosts_prev, state.ports, state.ports_prev = (
+                int.from_bytes(bitmaps[at + k * width:at + (k + 1) * width], "little") for k in range(4)
+            )
+            states[(tenants[i], ips[i])] = state
+        while len(states) > self.max_tracked:
+            states.popitem(last=False)
+        with self._lock:
+            self._states = states
+        return len(states)
+
+
+source_behavior = SourceBehavior()
@@ -0,0 +1,138 @@
+"""
+Asset scanner sweep against local listener stand-ins.
+
+Linux routes all of 127.0.0.0/8 to loopback, so listeners bound to random
+addresses in a 127.x.0.0/16 stand in for hosts on a LAN. The script plants
+--hosts listeners on random (address, port) pairs, plus one "silent" host
+whose accept queue is full so connects to it time out. It then sweeps the
+whole prefix with app.services.asset_scanner and checks that:
+
+    - exactly the planted (address, port) pairs are reported open
+    - the silent host is not reported open
+    - save_inventory() + GET /api/network/devices serve the result
+
+It also reports sweep time and probes per second. On loopback, closed ports
+refuse at once, so this measures the scanner's own throughput. The
+worst-case bound for a network where nothing answers is printed alongside.
+
+Usage (from the backend folder):
+    python benchmarks/bench_asset_scan.py
+    python benchmarks/bench_asset_scan.py --prefix 127.77.0.0/16 --ports 22,80,443 --hosts 200
+"""
+import argparse
+import asyncio
+import ipaddress
+import math
+import random
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+from bench_utils import write_results
+
+from app.db.session import Base, SessionLocal, engine
+from app.services import asset_scanner
+from app.api.endpoints import get_network_devices
+
+
+async def plant_listeners(network, ports, count: int, rng):
+    hosts = list(network.hosts())
+    planted = {}
+    servers = []
+    for ip in rng.sample(hosts, count):
+        port = rng.choice(ports)
+        server = await asyncio.start_server(lambda r, w: w.close(), str(ip), port)
+        servers.append(server)
+        planted.setdefault(str(ip), []).append(port)
+    return planted, servers
+
+
+def plant_silent(network, port: int, rng):
+    """A listener with a full accept queue: further SYNs are dropped, so probes time out."""
+    ip = str(rng.choice(list(network.hosts())))
+    listener = socket.socket()
+    listener.bind((ip, port))
+    listener.listen(0)
+    fillers = []
+    for _ in range(2):  # backlog 0 still admits one or two; fill it
+        s = socket.socket()
+        s.setblocking(False)
+        s.connect_ex((ip, port))
+        fillers.append(s)
+    time.sleep(0.2)
+    return ip, [listener, *fillers]
+
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+    network = ipaddress.ip_network(args.prefix)
+    ports = asset_scanner.parse_ports(args.ports)
+    planted, servers = await plant_listeners(network, ports, args.hosts, rng)
+    silent_ip, silent_socks = plant_silent(network, ports[0], rng)
+    planted.pop(silent_ip, None)
+
+    concurrency = asset_scanner.effective_concurrency(args.concurrency)
+    started = time.perf_counter()
+    try:
+        found = await asset_scanner.sweep([network], ports, concurrency, args.timeout)
+    finally:
+        for server in servers:
+            server.close()
+        for s in silent_socks:
+            s.close()
+    elapsed = time.perf_counter() - started
+    return network, ports, concurrency, planted, silent_ip, found, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep local listener stand-ins with the asset scanner")
+    parser.add_argument("--prefix", default="127.77.0.0/16")
+    parser.add_argument("--ports", default="22,80,443")
+    parser.add_argument("--hosts", type=int, default=100, help="Planted listeners")
+    parser.add_argument("--concurrency", type=int, default=1024)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    network, ports, concurrency, planted, silent_ip, found, elapsed = asyncio.run(main_async(args))
+    probes = (network.num_addresses - 2) * len(ports)
+    open_found = {ip: h["ports"] for ip, h in found.items() if h["ports"]}
+    expected = {ip: sorted(p) for ip, p in planted.items()}
+    correct = open_found == expected and silent_ip not in open_found
+    bound = math.ceil(probes / concurrency) * args.timeout
+
+    print(f"[asset_scan] {network} x {len(ports)} ports = {probes:,} probes, concurrency {concurrency}")
+    print(f"  swept in {elapsed:.1f}s ({probes / elapsed:,.0f} probes/s); worst case if nothing answered: {bound:.0f}s")
+    print(f"  open hosts found {len(open_found)} / planted {len(expected)}, "
+          f"silent host {silent_ip} {'correctly not open' if silent_ip not in open_found else 'REPORTED OPEN'}")
+    if not correct:
+        missing = set(expected) - set(open_found)
+        extra = set(open_found) - set(expected)
+        print(f"  MISMATCH: missing {sorted(missing)[:5]} extra {sorted(extra)[:5]}")
+
+    # Inventory + endpoint round trip against the benchmark database
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        names = {ip: None for ip in open_found}
+        report = asset_scanner.save_inventory(db, [network], {ip: found[ip] for ip in open_found}, names,
+                                              datetime.now(timezone.utc))
+        served = {d["ip"] for d in get_network_devices(db) if d["status"] != "Critical"}
+    finally:
+        db.close()
+    served_ok = set(open_found) <= served
+    print(f"  inventory: {report}; endpoint serves all found hosts: {served_ok}")
+
+    write_results("asset_scan", [{
+        "name": "asset_scan.sweep",
+        "params": {"prefix": str(network), "ports": ports, "concurrency": concurrency, "timeout": args.timeout},
+        "stats": {"seconds": elapsed, "probes": probes, "probes_per_s": probes / elapsed,
+                  "worst_case_seconds": bound, "correct": correct and served_ok},
+    }], args.output)
+    sys.exit(0 if correct and served_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
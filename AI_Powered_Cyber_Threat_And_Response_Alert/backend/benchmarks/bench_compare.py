@@ -0,0 +1,56 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+Usage (from the backend folder):
+    python benchmarks/bench_compare.py benchmarks/results/before.json benchmarks/results/after.json
+    python benchmarks/bench_compare.py before.json after.json --metric p99_us --threshold 1.2
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    keyed = {}
+    for r in data["results"]:
+        key = (r["name"], json.dumps(r.get("params", {}), sort_keys=True))
+        keyed[key] = r["stats"]
+    return data.get("environment", {}), keyed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p50_us")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="Ratio (candidate/baseline) above which a benchmark counts as regressed")
+    args = parser.parse_args()
+
+    base_env, base = load(args.baseline)
+    cand_env, cand = load(args.candidate)
+
+    for pkg in ("python", "numpy", "pandas", "sklearn", "sqlalchemy", "pydantic", "git_commit"):
+        if base_env.get(pkg) != cand_env.get(pkg):
+            print(f"  {pkg}: {base_env.get(pkg)} -> {cand_env.get(pkg)}")
+
+    regressions = 0
+    print(f"\n{'benchmark':<70} {'baseline':>12} {'candidate':>12} {'ratio':>7}")
+    for key in sorted(base.keys() & cand.keys()):
+        b, c = base[key][args.metric], cand[key][args.metric]
+        ratio = c / b if b else float("inf")
+        flag = "  REGRESSED" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        name = f"{key[0]} {key[1] if key[1] != '{}' else ''}"
+        print(f"{name:<70} {b:>12.1f} {c:>12.1f} {ratio:>7.2f}{flag}")
+
+    for key in sorted(base.keys() - cand.keys()):
+        print(f"  missing in candidate: {key[0]} {key[1]}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Component micro-benchmarks for the backend hot paths.
+
+Times each piece of the request path in isolation so a dependency upgrade
+(e.g. scikit-learn 1.4.2 -> 1.5.2) can be pinned to the component it slowed:
+
+    - MLEngine.predict (single flow) and preprocessor/forest at several batch sizes
+    - TrafficData validation
+    - get_current_user (JWT decode + user lookup)
+    - get_stats / get_alerts queries against SQLite with 1k, 1M and 10M alerts
+
+Usage (from the backend folder):
+    python benchmarks/bench_components.py
+    python benchmarks/bench_components.py --rows 1000,1000000 --only ml,db
+    python benchmarks/bench_compare.py old.json new.json
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench_utils import (
+    RESULTS_DIR, load_ml_engine, measure, print_result, synthetic_flows, write_results
+)
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.db.models import Alert, User
+from app.schemas.traffic import TrafficData
+from app.core.security import create_access_token
+from app.api.deps import get_current_user
+from app.api.endpoints import get_alerts, get_stats
+
+BATCH_SIZES = [1, 8, 64, 512, 4096]
+DEFAULT_ROWS = [1_000, 1_000_000, 10_000_000]
+SEED_USERS = 10
+
+
+# ============================================================
+#  ML ENGINE
+# ============================================================
+def bench_ml(results, repeat):
+    engine, source = load_ml_engine()
+    print(f"\n[ml] Using {source} model artifacts")
+    flows = synthetic_flows(max(BATCH_SIZES) * 2, seed=1)
+
+    # Full single-flow path as called by /api/analyze
+    idx = iter(range(10**9))
+    stats = measure(lambda: engine.predict(flows[next(idx) % len(flows)]), repeat=repeat)
+    results.append({"name": "ml.predict", "params": {"batch": 1, "artifacts": source}, "stats": stats})
+    print_result("ml.predict", {"batch": 1}, stats)
+
+    for batch in BATCH_SIZES:
+        df = pd.DataFrame(flows[:batch])
+        runs = max(10, repeat // max(1, batch // 8))
+
+        stats = measure(lambda: engine.preprocessor.transform(df), repeat=runs)
+        stats["per_row_us"] = stats["p50_us"] / batch
+        results.append({"name": "ml.transform", "params": {"batch": batch, "artifacts": source}, "stats": stats})
+        print_result("ml.transform", {"batch": batch}, stats)
+
+        X = engine.preprocessor.transform(df)
+        stats = measure(lambda: engine.model.predict_proba(X), repeat=runs)
+        stats["per_row_us"] = stats["p50_us"] / batch
+        results.append({"name": "ml.predict_proba", "params": {"batch": batch, "artifacts": source}, "stats": stats})
+        print_result("ml.predict_proba", {"batch": batch}, stats)
+
+
+# ============================================================
+#  REQUEST VALIDATION
+# ============================================================
+def bench_validation(results, repeat):
+    print("\n[schema] TrafficData validation")
+    payloads = synthetic_flows(256, seed=2)
+    idx = iter(range(10**9))
+    stats = measure(lambda: TrafficData(**payloads[next(idx) % len(payloads)]), repeat=repeat * 10)
+    results.append({"name": "schema.traffic_data", "params": {}, "stats": stats})
+    print_result("schema.traffic_data", {}, stats)
+
+
+# ============================================================
+#  DATABASE FIXTURES
+# ============================================================
+def seed_database(path: str, rows: int):
+    """
+    Creates (or reuses) a SQLite file holding `rows` alerts spread across
+    SEED_USERS users over the last 30 days. Uses raw executemany because
+    ORM inserts would dominate the runtime at 10M rows.
+    """
+    if os.path.exists(path):
+        con = sqlite3.connect(path)
+        try:
+            (existing,) = con.execute("SELECT COUNT(*) FROM alerts").fetchone()
+            columns = {row[1] for row in con.execute("PRAGMA table_info(alerts)")}
+            # Reseed fixtures created before the last schema change
+            if existing == rows and columns >= set(Alert.__table__.columns.keys()):
+                return
+        except sqlite3.Error:
+            pass
+        finally:
+            con.close()
+        os.remove(path)
+
+    print(f"  Seeding {rows:,} alerts into {path} (one-off)...")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.executemany(
+        "INSERT INTO users (id, username, email, hashed_password, is_active, email_alerts, sms_alerts) "
+        "VALUES (?, ?, ?, 'x', 1, 1, 0)",
+        [(u, f"user{u}@bench.local", f"user{u}@bench.local") for u in range(1, SEED_USERS + 1)],
+    )
+
+    rng = random.Random(rows)
+    now = datetime.now(timezone.utc)
+    severities = ["Critical", "High", "Medium", "Low"]
+    statuses = ["Active", "Remediated", "Safe"]
+
+    def generate(start, count):
+        for i in range(start, start + count):
+            is_attack = rng.random() < 0.3
+            ts = now - timedelta(seconds=rng.randint(0, 30 * 86400))
+            yield (
+                f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                "Attack" if is_attack else "Normal",
+                rng.random(),
+                rng.choice(severities) if is_attack else "Low",
+                rng.choice(statuses),
+                ts.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                rng.randint(1, SEED_USERS),
+            )
+
+    chunk = 200_000
+    for start in range(0, rows, chunk):
+        con.executemany(
+            "INSERT INTO alerts (src_ip, prediction, confidence, severity, status, timestamp, user_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            generate(start, min(chunk, rows - start)),
+        )
+        con.commit()
+    con.close()
+
+
+# ============================================================
+#  AUTH + QUERIES
+# ============================================================
+def bench_db(results, repeat, row_counts):
+    for rows in row_counts:
+        path = os.path.join(RESULTS_DIR, f"alerts_{rows}.db")
+        seed_database(path, rows)
+
+        engine = create_engine(f"sqlite:///{path}")
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = Session()
+        try:
+            user = db.query(User).filter(User.id == 1).first()
+            token = create_access_token(data={"sub": user.email})
+
+            # Queries scale with table size; keep the slow ones bounded in wall time
+            runs = repeat if rows <= 100_000 else 5
+
+            print(f"\n[db] {rows:,} alerts")
+            stats = measure(lambda: get_current_user(token=token, db=db), repeat=repeat)
+            results.append({"name": "auth.get_current_user", "params": {"rows": rows}, "stats": stats})
+            print_result("auth.get_current_user", {"rows": rows}, stats)
+
+            stats = measure(lambda: get_alerts(limit=50, db=db, current_user=user), repeat=runs, warmup=1)
+            results.append({"name": "db.get_alerts", "params": {"rows": rows, "limit": 50}, "stats": stats})
+            print_result("db.get_alerts", {"rows": rows}, stats)
+
+            stats = measure(lambda: get_stats(db=db, current_user=user), repeat=runs, warmup=1)
+            results.append({"name": "db.get_stats", "params": {"rows": rows}, "stats": stats})
+            print_result("db.get_stats", {"rows": rows}, stats)
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend component micro-benchmarks")
+    parser.add_argument("--only", default="ml,schema,db", help="Comma separated: ml,schema,db")
+    parser.add_argument("--rows", default=",".join(str(r) for r in DEFAULT_ROWS),
+                        help="Alert table sizes for the db benchmarks")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed calls per benchmark")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    only = set(args.only.split(","))
+    results = []
+    started = time.perf_counter()
+
+    if "ml" in only:
+        bench_ml(results, args.repeat)
+    if "schema" in only:
+        bench_validation(results, args.repeat)
+    if "db" in only:
+        bench_db(results, args.repeat, [int(r) for r in args.rows.split(",") if r])
+
+    print(f"\nFinished in {time.perf_counter() - started:.1f}s")
+    write_results("components", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
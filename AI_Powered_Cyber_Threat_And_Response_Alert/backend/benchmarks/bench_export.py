@@ -0,0 +1,78 @@
+"""
+Throughput and memory of the streaming alert export.
+
+Drives app.services.alert_export directly (no HTTP) against the seeded
+SQLite fixtures from bench_components and reports rows/s, MB/s and the
+worker's peak RSS growth for each format. Peak RSS should stay flat as the
+table grows, because only one batch is held at a time.
+
+Usage (from the backend folder):
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --rows 1000000 --formats csv,parquet --batch-size 5000
+"""
+import argparse
+import os
+import resource
+import time
+
+from bench_utils import RESULTS_DIR, write_results
+from bench_components import SEED_USERS, seed_database
+
+from sqlalchemy import create_engine
+from app.services import alert_export
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_format(fmt: str, bind, batch_size: int):
+    rows = 0
+    size = 0
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    # User 1 owns ~1/SEED_USERS of the table; count rows as they are encoded
+    for chunk in alert_export.export_alerts(fmt, user_id=1, batch_size=batch_size, bind=bind):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    with bind.connect() as connection:
+        rows = connection.exec_driver_sql("SELECT COUNT(*) FROM alerts WHERE user_id = 1").scalar()
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_s": rows / elapsed if elapsed else 0.0,
+        "mb": size / 1e6,
+        "mb_per_s": size / 1e6 / elapsed if elapsed else 0.0,
+        "peak_rss_growth_mb": _peak_rss_mb() - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export throughput")
+    parser.add_argument("--rows", default="100000,1000000", help="Alert table sizes (all users)")
+    parser.add_argument("--formats", default="csv,ndjson,parquet")
+    parser.add_argument("--batch-size", type=int, default=alert_export.EXPORT_BATCH_SIZE)
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    for table_rows in [int(r) for r in args.rows.split(",") if r]:
+        path = os.path.join(RESULTS_DIR, f"alerts_{table_rows}.db")
+        seed_database(path, table_rows)
+        bind = create_engine(f"sqlite:///{path}")
+
+        print(f"\n[export] {table_rows:,} alerts, {SEED_USERS} users, batch {args.batch_size:,}")
+        for fmt in args.formats.split(","):
+            stats = bench_format(fmt, bind, args.batch_size)
+            params = {"rows": table_rows, "format": fmt, "batch_size": args.batch_size}
+            results.append({"name": "export.stream", "params": params, "stats": stats})
+            print(f"  {fmt:<8} {stats['rows']:>10,} rows  {stats['rows_per_s']:>10,.0f} rows/s  "
+                  f"{stats['mb_per_s']:>7.1f} MB/s  peak RSS +{stats['peak_rss_growth_mb']:.1f} MB")
+        bind.dispose()
+
+    write_results("export", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
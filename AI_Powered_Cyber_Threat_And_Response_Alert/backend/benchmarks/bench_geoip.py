@@ -0,0 +1,98 @@
+"""
+Lookup latency and footprint of the GeoIP/ASN range table.
+
+Generates a synthetic table shaped like the iptoasn.com dump (contiguous
+IPv4 ranges plus a tenth as many IPv6 ranges), builds it with
+app.services.geoip.build, maps it, and times lookups three ways:
+
+    uncached   GeoTable.lookup on random addresses (pure mmap + bisect)
+    cached     geoip.lookup on a realistic working set of repeat sources
+    enrich     geoip.enrich, which is what ingest and export call
+
+Usage (from the backend folder):
+    python benchmarks/bench_geoip.py
+    python benchmarks/bench_geoip.py --ranges 100000,500000,2000000 --repeat 50000
+"""
+import argparse
+import ipaddress
+import os
+import random
+import time
+
+from bench_utils import RESULTS_DIR, measure, print_result, write_results
+
+from app.core.config import settings
+from app.services.geoip import GeoTable, build, geoip
+
+COUNTRIES = ["US", "CN", "DE", "RU", "BR", "IN", "GB", "FR", "JP", "NL", "ZZ"]
+
+
+def generate_ranges(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    v4_count = count - count // 10
+    cuts = sorted(rng.sample(range(1 << 24, 0xE0000000), v4_count))
+    for start, nxt in zip(cuts, cuts[1:] + [0xE0000000]):
+        yield (str(ipaddress.IPv4Address(start)), str(ipaddress.IPv4Address(nxt - 1)),
+               rng.randrange(1, 400_000), rng.choice(COUNTRIES))
+    base = 0x2000 << 112
+    cuts = sorted(rng.sample(range(1 << 40), count // 10))
+    for start, nxt in zip(cuts, cuts[1:] + [1 << 40]):
+        yield (str(ipaddress.IPv6Address(base | start << 80)), str(ipaddress.IPv6Address((base | nxt << 80) - 1)),
+               rng.randrange(1, 400_000), rng.choice(COUNTRIES))
+
+
+def _rss_mb():
+    """(resident, file-backed shared) MB right now; shared pages are the mapped table and libraries."""
+    with open("/proc/self/statm") as f:
+        _, resident, shared = (int(x) for x in f.read().split()[:3])
+    page = os.sysconf("SC_PAGE_SIZE") / 1e6
+    return resident * page, shared * page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GeoIP range table benchmark")
+    parser.add_argument("--ranges", default="100000,500000", help="Comma separated table sizes")
+    parser.add_argument("--repeat", type=int, default=20000, help="Timed lookups per benchmark")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    for count in [int(c) for c in args.ranges.split(",") if c]:
+        path = os.path.join(RESULTS_DIR, f"geoip_{count}.bin")
+        started = time.perf_counter()
+        info = build(generate_ranges(count), path)
+        build_s = time.perf_counter() - started
+
+        rss_before, shared_before = _rss_mb()
+        table = GeoTable(path)
+        settings.GEOIP_DB_PATH = path
+        geoip.reload_if_changed()
+        print(f"\n[geoip] {count:,} ranges, {info['bytes'] / 1e6:.1f} MB file, built in {build_s:.2f}s")
+        results.append({"name": "geoip.build", "params": {"ranges": count},
+                        "stats": {"runs": 1, "seconds": build_s, "bytes": info["bytes"]}})
+
+        rng = random.Random(count)
+        randoms = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(50_000)]
+        randoms_v6 = [str(ipaddress.IPv6Address((0x2000 << 112) | rng.getrandbits(112))) for _ in range(10_000)]
+        working_set = randoms[:2_000]
+        cases = (
+            ("uncached_v4", table.lookup, randoms),
+            ("uncached_v6", table.lookup, randoms_v6),
+            ("cached", geoip.lookup, working_set),
+            ("enrich", geoip.enrich, working_set),
+        )
+        for name, fn, pool in cases:
+            it = iter(range(1 << 62))
+            stats = measure(lambda: fn(pool[next(it) % len(pool)]), repeat=args.repeat, warmup=len(pool))
+            params = {"ranges": count, "mode": name}
+            results.append({"name": "geoip.lookup", "params": params, "stats": stats})
+            print_result("geoip.lookup", params, stats)
+
+        rss, shared = _rss_mb()
+        print(f"  after lookups: RSS +{rss - rss_before:.1f} MB, of which shared file pages +{shared - shared_before:.1f} MB")
+
+    write_results("geoip", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
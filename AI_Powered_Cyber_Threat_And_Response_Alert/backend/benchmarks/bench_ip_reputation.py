@@ -0,0 +1,77 @@
+"""
+Lookup latency and build cost of the IP reputation prefilter.
+
+Generates random allow/deny lists (mostly IPv4, 10% IPv6, with nested
+prefixes so the flattening has real work to do), builds the table exactly
+as IPReputation.reload does, and times lookups for addresses that hit a
+prefix and for addresses that miss.
+
+Usage (from the backend folder):
+    python benchmarks/bench_ip_reputation.py
+    python benchmarks/bench_ip_reputation.py --prefixes 100000,1000000,5000000 --repeat 20000
+"""
+import argparse
+import ipaddress
+import random
+import resource
+import time
+
+from bench_utils import measure, print_result, write_results
+
+from app.services.ip_reputation import ALLOW, DENY, build_table
+
+
+def generate_lists(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    allow, deny, hits = [], [], []
+    for i in range(count):
+        if rng.random() < 0.9:
+            prefix = rng.choice([8, 12, 16, 20, 24, 24, 24, 28, 32, 32])
+            net = ipaddress.IPv4Network((rng.getrandbits(32), prefix), strict=False)
+        else:
+            prefix = rng.choice([32, 48, 56, 64, 64, 128])
+            net = ipaddress.IPv6Network(((0x2001 << 112) | rng.getrandbits(112), prefix), strict=False)
+        (deny if rng.random() < 0.8 else allow).append(f"{net} generated-{i}")
+        if len(hits) < 10_000:
+            hits.append(str(net.network_address + rng.randrange(min(net.num_addresses, 1 << 20))))
+    return allow, deny, hits
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IP reputation lookup benchmark")
+    parser.add_argument("--prefixes", default="10000,1000000", help="Comma separated list sizes (allow + deny)")
+    parser.add_argument("--repeat", type=int, default=20000, help="Timed lookups per benchmark")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    for count in [int(c) for c in args.prefixes.split(",") if c]:
+        allow, deny, hits = generate_lists(count)
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        table = build_table([(ALLOW, allow), (DENY, deny)])
+        build_s = time.perf_counter() - started
+        intervals = len(table.v4.starts) + len(table.v6.starts)
+        print(f"\n[ip_reputation] {count:,} prefixes -> {intervals:,} intervals, "
+              f"built in {build_s:.2f}s, peak RSS +{_rss_mb() - rss_before:.0f} MB")
+        results.append({"name": "ip_reputation.build", "params": {"prefixes": count},
+                        "stats": {"runs": 1, "seconds": build_s, "intervals": intervals}})
+
+        rng = random.Random(count)
+        misses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(10_000)]
+        for name, pool in (("hit", hits), ("random_v4", misses)):
+            it = iter(range(1 << 62))
+            stats = measure(lambda: table.lookup(pool[next(it) % len(pool)]), repeat=args.repeat, warmup=100)
+            params = {"prefixes": count, "addresses": name}
+            results.append({"name": "ip_reputation.lookup", "params": params, "stats": stats})
+            print_result("ip_reputation.lookup", params, stats)
+
+    write_results("ip_reputation", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Startup-time benchmark: how long until a new worker can take traffic.
+
+Measures, in fresh interpreters:
+    - import_app: `import app.main` (must stay free of DB/model/mail work)
+    - boot_to_live: process start -> "/" answers
+    - boot_to_ready: process start -> "/ready" returns 200 (migrations + warm models)
+
+Usage (from the backend folder):
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench_utils import BACKEND_DIR, print_result, write_results
+
+
+def _stats(samples):
+    samples = sorted(s * 1e6 for s in samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+    return {
+        "runs": len(samples),
+        "mean_us": sum(samples) / len(samples),
+        "min_us": samples[0],
+        "p50_us": pick(0.5),
+        "p95_us": pick(0.95),
+        "p99_us": pick(0.99),
+        "max_us": samples[-1],
+    }
+
+
+def time_import():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=BACKEND_DIR, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_boot(timeout: float):
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if live is None and httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    live = time.perf_counter() - started
+                if live is not None and httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                    ready = time.perf_counter() - started
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return live, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Give up on a boot after this many seconds")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # First boot applies migrations to the benchmark database; keep it out of the numbers
+    time_boot(args.timeout)
+
+    imports = [time_import() for _ in range(args.runs)]
+    boots = [time_boot(args.timeout) for _ in range(args.runs)]
+    live = [b[0] for b in boots if b[0] is not None]
+    ready = [b[1] for b in boots if b[1] is not None]
+
+    results = [{"name": "startup.import_app", "params": {}, "stats": _stats(imports)}]
+    if live:
+        results.append({"name": "startup.boot_to_live", "params": {}, "stats": _stats(live)})
+    if ready:
+        results.append({"name": "startup.boot_to_ready", "params": {}, "stats": _stats(ready)})
+    else:
+        print("  /ready never returned 200 - are the model artifacts in ml_engine/models?")
+
+    for r in results:
+        print_result(r["name"], r["params"], r["stats"])
+    write_results("startup", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
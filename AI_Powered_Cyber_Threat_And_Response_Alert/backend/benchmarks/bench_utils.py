@@ -0,0 +1,223 @@
+"""
+Shared helpers for the backend benchmark scripts.
+
+Benchmarks never touch the real database or mail server: the settings below
+point the app at a throwaway SQLite file so `app.*` modules import cleanly.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Ensure we can import from 'app' (run from the backend folder)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+os.makedirs(RESULTS_DIR, exist_ok=True)
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(RESULTS_DIR, "bench_app.db"))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("MAIL_USERNAME", "bench@example.com")
+os.environ.setdefault("MAIL_PASSWORD", "benchmark")
+os.environ.setdefault("MAIL_FROM", "bench@example.com")
+
+import numpy as np
+
+# Categorical values as they appear in UNSW-NB15 (after lowercasing)
+PROTOS = ["tcp", "udp", "unas", "arp", "ospf", "sctp", "icmp", "any", "gre"]
+PROTO_P = [0.62, 0.27, 0.03, 0.02, 0.02, 0.01, 0.01, 0.01, 0.01]
+SERVICES = ["-", "dns", "http", "ftp-data", "smtp", "ftp", "ssh", "pop3", "dhcp", "snmp", "ssl", "irc", "radius"]
+SERVICE_P = [0.47, 0.25, 0.10, 0.05, 0.04, 0.03, 0.02, 0.01, 0.01, 0.005, 0.005, 0.005, 0.005]
+STATES = ["fin", "con", "int", "req", "rst", "eco", "clo", "urh", "acc"]
+STATE_P = [0.55, 0.22, 0.18, 0.02, 0.01, 0.005, 0.005, 0.005, 0.005]
+
+
+# ============================================================
+#  FIXTURES
+# ============================================================
+def synthetic_flows(n: int, seed: int = 42):
+    """
+    Returns `n` TrafficData-shaped dicts drawn from rough UNSW-NB15
+    marginals (heavy-tailed byte/packet counts, skewed categoricals).
+    """
+    rng = np.random.default_rng(seed)
+    dur = rng.exponential(0.7, n)
+    spkts = rng.geometric(0.08, n)
+    dpkts = rng.geometric(0.1, n)
+    sbytes = (spkts * rng.integers(40, 1500, n)).astype(int)
+    dbytes = (dpkts * rng.integers(40, 1500, n)).astype(int)
+    stime = 1421927377 + np.sort(rng.integers(0, 86400, n))
+    protos = rng.choice(PROTOS, n, p=PROTO_P)
+    services = rng.choice(SERVICES, n, p=np.array(SERVICE_P) / sum(SERVICE_P))
+    states = rng.choice(STATES, n, p=np.array(STATE_P) / sum(STATE_P))
+
+    flows = []
+    for i in range(n):
+        d = float(dur[i]) or 1e-6
+        flows.append({
+            "srcip": f"175.45.176.{rng.integers(0, 4)}" if i % 5 == 0 else f"59.166.0.{rng.integers(0, 10)}",
+            "sport": int(rng.integers(1024, 65535)),
+            "dstip": f"149.171.126.{rng.integers(0, 20)}",
+            "dsport": int(rng.choice([80, 53, 21, 25, 22, 111, 6881, 5190])),
+            "proto": str(protos[i]),
+            "state": str(states[i]),
+            "dur": d,
+            "sbytes": int(sbytes[i]),
+            "dbytes": int(dbytes[i]),
+            "sttl": int(rng.choice([31, 62, 254])),
+            "dttl": int(rng.choice([29, 252, 0])),
+            "sloss": int(rng.poisson(1)),
+            "dloss": int(rng.poisson(1)),
+            "service": str(services[i]),
+            "Sload": float(sbytes[i] * 8 / d),
+            "Dload": float(dbytes[i] * 8 / d),
+            "Spkts": int(spkts[i]),
+            "Dpkts": int(dpkts[i]),
+            "swin": int(rng.choice([0, 255])),
+            "dwin": int(rng.choice([0, 255])),
+            "stcpb": int(rng.integers(0, 2**32 - 1)),
+            "dtcpb": int(rng.integers(0, 2**32 - 1)),
+            "smeansz": int(sbytes[i] // max(spkts[i], 1)),
+            "dmeansz": int(dbytes[i] // max(dpkts[i], 1)),
+            "trans_depth": int(rng.integers(0, 3)),
+            "res_bdy_len": int(rng.integers(0, 5000)),
+            "Sjit": float(rng.exponential(50)),
+            "Djit": float(rng.exponential(30)),
+            "Stime": int(stime[i]),
+            "Ltime": int(stime[i] + int(d)),
+            "Sintpkt": float(rng.exponential(20)),
+            "Dintpkt": float(rng.exponential(20)),
+            "tcprtt": float(rng.exponential(0.05)),
+            "synack": float(rng.exponential(0.03)),
+            "ackdat": float(rng.exponential(0.02)),
+            "is_sm_ips_ports": 0,
+            "ct_state_ttl": int(rng.integers(0, 3)),
+            "ct_flw_http_mthd": int(rng.integers(0, 2)),
+            "is_ftp_login": int(rng.integers(0, 2)),
+            "ct_ftp_cmd": int(rng.integers(0, 2)),
+            "ct_srv_src": int(rng.integers(1, 40)),
+            "ct_srv_dst": int(rng.integers(1, 40)),
+            "ct_dst_ltm": int(rng.integers(1, 20)),
+            "ct_src_ltm": int(rng.integers(1, 20)),
+            "ct_src_dport_ltm": int(rng.integers(1, 20)),
+            "ct_dst_sport_ltm": int(rng.integers(1, 10)),
+            "ct_dst_src_ltm": int(rng.integers(1, 30)),
+            "simulation": False,
+        })
+    return flows
+
+
+def synthetic_labels(flows):
+    """Cheap ground truth for fitting fixture models: attack-like source ranges."""
+    return np.array([1 if f["srcip"].startswith("175.45.176.") else 0 for f in flows])
+
+
+def load_ml_engine():
+    """
+    Returns an MLEngine with real artifacts when they exist in
+    ml_engine/models, otherwise one backed by a fixture preprocessor and a
+    100-tree forest fitted on synthetic flows (same layout as notebook 02/03).
+    """
+    from app.services.ml_service import MLEngine
+
+    engine = MLEngine()
+    engine.load()
+    if engine.ready:
+        return engine, "real"
+
+    import pandas as pd
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+    flows = synthetic_flows(20000, seed=7)
+    df = pd.DataFrame(flows).drop(columns=["srcip", "dstip", "Stime", "Ltime", "sport", "dsport", "simulation"])
+    cat_cols = ["proto", "service", "state"]
+    num_cols = [c for c in df.columns if c not in cat_cols]
+    preprocessor = ColumnTransformer(transformers=[
+        ("num", MinMaxScaler(), num_cols),
+        ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_cols),
+    ])
+    X = preprocessor.fit_transform(df)
+    model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+    model.fit(X, synthetic_labels(flows))
+    # Single-row inference in the API never benefits from the pool
+    model.n_jobs = None
+
+    engine.model = model
+    engine.preprocessor = preprocessor
+    engine.ready = True
+    return engine, "fixture"
+
+
+# ============================================================
+#  TIMING
+# ============================================================
+def measure(fn, repeat: int = 200, warmup: int = 5, min_time: float = 0.0):
+    """
+    Calls `fn()` `repeat` times (after `warmup` untimed calls) and returns
+    latency statistics in microseconds. If `min_time` is set, keeps going
+    until that many seconds have been spent timing.
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or (time.perf_counter() - started) < min_time:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+
+    arr = np.array(samples) * 1e6
+    return {
+        "runs": len(samples),
+        "mean_us": float(arr.mean()),
+        "min_us": float(arr.min()),
+        "p50_us": float(np.percentile(arr, 50)),
+        "p95_us": float(np.percentile(arr, 95)),
+        "p99_us": float(np.percentile(arr, 99)),
+        "max_us": float(arr.max()),
+    }
+
+
+def environment_info():
+    """Versions that commonly explain a latency shift between two result files."""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+    for pkg in ("numpy", "pandas", "sklearn", "sqlalchemy", "pydantic", "fastapi"):
+        try:
+            info[pkg] = __import__(pkg).__version__
+        except Exception:
+            info[pkg] = None
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BACKEND_DIR
+        ).stdout.strip() or None
+    except Exception:
+        info["git_commit"] = None
+    return info
+
+
+def write_results(suite: str, results: list, output: str = None):
+    """Writes `{"suite", "environment", "results"}` JSON and returns the path."""
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{suite}_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump({"suite": suite, "environment": environment_info(), "results": results}, f, indent=2)
+    print(f"Results written to {output}")
+    return output
+
+
+def print_result(name: str, params: dict, stats: dict):
+    label = f"{name} {params}" if params else name
+    print(f"  {label:<60} p50={stats['p50_us']:>10.1f}us  p99={stats['p99_us']:>10.1f}us  (n={stats['runs']})")
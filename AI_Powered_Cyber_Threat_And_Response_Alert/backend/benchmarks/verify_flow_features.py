@@ -0,0 +1,89 @@
+"""
+Replay check and throughput of the server-side ct_* feature engine.
+
+Feeds flows through app.services.flow_features in time order and compares
+every window feature against
+
+    reference   a naive recount over the previous WINDOW rows (the dataset
+                definition, O(WINDOW) per flow), which must match exactly
+    dataset     the ct_* columns shipped in a raw UNSW-NB15 CSV, when
+                --dataset is given; reported as exact / within-1 match rates
+
+Without --dataset it replays synthetic UNSW-NB15-shaped flows, so only the
+reference comparison applies.
+
+Usage (from the backend folder):
+    python benchmarks/verify_flow_features.py
+    python benchmarks/verify_flow_features.py --dataset ../ml_engine/data/raw/UNSW-NB15_1.csv --rows 200000
+"""
+import argparse
+import sys
+import time
+from collections import deque
+
+from bench_utils import synthetic_flows, write_results
+
+from app.services.flow_features import FEATURE_NAMES, WINDOW, WINDOW_FEATURES, FlowFeatureEngine
+
+
+def reference_counts(rows, window: int):
+    """Yields the ct_* values per row by rescanning the window each time."""
+    recent = deque(maxlen=window)
+    for row in rows:
+        recent.append(row)
+        yield {
+            name: sum(all(other[f] == row[f] for f in fields) for other in recent)
+            for name, fields in WINDOW_FEATURES
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify ct_* window features against a replayed sample")
+    parser.add_argument("--dataset", default=None, help="Raw UNSW-NB15 CSV (headerless, 49 columns)")
+    parser.add_argument("--rows", type=int, default=50000, help="Flows to replay")
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--order", choices=["ltime", "stime", "file"], default="ltime",
+                        help="Replay order; the dataset definition orders connections by last time")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    if args.dataset:
+        from generate_threat import load_dataset_rows
+        rows = load_dataset_rows(args.dataset, args.rows)
+    else:
+        rows = synthetic_flows(args.rows, seed=5)
+    if args.order != "file":
+        key = "Ltime" if args.order == "ltime" else "Stime"
+        rows.sort(key=lambda r: r[key])  # stable: ties keep file order
+
+    engine = FlowFeatureEngine(window=args.window)
+    started = time.perf_counter()
+    computed = [engine.extract(0, row) for row in rows]
+    per_flow_us = (time.perf_counter() - started) / len(rows) * 1e6
+    print(f"[flow_features] {len(rows):,} flows, window {args.window}: {per_flow_us:.1f} us/flow")
+
+    mismatches = {name: 0 for name in FEATURE_NAMES}
+    for got, expected in zip(computed, reference_counts(rows, args.window)):
+        for name in FEATURE_NAMES:
+            mismatches[name] += got[name] != expected[name]
+    print("  vs reference recount: " + ", ".join(f"{n}={m}" for n, m in mismatches.items()))
+
+    dataset_match = {}
+    if args.dataset:
+        print(f"  vs dataset columns ({args.order} order):")
+        for name in FEATURE_NAMES + ("is_sm_ips_ports",):
+            exact = sum(c[name] == r[name] for c, r in zip(computed, rows)) / len(rows)
+            near = sum(abs(c[name] - r[name]) <= 1 for c, r in zip(computed, rows)) / len(rows)
+            dataset_match[name] = {"exact": exact, "within_1": near}
+            print(f"    {name:<18} exact {exact:7.2%}   within 1 {near:7.2%}")
+
+    write_results("flow_features", [{
+        "name": "flow_features.extract",
+        "params": {"rows": len(rows), "window": args.window, "order": args.order, "dataset": args.dataset},
+        "stats": {"per_flow_us": per_flow_us, "reference_mismatches": mismatches, "dataset_match": dataset_match},
+    }], args.output)
+    sys.exit(1 if any(mismatches.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
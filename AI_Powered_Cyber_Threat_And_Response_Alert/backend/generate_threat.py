@@ -1,21 +1,299 @@
-import requests
+"""
+Replay load generator for /api/analyze.
+
+Replays UNSW-NB15 rows (or synthetic rows drawn from their distributions)
+against a running backend at a fixed open-loop arrival rate: requests are
+scheduled on the clock, not when the previous one finishes, so a slow server
+shows up as latency instead of silently lowering the offered load. Latency
+is measured from each request's scheduled send time.
+
+Examples (from the backend folder):
+    # Single demo threat, like the old script
+    python generate_threat.py --email me@example.com --password secret --count 1
+
+    # 200 req/s for 60s, replaying the raw dataset with 4 authenticated sessions
+    python generate_threat.py --email me@example.com --password secret \\
+        --dataset ../ml_engine/data/raw/UNSW-NB15_1.csv --rate 200 --duration 60 --sessions 4
+
+    # Step load 50 -> 1000 req/s in +50 steps of 20s to find the saturation point
+    python generate_threat.py --token $TOKEN --step-load 50,50,1000 --step-duration 20 --slo-ms 250
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
 import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+# Ensure we can import from 'app'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.schemas.traffic import TrafficData
+
+# UNSW-NB15 raw CSVs are headerless; TrafficData lists the first 47 columns in file order
+FEATURE_FIELDS = [name for name in TrafficData.model_fields if name != "simulation"]
+FIELD_TYPES = {name: TrafficData.model_fields[name].annotation for name in FEATURE_FIELDS}
+
+
+# ============================================================
+#  ROW SOURCES
+# ============================================================
+def _coerce(value: str, kind):
+    value = (value or "").strip()
+    if kind is str:
+        return value.lower() or "none"
+    try:
+        if value.lower().startswith("0x"):
+            number = int(value, 16)
+        else:
+            number = float(value)
+    except ValueError:
+        number = 0
+    return int(number) if kind is int else float(number)
+
+
+def load_dataset_rows(path: str, limit: int):
+    """Reads up to `limit` rows of a raw UNSW-NB15 CSV as TrafficData payloads."""
+    rows = []
+    with open(path, newline="") as f:
+        for record in csv.reader(f):
+            if len(record) < len(FEATURE_FIELDS):
+                continue
+            row = {name: _coerce(record[i], FIELD_TYPES[name]) for i, name in enumerate(FEATURE_FIELDS)}
+            row["srcip"] = record[0].strip()
+            row["dstip"] = record[2].strip()
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+    if not rows:
+        raise SystemExit(f"No usable rows in {path}")
+    return rows
+
+
+def synthesize_from(rows: list, count: int, seed: int):
+    """Draws each column independently from its empirical distribution in `rows`."""
+    rng = random.Random(seed)
+    columns = {name: [r[name] for r in rows] for name in FEATURE_FIELDS}
+    return [{name: rng.choice(values) for name, values in columns.items()} for _ in range(count)]
+
+
+def build_payloads(args):
+    if args.dataset:
+        rows = load_dataset_rows(args.dataset, args.max_rows)
+        print(f"Loaded {len(rows):,} rows from {args.dataset}")
+        if args.synthetic:
+            rows = synthesize_from(rows, args.max_rows, args.seed)
+            print(f"Synthesized {len(rows):,} rows from the dataset marginals")
+    else:
+        from benchmarks.bench_utils import synthetic_flows
+        rows = synthetic_flows(min(args.max_rows, 20000), seed=args.seed)
+        print(f"No --dataset given: using {len(rows):,} synthetic UNSW-NB15-shaped rows")
+
+    for row in rows:
+        row["simulation"] = args.simulation
+    return rows
+
+
+# ============================================================
+#  SESSIONS
+# ============================================================
+async def open_sessions(args):
+    """Returns one AsyncClient per session, each carrying its own bearer token."""
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    clients = []
+    for _ in range(args.sessions):
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout)
+        token = args.token
+        if not token:
+            res = await client.post("/auth/login", json={
+                "email": args.email, "password": args.password, "mfa_code": args.mfa_code
+            })
+            if res.status_code != 200:
+                await client.aclose()
+                raise SystemExit(f"Login failed ({res.status_code}): {res.text}")
+            token = res.json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        clients.append(client)
+    return clients
+
+
+# ============================================================
+#  OPEN-LOOP RUNNER
+# ============================================================
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def run_phase(clients, payloads, rate: float, duration: float, concurrency: int, count: int = None):
+    """
+    Fires requests at `rate` per second for `duration` seconds (or `count`
+    requests), with at most `concurrency` in flight. Requests that cannot get
+    a slot wait, and that wait counts towards their latency.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], Counter()
+    rows = itertools.cycle(payloads)
+    sessions = itertools.cycle(clients)
+    total = count if count is not None else int(rate * duration)
+    interval = 1.0 / rate
+
+    async def fire(client, payload, scheduled):
+        async with semaphore:
+            try:
+                res = await client.post("/api/analyze", json=payload)
+                if res.status_code == 200:
+                    latencies.append(time.perf_counter() - scheduled)
+                else:
+                    errors[f"HTTP {res.status_code}"] += 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        scheduled = start + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(next(sessions), next(rows), scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    sent = len(tasks)
+    failed = sum(errors.values())
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "target_rps": rate,
+        "sent": sent,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "error_rate": round(failed / sent, 4) if sent else 0.0,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "p999_ms": ms(percentile(latencies, 99.9)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+def print_phase(report):
+    print(
+        f"  target={report['target_rps']:>7.1f}/s  achieved={report['throughput_rps']:>7.1f}/s  "
+        f"err={report['error_rate'] * 100:5.2f}%  p50={report['p50_ms']}ms  p95={report['p95_ms']}ms  "
+        f"p99={report['p99_ms']}ms  p999={report['p999_ms']}ms"
+    )
+    if report["errors"]:
+        print(f"    errors: {report['errors']}")
+
+
+def positive_float(value: str) -> float:
+    """argparse type for rates: 0 or less would divide by zero when scheduling."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def is_saturated(report, slo_ms: float, max_error_rate: float):
+    """A step is saturated when the server stops keeping up, errors, or misses the p99 SLO."""
+    if report["throughput_rps"] < 0.95 * report["target_rps"]:
+        return "throughput below 95% of offered load"
+    if report["error_rate"] > max_error_rate:
+        return f"error rate above {max_error_rate * 100:.1f}%"
+    if slo_ms and report["p99_ms"] is not None and report["p99_ms"] > slo_ms:
+        return f"p99 above {slo_ms}ms SLO"
+    return None
+
+
+async def main(args):
+    payloads = build_payloads(args)
+    clients = await open_sessions(args)
+    print(f"Opened {len(clients)} authenticated session(s) against {args.url}")
+
+    reports = []
+    try:
+        if args.step_load:
+            start, step, stop = (float(x) for x in args.step_load.split(","))
+            rate = start
+            saturation = None
+            while rate <= stop:
+                print(f"\nStep: {rate:.1f} req/s for {args.step_duration}s")
+                report = await run_phase(clients, payloads, rate, args.step_duration, args.concurrency)
+                print_phase(report)
+                reports.append(report)
+                reason = is_saturated(report, args.slo_ms, args.max_error_rate)
+                if reason:
+                    saturation = {"rate": rate, "reason": reason}
+                    print(f"\nSaturated at {rate:.1f} req/s ({reason}).")
+                    break
+                rate += step
+            if saturation is None:
+                print(f"\nNo saturation up to {stop:.1f} req/s.")
+            summary = {"mode": "step", "steps": reports, "saturation": saturation}
+        else:
+            print(f"\nOpen loop: {args.rate} req/s, concurrency {args.concurrency}")
+            report = await run_phase(clients, payloads, args.rate, args.duration, args.concurrency, args.count)
+            print_phase(report)
+            summary = {"mode": "constant", "result": report}
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay load generator for /api/analyze")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", default=os.getenv("LOADGEN_EMAIL"))
+    parser.add_argument("--password", default=os.getenv("LOADGEN_PASSWORD"))
+    parser.add_argument("--mfa-code", default=None)
+    parser.add_argument("--token", default=os.getenv("LOADGEN_TOKEN"), help="Use an existing bearer token")
+    parser.add_argument("--sessions", type=int, default=1, help="Independent authenticated clients")
+
+    parser.add_argument("--dataset", help="Raw UNSW-NB15 CSV to replay")
+    parser.add_argument("--synthetic", action="store_true", help="Sample rows from the dataset's column distributions")
+    parser.add_argument("--max-rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--simulation", action="store_true", help="Set the demo 'simulation' flag on each flow")
+
+    parser.add_argument("--rate", type=positive_float, default=50.0, help="Offered load in requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (constant mode)")
+    parser.add_argument("--count", type=int, default=None, help="Send exactly this many requests instead")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max requests in flight")
+    parser.add_argument("--timeout", type=float, default=10.0)
+
+    parser.add_argument("--step-load", help="start,step,stop in req/s to search for saturation")
+    parser.add_argument("--step-duration", type=float, default=20.0)
+    parser.add_argument("--slo-ms", type=float, default=0.0, help="p99 latency SLO used to detect saturation")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    if not args.token and not (args.email and args.password):
+        parser.error("Provide --token or --email/--password (or LOADGEN_* env vars)")
+    if args.step_load:
+        try:
+            start, step, stop = (positive_float(x) for x in args.step_load.split(","))
+        except (ValueError, argparse.ArgumentTypeError):
+            parser.error("--step-load takes start,step,stop, all greater than 0")
 
-data = {
-    "srcip": f"192.168.1.{random.randint(100, 200)}",
-    "srcport": random.randint(1024, 65535),
-    "dstip": "10.0.0.5",
-    "dstport": 80,
-    "proto": "TCP",
-    "service": "http",
-    "duration": 0.5,
-    "bytes": 1500,
-    "packets": 10
-}
-
-try:
-    response = requests.post("http://127.0.0.1:8000/api/analyze", json=data)
-    print(f"Status: {response.status_code}")
-    print(response.json())
-except Exception as e:
-    print(f"Error: {e}")
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main(args))
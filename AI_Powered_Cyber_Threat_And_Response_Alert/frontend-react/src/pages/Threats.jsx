@@ -318,6 +318,14 @@ export default function Threats() {
       setThreats((prev) => prev.map((t) => (t.id === id ? { ...t, status: "Investigating" } : t)));
     } else if (actionType === "FalsePositive") {
       setThreats((prev) => prev.map((t) => (t.id === id ? { ...t, status: "False Positive" } : t)));
+      try {
+        // Analyst verdict; also used to retrain the model
+        await performRemediationAction(id, "FalsePositive");
+        fetchThreatData();
+      } catch (error) {
+        console.error("Marking false positive failed:", error);
+        fetchThreatData();
+      }
     }
   };
 
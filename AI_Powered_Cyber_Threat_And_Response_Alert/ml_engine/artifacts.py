@@ -0,0 +1,138 @@
+"""
+Compact on-disk format for the encoded train/test matrices.
+
+Notebook 02 used to joblib.dump the dense float64 output of the preprocessor
+(train_data.joblib, test_data.joblib). Most of its columns are the one-hot
+block (proto alone has ~130 values), so the files were mostly zeros. Loading
+one meant reading the whole file and materialising it in RAM.
+
+A split is now a folder, models/encoded/<name>/:
+    numeric.npy         float32 (rows x scaled numeric columns)
+    onehot_*.npy        CSR data/indices/indptr of the one-hot block
+    labels.npy          int8
+    meta.json           row count, column slices, feature names
+
+Every array is a plain .npy, so it opens with mmap_mode="r". Nothing is read
+until it is used, and only the pages touched are resident. Use dense() to
+build a float32 matrix for training (sklearn's forests take float32 without
+another copy), or batches() to predict over a split in bounded memory.
+
+    from artifacts import save_split, load_split
+    save_split("train", preprocessor, X_train, y_train)   # transforms in chunks
+    train = load_split("train")
+    model.fit(train.dense(), train.y)
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENCODED_DIR = os.path.join(BASE_DIR, "models", "encoded")
+
+
+def save_split(name: str, preprocessor, X, y, out_dir: str = ENCODED_DIR, chunk_rows: int = 50_000) -> str:
+    """Encodes the raw frame X with a fitted preprocessor, chunk by chunk, straight into the compact format."""
+    from scipy import sparse
+
+    numeric_slice = preprocessor.output_indices_["num"]
+    onehot_slice = preprocessor.output_indices_["cat"]
+    rows = len(X)
+    path = os.path.join(out_dir, name)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    numeric = np.lib.format.open_memmap(
+        os.path.join(tmp_path, "numeric.npy"), mode="w+", dtype=np.float32,
+        shape=(rows, numeric_slice.stop - numeric_slice.start),
+    )
+    onehot_parts = []
+    for start in range(0, rows, chunk_rows):
+        encoded = preprocessor.transform(X.iloc[start:start + chunk_rows])
+        numeric[start:start + len(encoded)] = encoded[:, numeric_slice]
+        onehot_parts.append(sparse.csr_matrix(encoded[:, onehot_slice], dtype=np.float32))
+    numeric.flush()
+    del numeric
+    onehot = sparse.vstack(onehot_parts, format="csr") if onehot_parts else sparse.csr_matrix(
+        (0, onehot_slice.stop - onehot_slice.start), dtype=np.float32)
+    np.save(os.path.join(tmp_path, "onehot_data.npy"), onehot.data.astype(np.float32))
+    np.save(os.path.join(tmp_path, "onehot_indices.npy"), onehot.indices.astype(np.int32))
+    np.save(os.path.join(tmp_path, "onehot_indptr.npy"), onehot.indptr.astype(np.int64))
+    np.save(os.path.join(tmp_path, "labels.npy"), np.asarray(y, dtype=np.int8))
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "rows": rows,
+            "numeric": [numeric_slice.start, numeric_slice.stop],
+            "onehot": [onehot_slice.start, onehot_slice.stop],
+            "feature_names": list(preprocessor.get_feature_names_out()),
+        }, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+class EncodedSplit:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self.numeric_slice = slice(*self.meta["numeric"])
+        self.onehot_slice = slice(*self.meta["onehot"])
+        self.n_features = len(self.meta["feature_names"])
+        self._numeric = self._onehot = self._labels = None
+
+    def __len__(self):
+        return self.rows
+
+    def _load(self, name: str):
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    @property
+    def y(self) -> np.ndarray:
+        if self._labels is None:
+            self._labels = self._load("labels.npy")
+        return self._labels
+
+    @property
+    def numeric(self) -> np.ndarray:
+        if self._numeric is None:
+            self._numeric = self._load("numeric.npy")
+        return self._numeric
+
+    @property
+    def onehot(self):
+        """The one-hot block as a CSR matrix over the memory-mapped arrays."""
+        from scipy import sparse
+
+        if self._onehot is None:
+            width = self.onehot_slice.stop - self.onehot_slice.start
+            self._onehot = sparse.csr_matrix(
+                (self._load("onehot_data.npy"), self._load("onehot_indices.npy"), self._load("onehot_indptr.npy")),
+                shape=(self.rows, width), copy=False,
+            )
+        return self._onehot
+
+    def dense(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """Rows [start, stop) as one float32 matrix in the preprocessor's column order."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        out = np.zeros((max(stop - start, 0), self.n_features), dtype=np.float32)
+        out[:, self.numeric_slice] = self.numeric[start:stop]
+        block = self.onehot[start:stop]
+        rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+        out[rows, self.onehot_slice.start + block.indices] = block.data
+        return out
+
+    def batches(self, rows: int = 100_000):
+        for start in range(0, self.rows, rows):
+            yield self.dense(start, start + rows)
+
+
+def load_split(name: str, encoded_dir: str = ENCODED_DIR) -> EncodedSplit:
+    path = os.path.join(encoded_dir, name)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        raise FileNotFoundError(f"{path} not found (run notebooks/02_feature_engineering.ipynb)")
+    return EncodedSplit(path)
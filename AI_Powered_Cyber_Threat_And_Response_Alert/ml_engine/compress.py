@@ -0,0 +1,250 @@
+"""
+Compresses the served RandomForest into smaller, faster variants and exports
+the chosen one as a flat forest (rf_model.flat, see
+backend/app/services/flat_forest.py) that the backend loads in place of
+rf_model.joblib.
+
+Each variant combines:
+    --trees   best k trees, chosen greedily on a held-out half of the test
+              split: each step adds the tree that most lowers the log loss of
+              the averaged prediction
+    --depth   trees cut at this depth; a cut node becomes a leaf with its own
+              class probability (0 = unlimited)
+    --merge   sibling leaves whose attack probabilities differ by at most this
+              much fold into their parent, bottom-up (0 merges only identical
+              leaves, which changes no prediction)
+and every variant stores float32 thresholds (exact, see flat_forest.py).
+
+Variants are scored on the other half of the test split: accuracy, ROC AUC,
+size, and single-row p50/p99 latency of predict + predict_proba, which is
+what the API runs per flow. The unmodified sklearn model is the first row.
+
+Usage (from the ml_engine folder, after notebook 02 and a trained model):
+    python compress.py
+    python compress.py --trees 100 50 25 --depth 0 20 14 --merge 0 0.05
+    python compress.py --trees 50 --depth 20 --merge 0.05 --export t50-d20-m0.05 --promote
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from artifacts import ENCODED_DIR, load_split
+from train import MODEL_PATH, REGISTRY_DIR, set_current
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "..", "backend"))
+from app.services.flat_forest import FlatForest, node_depths, tree_arrays  # noqa: E402
+
+LATENCY_ROWS = 300
+
+
+# ============================================================
+#  TREE SURGERY (local arrays from flat_forest.tree_arrays)
+# ============================================================
+def compact(tree: dict) -> dict:
+    """Drops unreachable nodes and renumbers the rest in preorder, parents before children."""
+    order, stack = [], [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if tree["left"][node] >= 0:
+            stack.append(tree["right"][node])
+            stack.append(tree["left"][node])
+    order = np.array(order)
+    new_id = np.full(len(tree["left"]), -1, dtype=np.int32)
+    new_id[order] = np.arange(len(order), dtype=np.int32)
+    left, right = tree["left"][order], tree["right"][order]
+    leaf = left < 0
+    return {
+        "feature": np.where(leaf, -2, tree["feature"][order]).astype(np.int32),
+        "threshold": tree["threshold"][order],
+        "left": np.where(leaf, -1, new_id[np.maximum(left, 0)]).astype(np.int32),
+        "right": np.where(leaf, -1, new_id[np.maximum(right, 0)]).astype(np.int32),
+        "value": tree["value"][order],
+    }
+
+
+def _make_leaves(tree: dict, nodes) -> dict:
+    tree = {k: v.copy() for k, v in tree.items()}
+    tree["left"][nodes] = tree["right"][nodes] = -1
+    return compact(tree)
+
+
+def limit_depth(tree: dict, depth: int) -> dict:
+    if not depth:
+        return tree
+    cut = np.flatnonzero((node_depths(tree["left"], tree["right"]) == depth) & (tree["left"] >= 0))
+    return _make_leaves(tree, cut) if cut.size else tree
+
+
+def merge_leaves(tree: dict, tolerance: float) -> dict:
+    left, right, value = tree["left"].copy(), tree["right"], tree["value"]
+    depth = node_depths(left, right)
+    # Deepest level first, so a parent whose children just merged can merge in turn
+    for d in range(int(depth.max()) - 1, -1, -1):
+        nodes = np.flatnonzero((depth == d) & (left >= 0))
+        l, r = left[nodes], right[nodes]
+        merge = (left[l] < 0) & (left[r] < 0) & (np.abs(value[l] - value[r]) <= tolerance)
+        left[nodes[merge]] = -1
+    merged = np.flatnonzero((left < 0) & (tree["left"] >= 0))
+    return _make_leaves(tree, merged) if merged.size else tree
+
+
+def select_trees(leaf_values: np.ndarray, y: np.ndarray, k: int) -> list:
+    """Greedy forward selection: order of the first k trees by log-loss improvement of the average."""
+    eps = 1e-6
+    chosen, total = [], np.zeros(leaf_values.shape[1])
+    remaining = list(range(leaf_values.shape[0]))
+    for step in range(1, k + 1):
+        p = np.clip((total + leaf_values[remaining]) / step, eps, 1 - eps)
+        loss = -(y * np.log(p) + (1 - y) * np.log(1 - p)).mean(axis=1)
+        best = remaining.pop(int(np.argmin(loss)))
+        chosen.append(best)
+        total += leaf_values[best]
+    return chosen
+
+
+# ============================================================
+#  SCORING
+# ============================================================
+def score(model, X: np.ndarray, y: np.ndarray, sample: np.ndarray) -> dict:
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
+    p = model.predict_proba(X)[:, 1]
+    timings = []
+    for row in sample:
+        row = row[None, :]
+        started = time.perf_counter()
+        model.predict(row)
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - started)
+    timings_ms = np.array(timings) * 1000
+    return {
+        "accuracy": accuracy_score(y, model.classes_[(p > 0.5).astype(int)]),
+        "roc_auc": roc_auc_score(y, p) if len(np.unique(y)) > 1 else None,
+        "p50_ms": float(np.percentile(timings_ms, 50)),
+        "p99_ms": float(np.percentile(timings_ms, 99)),
+    }
+
+
+def variants(model, X_select, y_select, args):
+    """Yields (name, FlatForest) for every trees x depth x merge combination."""
+    positive = list(model.classes_).index(1)
+    base = [tree_arrays(e, positive) for e in model.estimators_]
+    for depth in args.depth:
+        trees = [limit_depth(t, depth) for t in base]
+        sizes = sorted({min(k, len(trees)) for k in args.trees}, reverse=True)
+        order = list(range(len(trees)))
+        if sizes[-1] < len(trees):
+            full = FlatForest.from_trees(trees, model.n_features_in_, model.classes_)
+            leaves = full.value[full.apply(X_select).T + full.roots[:, None]]  # trees x rows
+            order = select_trees(leaves, y_select, sizes[0])
+        for k in sizes:
+            subset = [trees[i] for i in order[:k]]
+            for tolerance in args.merge:
+                merged = [merge_leaves(t, tolerance) for t in subset]
+                name = f"t{k}-d{depth or 'max'}-m{tolerance:g}"
+                yield name, FlatForest.from_trees(merged, model.n_features_in_, model.classes_)
+
+
+def served_model_dir() -> str:
+    try:
+        with open(os.path.join(REGISTRY_DIR, "CURRENT")) as f:
+            return os.path.join(REGISTRY_DIR, f.read().strip())
+    except FileNotFoundError:
+        return MODEL_PATH
+
+
+# ============================================================
+#  EXPORT
+# ============================================================
+def export(name: str, forest: FlatForest, row: dict, source_dir: str, promote: bool) -> str:
+    version = time.strftime("%Y%m%d-%H%M%S") + "-" + name
+    path = os.path.join(REGISTRY_DIR, version)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    forest.save(os.path.join(tmp_path, "rf_model.flat"))
+    shutil.copy2(os.path.join(source_dir, "preprocessor.joblib"), os.path.join(tmp_path, "preprocessor.joblib"))
+    manifest = {
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "format": "flat",
+        "compressed_from": source_dir,
+        "variant": name,
+        "trees": forest.n_trees,
+        "nodes": forest.n_nodes,
+        "max_depth": forest.max_depth,
+        "metrics": {k: row[k] for k in ("accuracy", "roc_auc")},
+        "latency": {k: row[k] for k in ("p50_ms", "p99_ms")},
+        "model_bytes": row["bytes"],
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    os.replace(tmp_path, path)
+    print(f"Exported {path}")
+    if promote:
+        set_current(version)
+    else:
+        print(f"Serve it with MODEL_VERSION={version} or --promote")
+    return version
+
+
+def run(args):
+    source_dir = os.path.dirname(os.path.abspath(args.model)) if args.model else served_model_dir()
+    model_file = args.model or os.path.join(source_dir, "rf_model.joblib")
+    print(f"Compressing {model_file}")
+    model = joblib.load(model_file)
+    model.n_jobs = None
+
+    test = load_split("test", args.encoded)
+    rows = min(args.rows or len(test), len(test))
+    X, y = test.dense(0, rows), np.asarray(test.y[:rows])
+    half = rows // 2
+    X_select, y_select, X_eval, y_eval = X[:half], y[:half], X[half:], y[half:]
+    sample = X_eval[:LATENCY_ROWS]
+    print(f"Selecting on {half:,} test rows, scoring on {rows - half:,}")
+
+    results = []
+    original = score(model, X_eval, y_eval, sample)
+    original.update(name="original (sklearn)", trees=len(model.estimators_), nodes=int(
+        sum(e.tree_.node_count for e in model.estimators_)), bytes=os.path.getsize(model_file))
+    results.append(original)
+    chosen = None
+    for name, forest in variants(model, X_select, y_select, args):
+        row = score(forest, X_eval, y_eval, sample)
+        row.update(name=name, trees=forest.n_trees, nodes=forest.n_nodes, bytes=len(forest.to_bytes()))
+        results.append(row)
+        if name == args.export:
+            chosen = (forest, row)
+
+    print(f"\n{'variant':<22}{'trees':>6}{'nodes':>10}{'acc':>9}{'auc':>9}{'MB':>8}{'p50 ms':>8}{'p99 ms':>8}")
+    for r in results:
+        auc = f"{r['roc_auc']:.4f}" if r["roc_auc"] is not None else "-"
+        print(f"{r['name']:<22}{r['trees']:>6}{r['nodes']:>10,}{r['accuracy']:>9.4f}{auc:>9}"
+              f"{r['bytes'] / 2**20:>8.2f}{r['p50_ms']:>8.2f}{r['p99_ms']:>8.2f}")
+
+    if args.export:
+        if chosen is None:
+            raise SystemExit(f"No variant named {args.export}")
+        export(args.export, chosen[0], chosen[1], source_dir, args.promote)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress the RandomForest and export a flat forest")
+    parser.add_argument("--model", default=None, help="rf_model.joblib (default: the served version)")
+    parser.add_argument("--trees", type=int, nargs="+", default=[100, 50, 25])
+    parser.add_argument("--depth", type=int, nargs="+", default=[0, 20, 14], help="0 = unlimited")
+    parser.add_argument("--merge", type=float, nargs="+", default=[0, 0.05], help="Leaf merge tolerance")
+    parser.add_argument("--rows", type=int, default=40_000, help="Test rows used (half select, half score)")
+    parser.add_argument("--encoded", default=ENCODED_DIR, help="Encoded splits written by notebook 02")
+    parser.add_argument("--export", default=None, help="Variant name from the table to export")
+    parser.add_argument("--promote", action="store_true", help="Point registry/CURRENT at the export")
+    run(parser.parse_args())
@@ -1,116 +1,394 @@
-import joblib
+"""
+Evaluation report for the served model (or --model). It writes four plots
+to plots/ plus a report.json: confusion matrix, ROC curve, threshold sweep
+(precision/recall/F1 per cut-off) and learning curve.
+
+Scoring
+    The test split is scored once with predict_proba. Labels are its 0.5
+    cut, the same as predict, so the model is not run twice. Rows are
+    scored in chunks across --workers processes, and each process loads the
+    model once.
+
+Cache
+    Scores are saved under models/eval_cache/<model checksum>/, keyed by a
+    checksum of the test split. Learning-curve results are keyed by the
+    train split. The checksums are SHA-1s of the files themselves, so a
+    retrained model or a rewritten split is a miss. For an unchanged model
+    a rerun only redraws, which takes seconds.
+
+Curves
+    ROC and the threshold sweep are computed with NumPy: one sort, then
+    cumulative counts. --sample N computes them on a stratified sample of N
+    test rows (class ratios kept) instead of every row. The confusion
+    matrix and accuracy always use every row.
+
+Rendering
+    Each plot is drawn in its own process (matplotlib Agg backend).
+
+Usage (from the ml_engine folder, after notebook 02 and a trained model):
+    python generate_plots.py
+    python generate_plots.py --sample 200000 --workers 4
+    python generate_plots.py --model models/registry/<version>/rf_model.joblib --no-learning-curve
+"""
+import argparse
+import hashlib
+import json
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import confusion_matrix, roc_curve, auc
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
 import numpy as np
 
-# Setup paths
+from artifacts import ENCODED_DIR, load_split
+from compress import FlatForest, served_model_dir
+from train import MODEL_PATH
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "models")
 PLOTS_DIR = os.path.join(BASE_DIR, "plots")
+CACHE_DIR = os.path.join(MODEL_PATH, "eval_cache")
 
-# Create plots directory if it doesn't exist
-if not os.path.exists(PLOTS_DIR):
-    os.makedirs(PLOTS_DIR)
+SWEEP_THRESHOLDS = np.linspace(0, 1, 101)
+LEARNING_CURVE_ROWS = 50_000
 
-def generate_plots():
-    print("Loading test data (this might take a minute)...")
-    try:
-        X_test, y_test = joblib.load(os.path.join(MODEL_PATH, "test_data.joblib"))
-        print("Data loaded.")
-    except FileNotFoundError:
-        print("Error: test_data.joblib not found in models directory.")
-        return
 
-    print("Loading model...")
-    try:
-        model = joblib.load(os.path.join(MODEL_PATH, "rf_model.joblib"))
-        print("Model loaded.")
-    except FileNotFoundError:
-        print("Error: rf_model.joblib not found in models directory.")
-        return
+# ============================================================
+#  CHECKSUMS + CACHE
+# ============================================================
+def checksum(paths: list) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def split_checksum(split) -> str:
+    return checksum([os.path.join(split.path, name) for name in sorted(os.listdir(split.path))])
+
+
+def _save_npy(path: str, array: np.ndarray):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path: str, payload: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+#  SCORING (worker processes)
+# ============================================================
+def model_file(path: str = None) -> str:
+    if path:
+        return os.path.abspath(path)
+    model_dir = served_model_dir()
+    flat_file = os.path.join(model_dir, "rf_model.flat")
+    return flat_file if os.path.exists(flat_file) else os.path.join(model_dir, "rf_model.joblib")
+
+
+def load_model(path: str):
+    if path.endswith(".flat"):
+        return FlatForest.load(path)
+    model = joblib.load(path)
+    # Chunks are already spread over processes
+    model.n_jobs = None
+    return model
+
+
+_worker = {}
+
+
+def _init_scorer(path: str, encoded_dir: str):
+    _worker["model"] = load_model(path)
+    _worker["test"] = load_split("test", encoded_dir)
+
+
+def _score_chunk(start: int, stop: int) -> np.ndarray:
+    X = _worker["test"].dense(start, stop)
+    return _worker["model"].predict_proba(X)[:, 1].astype(np.float32)
+
+
+def score(path: str, encoded_dir: str, rows: int, workers: int, chunk_rows: int) -> np.ndarray:
+    """Attack probability for every test row, scored in chunks across worker processes."""
+    bounds = [(start, min(start + chunk_rows, rows)) for start in range(0, rows, chunk_rows)]
+    workers = max(1, min(workers, len(bounds)))
+    if workers == 1:
+        _init_scorer(path, encoded_dir)
+        return np.concatenate([_score_chunk(start, stop) for start, stop in bounds])
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scorer,
+                             initargs=(path, encoded_dir)) as pool:
+        # map keeps the chunk order
+        return np.concatenate(list(pool.map(_score_chunk, *zip(*bounds))))
+
+
+def cached_scores(path: str, model_sum: str, test, args) -> tuple:
+    """(scores, classes, cache hit)."""
+    cache_dir = os.path.join(CACHE_DIR, model_sum)
+    test_sum = split_checksum(test)
+    scores_file = os.path.join(cache_dir, f"scores-{test_sum}.npy")
+    meta_file = os.path.join(cache_dir, f"scores-{test_sum}.json")
+    if os.path.exists(scores_file) and os.path.exists(meta_file):
+        with open(meta_file) as f:
+            meta = json.load(f)
+        return np.load(scores_file), meta["classes"], True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    started = time.perf_counter()
+    scores = score(path, args.encoded, len(test), args.workers, args.chunk_rows)
+    classes = [int(c) for c in load_model(path).classes_]
+    _save_npy(scores_file, scores)
+    # Written last: its presence marks the entry complete
+    _write_json(meta_file, {"model": path, "test_checksum": test_sum, "rows": len(scores), "classes": classes,
+                            "score_seconds": round(time.perf_counter() - started, 2)})
+    return scores, classes, False
+
+
+# ============================================================
+#  METRICS (vectorized)
+# ============================================================
+def stratified_sample(y: np.ndarray, n: int, seed: int = 42) -> np.ndarray:
+    """Row indices of about n rows with the class ratios of y."""
+    if not n or n >= len(y):
+        return np.arange(len(y))
+    rng = np.random.default_rng(seed)
+    picked = []
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        take = max(1, round(n * len(rows) / len(y)))
+        picked.append(rng.choice(rows, size=min(take, len(rows)), replace=False))
+    return np.sort(np.concatenate(picked))
 
-    print("Running predictions...")
-    y_pred = model.predict(X_test)
-    y_prob = model.predict_proba(X_test)[:, 1]
 
-    # --- 1. Confusion Matrix ---
-    print("Generating Confusion Matrix...")
+def roc_points(positive: np.ndarray, scores: np.ndarray) -> tuple:
+    """(fpr, tpr, auc) with one point per distinct score, like sklearn's roc_curve without dropping points."""
+    order = np.argsort(-scores, kind="stable")
+    ranked, hits = scores[order], positive[order]
+    # Last row of each run of tied scores
+    ends = np.append(np.flatnonzero(np.diff(ranked)), len(ranked) - 1)
+    tp = np.cumsum(hits)[ends]
+    fp = ends + 1 - tp
+    tpr = np.concatenate([[0.0], tp / max(tp[-1], 1)])
+    fpr = np.concatenate([[0.0], fp / max(fp[-1], 1)])
+    auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    return fpr, tpr, auc
+
+
+def threshold_sweep(positive: np.ndarray, scores: np.ndarray, thresholds: np.ndarray = SWEEP_THRESHOLDS) -> dict:
+    """Precision/recall/F1/FPR when flows scoring above each threshold are flagged."""
+    pos = np.sort(scores[positive])
+    neg = np.sort(scores[~positive])
+    tp = len(pos) - np.searchsorted(pos, thresholds, side="right")
+    fp = len(neg) - np.searchsorted(neg, thresholds, side="right")
+    flagged = tp + fp
+    precision = np.divide(tp, flagged, out=np.ones(len(thresholds)), where=flagged > 0)
+    recall = tp / max(len(pos), 1)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(thresholds)),
+                   where=(precision + recall) > 0)
+    return {"threshold": thresholds, "precision": precision, "recall": recall, "f1": f1,
+            "fpr": fp / max(len(neg), 1)}
+
+
+def confusion(y: np.ndarray, y_pred: np.ndarray, classes: list) -> np.ndarray:
+    # classes_ is sorted, so searchsorted maps labels to matrix indices
+    true, pred = np.searchsorted(classes, y), np.searchsorted(classes, y_pred)
+    return np.bincount(true * len(classes) + pred, minlength=len(classes) ** 2).reshape(len(classes), -1)
+
+
+def learning_curve_scores(path: str, model_sum: str, args) -> tuple:
+    """(train_sizes, train_scores, test_scores, cache hit); refits the model, so it is cached by model + train split."""
+    train = load_split("train", args.encoded)
+    rows = min(LEARNING_CURVE_ROWS, len(train))
+    cache_file = os.path.join(CACHE_DIR, model_sum, f"learning_curve-{split_checksum(train)}-{rows}.npz")
+    if os.path.exists(cache_file):
+        cached = np.load(cache_file)
+        return cached["sizes"], cached["train"], cached["test"], True
+
+    from sklearn.model_selection import learning_curve
+
+    model = joblib.load(path)
+    model.n_jobs = None
+    sizes, train_scores, test_scores = learning_curve(
+        model, train.dense(0, rows), np.asarray(train.y[:rows]), cv=3, n_jobs=args.workers,
+        train_sizes=np.linspace(0.1, 1.0, 5), scoring="accuracy",
+    )
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_path = cache_file + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, sizes=sizes, train=train_scores, test=test_scores)
+    os.replace(tmp_path, cache_file)
+    return sizes, train_scores, test_scores, False
+
+
+# ============================================================
+#  RENDERING (one process per plot)
+# ============================================================
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def render_confusion_matrix(path: str, cm: np.ndarray):
+    import seaborn as sns
+
+    plt = _pyplot()
     plt.figure(figsize=(8, 6))
-    cm = confusion_matrix(y_test, y_pred)
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
     plt.title('Confusion Matrix - Random Forest')
     plt.xlabel('Predicted Label')
     plt.ylabel('True Label')
-    plt.savefig(os.path.join(PLOTS_DIR, "confusion_matrix.png"))
+    plt.savefig(path)
     plt.close()
-    print(f"Saved {os.path.join(PLOTS_DIR, 'confusion_matrix.png')}")
+    return path
 
-    # --- 2. ROC Curve ---
-    print("Generating ROC Curve...")
-    fpr, tpr, _ = roc_curve(y_test, y_prob)
-    roc_auc = auc(fpr, tpr)
 
+def render_roc_curve(path: str, fpr: np.ndarray, tpr: np.ndarray, roc_auc: float, rows: int):
+    plt = _pyplot()
     plt.figure(figsize=(8, 6))
-    plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (area = {roc_auc:.2f})')
+    plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (area = {roc_auc:.4f})')
     plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
     plt.xlim([0.0, 1.0])
     plt.ylim([0.0, 1.05])
     plt.xlabel('False Positive Rate')
     plt.ylabel('True Positive Rate')
-    plt.title('Receiver Operating Characteristic (ROC)')
+    plt.title(f'Receiver Operating Characteristic (ROC), {rows:,} rows')
     plt.legend(loc="lower right")
     plt.grid(True)
-    plt.savefig(os.path.join(PLOTS_DIR, "roc_curve.png"))
+    plt.savefig(path)
     plt.close()
-    print(f"Saved {os.path.join(PLOTS_DIR, 'roc_curve.png')}")
+    return path
 
-    # --- 3. Learning Curve (Accuracy Graph) ---
-    print("Generating Learning Curve (this will take a moment)...")
-    from sklearn.model_selection import learning_curve
-    
-    # Use a subset for speed (first 50k samples)
+
+def render_threshold_sweep(path: str, sweep: dict, best: float):
+    plt = _pyplot()
+    plt.figure(figsize=(8, 6))
+    for metric, color in (("precision", "b"), ("recall", "g"), ("f1", "r"), ("fpr", "gray")):
+        plt.plot(sweep["threshold"], sweep[metric], color=color, lw=2, label=metric.upper() if metric == "fpr"
+                 else metric.capitalize())
+    plt.axvline(0.5, color='navy', linestyle='--', label='Served cut-off (0.5)')
+    plt.axvline(best, color='r', linestyle=':', label=f'Best F1 ({best:.2f})')
+    plt.xlabel('Attack probability threshold')
+    plt.ylabel('Score')
+    plt.title('Threshold Sweep')
+    plt.legend(loc="best")
+    plt.grid(True)
+    plt.savefig(path)
+    plt.close()
+    return path
+
+
+def render_learning_curve(path: str, train_sizes: np.ndarray, train_scores: np.ndarray, test_scores: np.ndarray):
+    plt = _pyplot()
+    train_scores_mean = np.mean(train_scores, axis=1)
+    train_scores_std = np.std(train_scores, axis=1)
+    test_scores_mean = np.mean(test_scores, axis=1)
+    test_scores_std = np.std(test_scores, axis=1)
+
+    plt.figure(figsize=(8, 6))
+    plt.fill_between(train_sizes, train_scores_mean - train_scores_std,
+                     train_scores_mean + train_scores_std, alpha=0.1, color="r")
+    plt.fill_between(train_sizes, test_scores_mean - test_scores_std,
+                     test_scores_mean + test_scores_std, alpha=0.1, color="g")
+    plt.plot(train_sizes, train_scores_mean, 'o-', color="r", label="Training score")
+    plt.plot(train_sizes, test_scores_mean, 'o-', color="g", label="Cross-validation score")
+    plt.xlabel("Training examples")
+    plt.ylabel("Accuracy Score")
+    plt.title("Learning Curve (Accuracy)")
+    plt.legend(loc="best")
+    plt.grid(True)
+    plt.savefig(path)
+    plt.close()
+    return path
+
+
+# ============================================================
+#  REPORT
+# ============================================================
+def generate_plots(args):
+    started = time.perf_counter()
     try:
-        X_train, y_train = joblib.load(os.path.join(MODEL_PATH, "train_data.joblib"))
-        subset_size = 50000
-        if len(X_train) > subset_size:
-            X_subset = X_train[:subset_size]
-            y_subset = y_train[:subset_size]
+        # Memory-mapped; rows are only read when scored
+        test = load_split("test", args.encoded)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+    path = model_file(args.model)
+    if not os.path.exists(path):
+        print(f"Error: {path} not found.")
+        return
+    model_sum = checksum([path])
+    print(f"Model {path} ({model_sum}), {len(test):,} test rows")
+
+    scores, classes, hit = cached_scores(path, model_sum, test, args)
+    print(f"Scores: {'cached' if hit else 'computed'} ({time.perf_counter() - started:.1f}s)")
+    y_test = np.asarray(test.y)
+    y_pred = np.asarray(classes)[(scores > 0.5).astype(int)]
+    cm = confusion(y_test, y_pred, classes)
+
+    sample = stratified_sample(y_test, args.sample)
+    positive = y_test[sample] == classes[-1]
+    fpr, tpr, roc_auc = roc_points(positive, scores[sample])
+    sweep = threshold_sweep(positive, scores[sample])
+    best = int(np.argmax(sweep["f1"]))
+
+    os.makedirs(PLOTS_DIR, exist_ok=True)
+    jobs = [
+        (render_confusion_matrix, os.path.join(PLOTS_DIR, "confusion_matrix.png"), cm),
+        (render_roc_curve, os.path.join(PLOTS_DIR, "roc_curve.png"), fpr, tpr, roc_auc, len(sample)),
+        (render_threshold_sweep, os.path.join(PLOTS_DIR, "threshold_sweep.png"), sweep,
+         float(sweep["threshold"][best])),
+    ]
+    learning = None
+    if args.learning_curve:
+        if path.endswith(".flat"):
+            print("Learning curve skipped: a flat forest cannot be refitted (use --model rf_model.joblib)")
         else:
-            X_subset = X_train
-            y_subset = y_train
-            
-        train_sizes, train_scores, test_scores = learning_curve(
-            model, X_subset, y_subset, cv=3, n_jobs=-1, 
-            train_sizes=np.linspace(0.1, 1.0, 5), scoring='accuracy'
-        )
-
-        train_scores_mean = np.mean(train_scores, axis=1)
-        train_scores_std = np.std(train_scores, axis=1)
-        test_scores_mean = np.mean(test_scores, axis=1)
-        test_scores_std = np.std(test_scores, axis=1)
-
-        plt.figure(figsize=(8, 6))
-        plt.fill_between(train_sizes, train_scores_mean - train_scores_std,
-                         train_scores_mean + train_scores_std, alpha=0.1, color="r")
-        plt.fill_between(train_sizes, test_scores_mean - test_scores_std,
-                         test_scores_mean + test_scores_std, alpha=0.1, color="g")
-        plt.plot(train_sizes, train_scores_mean, 'o-', color="r", label="Training score")
-        plt.plot(train_sizes, test_scores_mean, 'o-', color="g", label="Cross-validation score")
-
-        plt.xlabel("Training examples")
-        plt.ylabel("Accuracy Score")
-        plt.title("Learning Curve (Accuracy)")
-        plt.legend(loc="best")
-        plt.grid(True)
-        plt.savefig(os.path.join(PLOTS_DIR, "learning_curve.png"))
-        plt.close()
-        print(f"Saved {os.path.join(PLOTS_DIR, 'learning_curve.png')}")
-    except Exception as e:
-        print(f"Could not generate learning curve: {e}")
-
-    print("\nAll plots generated successfully!")
+            try:
+                *curve, lc_hit = learning_curve_scores(path, model_sum, args)
+                print(f"Learning curve: {'cached' if lc_hit else 'computed'}")
+                jobs.append((render_learning_curve, os.path.join(PLOTS_DIR, "learning_curve.png"), *curve))
+                learning = {"train_sizes": curve[0].tolist(), "cv_accuracy": curve[2].mean(axis=1).tolist()}
+            except Exception as e:
+                print(f"Could not generate learning curve: {e}")
+
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        futures = [pool.submit(*job) for job in jobs]
+        for future in futures:
+            try:
+                print(f"Saved {future.result()}")
+            except Exception as e:
+                print(f"Plot failed: {e}")
+
+    _write_json(os.path.join(PLOTS_DIR, "report.json"), {
+        "model": path,
+        "model_checksum": model_sum,
+        "rows": len(scores),
+        "curve_rows": len(sample),
+        "accuracy": float((y_pred == y_test).mean()),
+        "roc_auc": roc_auc,
+        "confusion_matrix": cm.tolist(),
+        "best_f1_threshold": {k: float(v[best]) for k, v in sweep.items()},
+        "at_0.5": {k: float(v[50]) for k, v in sweep.items()},
+        "learning_curve": learning,
+        "seconds": round(time.perf_counter() - started, 2),
+    })
+    print(f"\nReport written to {PLOTS_DIR} in {time.perf_counter() - started:.1f}s")
+
 
 if __name__ == "__main__":
-    generate_plots()
+    parser = argparse.ArgumentParser(description="Evaluation plots and report for the RandomForest")
+    parser.add_argument("--model", default=None, help="rf_model.joblib or rf_model.flat (default: the served version)")
+    parser.add_argument("--encoded", default=ENCODED_DIR, help="Encoded splits written by notebook 02")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring/rendering processes")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Test rows per scoring task")
+    parser.add_argument("--sample", type=int, default=0, help="Stratified rows for ROC/threshold sweep (0 = all)")
+    parser.add_argument("--no-learning-curve", dest="learning_curve", action="store_false")
+    generate_plots(parser.parse_args())
@@ -0,0 +1,169 @@
+"""
+Cleans the raw UNSW-NB15 CSVs into the Parquet dataset the feature
+engineering notebook reads (replaces notebooks/01_preprocessing.ipynb).
+
+Same cleaning as the notebook:
+    - drop srcip, dstip, Stime, Ltime, sport, dsport (never even parsed here)
+    - proto/service/state: missing -> "none", lower-cased
+    - attack_cat: missing -> "normal", stripped, lower-cased
+    - ct_flw_http_mthd, is_ftp_login, ct_ftp_cmd: anything non-numeric -> 0
+
+Differences are in how it runs, not what it produces:
+    - each CSV is streamed in blocks of --block-mb with pyarrow's CSV
+      reader, cleaned block by block and appended to its own Parquet file,
+      so peak memory is about workers x a few blocks, whatever the dataset size
+    - files are processed in parallel, one process per file (--workers)
+    - compact types: int32 counters (uint32 TCP sequence numbers, int8
+      Label), float32 measurements, dictionary-encoded strings. That is
+      about half the size of the pandas int64/float64/object output
+
+Output is a directory of part files, data/processed/cleaned_data.parquet/,
+with no partition columns. pd.read_parquet() and pyarrow read it like the old
+single file.
+
+Usage (from the ml_engine folder):
+    python preprocess.py
+    python preprocess.py --raw data/raw --out data/processed/cleaned_data.parquet --workers 4
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(BASE_DIR, "data", "raw")
+OUT_PATH = os.path.join(BASE_DIR, "data", "processed", "cleaned_data.parquet")
+
+# Raw files are headerless
+COL_NAMES = [
+    "srcip", "sport", "dstip", "dsport", "proto", "state", "dur", "sbytes", "dbytes",
+    "sttl", "dttl", "sloss", "dloss", "service", "Sload", "Dload", "Spkts", "Dpkts",
+    "swin", "dwin", "stcpb", "dtcpb", "smeansz", "dmeansz", "trans_depth", "res_bdy_len",
+    "Sjit", "Djit", "Stime", "Ltime", "Sintpkt", "Dintpkt", "tcprtt", "synack", "ackdat",
+    "is_sm_ips_ports", "ct_state_ttl", "ct_flw_http_mthd", "is_ftp_login", "ct_ftp_cmd",
+    "ct_srv_src", "ct_srv_dst", "ct_dst_ltm", "ct_src_ltm", "ct_src_dport_ltm",
+    "ct_dst_sport_ltm", "ct_dst_src_ltm", "attack_cat", "Label"
+]
+DROP_COLUMNS = {"srcip", "dstip", "Stime", "Ltime", "sport", "dsport"}
+CATEGORICAL = ["proto", "state", "service"]
+# Contain blanks and stray text in the raw files
+COERCE_COLUMNS = ["ct_flw_http_mthd", "is_ftp_login", "ct_ftp_cmd"]
+FLOAT_COLUMNS = ["dur", "Sload", "Dload", "Sjit", "Djit", "Sintpkt", "Dintpkt", "tcprtt", "synack", "ackdat"]
+UINT32_COLUMNS = ["stcpb", "dtcpb"]  # TCP base sequence numbers go up to 2^32 - 1
+KEEP_COLUMNS = [c for c in COL_NAMES if c not in DROP_COLUMNS]
+NUMERIC_PATTERN = r"^\s*-?[0-9]+(\.[0-9]*)?\s*$"
+
+
+def output_schema():
+    import pyarrow as pa
+
+    fields = []
+    for name in KEEP_COLUMNS:
+        if name in CATEGORICAL or name == "attack_cat":
+            kind = pa.dictionary(pa.int32(), pa.string())
+        elif name in FLOAT_COLUMNS:
+            kind = pa.float32()
+        elif name in UINT32_COLUMNS:
+            kind = pa.uint32()
+        elif name == "Label":
+            kind = pa.int8()
+        else:
+            kind = pa.int32()
+        fields.append(pa.field(name, kind))
+    return pa.schema(fields)
+
+
+def _read_options(block_mb: int):
+    import pyarrow as pa
+    from pyarrow import csv
+
+    column_types = {}
+    for name in KEEP_COLUMNS:
+        if name in CATEGORICAL or name in COERCE_COLUMNS or name == "attack_cat":
+            column_types[name] = pa.string()
+        elif name in FLOAT_COLUMNS:
+            column_types[name] = pa.float64()
+        else:
+            column_types[name] = pa.int64()
+    return (
+        csv.ReadOptions(column_names=COL_NAMES, block_size=block_mb << 20),
+        csv.ConvertOptions(column_types=column_types, include_columns=KEEP_COLUMNS,
+                           strings_can_be_null=True, null_values=[""]),
+    )
+
+
+def clean_batch(batch, schema):
+    """One streamed block -> a table with the notebook's cleaning and compact types (safe casts)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = []
+    for field in schema:
+        column = batch.column(field.name)
+        if field.name in CATEGORICAL:
+            column = pc.utf8_lower(pc.fill_null(column, "none"))
+        elif field.name == "attack_cat":
+            column = pc.utf8_lower(pc.utf8_trim_whitespace(pc.fill_null(column, "normal")))
+        elif field.name in COERCE_COLUMNS:
+            numeric = pc.match_substring_regex(pc.fill_null(column, ""), NUMERIC_PATTERN)
+            column = pc.if_else(numeric, column, pa.scalar(None, pa.string()))
+            column = pc.fill_null(pc.cast(pc.utf8_trim_whitespace(column), pa.float64()), 0)
+            column = pc.cast(pc.trunc(column), pa.int64())
+        columns.append(pc.cast(column, field.type))  # raises on overflow instead of wrapping
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def process_file(path: str, out_dir: str, block_mb: int) -> tuple:
+    import pyarrow.parquet as pq
+    from pyarrow import csv
+
+    started = time.perf_counter()
+    schema = output_schema()
+    read_options, convert_options = _read_options(block_mb)
+    out_file = os.path.join(out_dir, f"part-{os.path.splitext(os.path.basename(path))[0]}.parquet")
+    rows = 0
+    reader = csv.open_csv(path, read_options=read_options, convert_options=convert_options)
+    with pq.ParquetWriter(out_file, schema, compression="zstd") as writer:
+        for batch in reader:
+            table = clean_batch(batch, schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    return os.path.basename(path), rows, time.perf_counter() - started
+
+
+def run(raw_dir: str, out_path: str, workers: int, block_mb: int):
+    files = sorted(glob.glob(os.path.join(raw_dir, "UNSW-NB15_*.csv")))
+    if not files:
+        raise SystemExit(f"No UNSW-NB15_*.csv files in {raw_dir}")
+    # Written next to the target and swapped in at the end, so a failed run leaves the old dataset intact
+    tmp_dir = out_path + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(files)))
+    print(f"Cleaning {len(files)} file(s) with {workers} worker(s), {block_mb} MB blocks...")
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, rows, seconds in pool.map(process_file, files, [tmp_dir] * len(files), [block_mb] * len(files)):
+            total += rows
+            print(f"  {name}: {rows:,} rows in {seconds:.1f}s")
+
+    if os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+    elif os.path.exists(out_path):
+        os.remove(out_path)  # the old single-file output
+    os.replace(tmp_dir, out_path)
+    print(f"Saved {total:,} rows to {out_path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream-clean the raw UNSW-NB15 CSVs into a Parquet dataset")
+    parser.add_argument("--raw", default=RAW_DIR, help="Folder with UNSW-NB15_1.csv ... UNSW-NB15_4.csv")
+    parser.add_argument("--out", default=OUT_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-mb", type=int, default=16, help="CSV bytes parsed per block")
+    args = parser.parse_args()
+    run(args.raw, args.out, args.workers, args.block_mb)
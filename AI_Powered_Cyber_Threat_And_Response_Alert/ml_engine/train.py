@@ -0,0 +1,356 @@
+"""
+Scripted RandomForest training: hyperparameter sweeps, resumable, profiled.
+(The scripted form of notebooks/03_model_training.ipynb.)
+
+Every combination of the given hyperparameters is one candidate. Candidates
+are fitted in parallel, one process each (--workers; each fit uses
+--jobs-per-fit cores). All processes memory-map the same float32 training
+matrix, written once per sweep and data fingerprint from the encoded split
+(see artifacts.py). RAM therefore stays about one training matrix plus one forest
+per worker, however many candidates there are. Each worker process exits
+after one fit, so its memory is returned.
+
+A finished fit is checkpointed under models/sweeps/<sweep>/<candidate>/
+(model.joblib, then result.json). Re-running the same command skips those
+candidates, so an interrupted sweep resumes where it stopped. Candidate ids
+hash the hyperparameters and the training data, so new data means new fits.
+
+Per candidate the report has test accuracy/precision/recall/F1/ROC AUC, fit
+wall time, model size on disk, load time, and inference latency. Latency is
+single-row predict + predict_proba p50/p99 (what the API does per flow) plus
+batch throughput. It is timed in this process, one candidate at a time, after
+the fits finish, so parallel fits do not skew it. Candidates on the
+accuracy/latency frontier are marked.
+
+--publish copies the chosen candidate into models/registry/<version>/
+together with preprocessor.joblib and a manifest.json. It picks the most
+accurate candidate, or the most accurate under --max-latency-ms. --promote
+also points models/registry/CURRENT at it; the backend serves CURRENT
+(or MODEL_VERSION).
+
+Usage (from the ml_engine folder, after notebook 02):
+    python train.py
+    python train.py --n-estimators 50 100 200 --max-depth 0 20 --min-samples-leaf 1 2 --workers 4
+    python train.py --n-estimators 50 100 --publish --max-latency-ms 10 --promote --isolation-forest
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+
+from artifacts import ENCODED_DIR, load_split
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "models")
+SWEEPS_DIR = os.path.join(MODEL_PATH, "sweeps")
+REGISTRY_DIR = os.path.join(MODEL_PATH, "registry")
+
+LATENCY_ROWS = 200
+THROUGHPUT_ROWS = 10_000
+
+
+# ============================================================
+#  SWEEP SETUP
+# ============================================================
+def candidate_grid(args) -> list:
+    grid = []
+    for trees, depth, leaf, features in itertools.product(
+            args.n_estimators, args.max_depth, args.min_samples_leaf, args.max_features):
+        grid.append({
+            "n_estimators": trees,
+            "max_depth": depth or None,  # 0 on the command line = unlimited
+            "min_samples_leaf": leaf,
+            "max_features": float(features) if features.replace(".", "", 1).isdigit() else features,
+        })
+    return grid
+
+
+def data_fingerprint(encoded_dir: str, train_rows: int) -> str:
+    """Changes whenever notebook 02 rewrites the splits."""
+    digest = hashlib.sha1(str(train_rows).encode())
+    for name in ("train", "test"):
+        meta = os.path.join(encoded_dir, name, "meta.json")
+        with open(meta, "rb") as f:
+            digest.update(f.read())
+        digest.update(str(os.stat(os.path.join(encoded_dir, name, "numeric.npy")).st_mtime_ns).encode())
+    return digest.hexdigest()[:12]
+
+
+def candidate_id(params: dict, fingerprint: str) -> str:
+    payload = json.dumps({"params": params, "data": fingerprint}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def matrix_path(sweep_dir: str, fingerprint: str) -> str:
+    return os.path.join(sweep_dir, f"X_train-{fingerprint}.npy")
+
+
+def training_matrix(sweep_dir: str, encoded_dir: str, train_rows: int, fingerprint: str) -> str:
+    """
+    Writes the float32 training matrix the workers share, batch by batch. It is
+    keyed by the data fingerprint, so a sweep re-run on new splits or another
+    --train-rows builds a fresh matrix instead of reusing one that no longer
+    matches the labels.
+    """
+    path = matrix_path(sweep_dir, fingerprint)
+    if os.path.exists(path):
+        return path
+    for name in os.listdir(sweep_dir):
+        if name.startswith("X_train") and name.endswith(".npy"):
+            os.remove(os.path.join(sweep_dir, name))  # Stale matrix from other data
+    train = load_split("train", encoded_dir)
+    rows = min(train_rows or len(train), len(train))
+    tmp_path = path + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(rows, train.n_features))
+    for start in range(0, rows, 100_000):
+        out[start:start + 100_000] = train.dense(start, min(start + 100_000, rows))
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+    return path
+
+
+# ============================================================
+#  FIT (worker process)
+# ============================================================
+def fit_candidate(key: str, params: dict, sweep_dir: str, matrix_file: str, encoded_dir: str, jobs: int) -> dict:
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    X_train = np.load(matrix_file, mmap_mode="r")
+    y_train = np.asarray(load_split("train", encoded_dir).y[:len(X_train)])
+    model = RandomForestClassifier(**params, random_state=42, n_jobs=jobs)
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    # Same as the API: single-row calls never benefit from the pool
+    model.n_jobs = None
+
+    test = load_split("test", encoded_dir)
+    y_test = np.asarray(test.y)
+    y_prob = np.concatenate([model.predict_proba(X)[:, 1] for X in test.batches()])
+    y_pred = model.classes_[(y_prob > 0.5).astype(int)]
+
+    out_dir = os.path.join(sweep_dir, key)
+    os.makedirs(out_dir, exist_ok=True)
+    model_file = os.path.join(out_dir, "model.joblib")
+    joblib.dump(model, model_file)
+    result = {
+        "id": key,
+        "params": params,
+        "train_rows": len(X_train),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+        "recall": recall_score(y_test, y_pred, zero_division=0),
+        "f1": f1_score(y_test, y_pred, zero_division=0),
+        "roc_auc": roc_auc_score(y_test, y_prob) if len(np.unique(y_test)) > 1 else None,
+        "fit_seconds": fit_seconds,
+        "model_bytes": os.path.getsize(model_file),
+        "nodes": int(sum(e.tree_.node_count for e in model.estimators_)),
+        "latency": None,
+    }
+    # result.json is the checkpoint marker, so it is written last
+    _write_json(os.path.join(out_dir, "result.json"), result)
+    return result
+
+
+def _write_json(path: str, payload: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+#  LATENCY (this process, one candidate at a time)
+# ============================================================
+def measure_latency(model_file: str, sample: np.ndarray, batch: np.ndarray) -> dict:
+    started = time.perf_counter()
+    model = joblib.load(model_file)
+    load_seconds = time.perf_counter() - started
+    model.n_jobs = None
+
+    for row in sample[:10]:  # warm-up
+        model.predict_proba(row[None, :])
+    timings = []
+    for row in sample:
+        row = row[None, :]
+        started = time.perf_counter()
+        model.predict(row)
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    model.predict_proba(batch)
+    batch_seconds = time.perf_counter() - started
+    timings_ms = np.array(timings) * 1000
+    return {
+        "load_seconds": load_seconds,
+        "p50_ms": float(np.percentile(timings_ms, 50)),
+        "p99_ms": float(np.percentile(timings_ms, 99)),
+        "batch_rows_per_second": len(batch) / batch_seconds,
+    }
+
+
+def frontier(results: list) -> set:
+    """Ids no other candidate beats on both accuracy and p50 latency."""
+    best = set()
+    for r in results:
+        dominated = any(
+            o["accuracy"] >= r["accuracy"] and o["latency"]["p50_ms"] <= r["latency"]["p50_ms"]
+            and (o["accuracy"] > r["accuracy"] or o["latency"]["p50_ms"] < r["latency"]["p50_ms"])
+            for o in results
+        )
+        if not dominated:
+            best.add(r["id"])
+    return best
+
+
+def print_report(results: list, on_frontier: set):
+    print(f"\n{'id':<13}{'trees':>6}{'depth':>6}{'leaf':>5}{'feat':>7}{'acc':>8}{'f1':>8}"
+          f"{'fit s':>8}{'MB':>8}{'p50 ms':>8}{'p99 ms':>8}{'rows/s':>10}")
+    for r in sorted(results, key=lambda r: -r["accuracy"]):
+        p = r["params"]
+        lat = r["latency"]
+        print(f"{r['id']:<13}{p['n_estimators']:>6}{str(p['max_depth'] or '-'):>6}{p['min_samples_leaf']:>5}"
+              f"{str(p['max_features']):>7}{r['accuracy']:>8.4f}{r['f1']:>8.4f}{r['fit_seconds']:>8.1f}"
+              f"{r['model_bytes'] / 2**20:>8.1f}{lat['p50_ms']:>8.2f}{lat['p99_ms']:>8.2f}"
+              f"{lat['batch_rows_per_second']:>10,.0f}{'  *' if r['id'] in on_frontier else ''}")
+    print("* accuracy/latency frontier")
+
+
+# ============================================================
+#  REGISTRY
+# ============================================================
+def choose(results: list, max_latency_ms: float = None) -> dict:
+    eligible = [r for r in results if max_latency_ms is None or r["latency"]["p50_ms"] <= max_latency_ms]
+    if not eligible:
+        raise SystemExit(f"No candidate has p50 latency under {max_latency_ms} ms")
+    return max(eligible, key=lambda r: (r["accuracy"], -r["latency"]["p50_ms"]))
+
+
+def publish(result: dict, sweep_dir: str, encoded_dir: str, fingerprint: str, isolation_forest: bool,
+            promote: bool) -> str:
+    version = time.strftime("%Y%m%d-%H%M%S") + "-" + result["id"][:8]
+    path = os.path.join(REGISTRY_DIR, version)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    shutil.copy2(os.path.join(sweep_dir, result["id"], "model.joblib"), os.path.join(tmp_path, "rf_model.joblib"))
+    shutil.copy2(os.path.join(MODEL_PATH, "preprocessor.joblib"), os.path.join(tmp_path, "preprocessor.joblib"))
+    if isolation_forest:
+        from sklearn.ensemble import IsolationForest
+
+        # As in notebook 03: anomaly detector on the first half of the training rows
+        X_train = np.load(matrix_path(sweep_dir, fingerprint), mmap_mode="r")
+        iso = IsolationForest(n_estimators=100, contamination=0.1, random_state=42, n_jobs=-1)
+        iso.fit(X_train[:len(X_train) // 2])
+        joblib.dump(iso, os.path.join(tmp_path, "iso_forest.joblib"))
+    _write_json(os.path.join(tmp_path, "manifest.json"), {
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "candidate": result["id"],
+        "params": result["params"],
+        "data": {"fingerprint": fingerprint, "encoded_dir": encoded_dir, "train_rows": result["train_rows"]},
+        "metrics": {k: result[k] for k in ("accuracy", "precision", "recall", "f1", "roc_auc")},
+        "fit_seconds": result["fit_seconds"],
+        "model_bytes": result["model_bytes"],
+        "latency": result["latency"],
+    })
+    os.replace(tmp_path, path)
+    print(f"Published {path}")
+    if promote:
+        set_current(version)
+    else:
+        print(f"Serve it with MODEL_VERSION={version} or --promote")
+    return version
+
+
+def set_current(version: str):
+    tmp_path = os.path.join(REGISTRY_DIR, "CURRENT.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(REGISTRY_DIR, "CURRENT"))
+    print(f"CURRENT -> {version}")
+
+
+# ============================================================
+#  MAIN
+# ============================================================
+def run(args):
+    fingerprint = data_fingerprint(args.encoded, args.train_rows)
+    sweep_dir = os.path.join(SWEEPS_DIR, args.sweep or fingerprint)
+    os.makedirs(sweep_dir, exist_ok=True)
+    print(f"Sweep directory: {sweep_dir}")
+    matrix_file = training_matrix(sweep_dir, args.encoded, args.train_rows, fingerprint)
+
+    grid = {candidate_id(p, fingerprint): p for p in candidate_grid(args)}
+    results, pending = {}, {}
+    for key, params in grid.items():
+        checkpoint = os.path.join(sweep_dir, key, "result.json")
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                results[key] = json.load(f)
+        else:
+            pending[key] = params
+    print(f"{len(grid)} candidate(s): {len(results)} already fitted, {len(pending)} to fit "
+          f"with {args.workers} worker(s) x {args.jobs_per_fit} core(s)")
+
+    started = time.perf_counter()
+    # One fit per worker process: the forest's memory goes back to the OS after each fit
+    with ProcessPoolExecutor(max_workers=args.workers, max_tasks_per_child=1) as pool:
+        futures = {
+            pool.submit(fit_candidate, key, params, sweep_dir, matrix_file, args.encoded, args.jobs_per_fit): key
+            for key, params in pending.items()
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["id"]] = result
+            print(f"  {result['id']} {result['params']}: accuracy {result['accuracy']:.4f}, "
+                  f"fit {result['fit_seconds']:.1f}s")
+    if pending:
+        print(f"Fitted {len(pending)} candidate(s) in {time.perf_counter() - started:.1f}s")
+
+    test = load_split("test", args.encoded)
+    sample = test.dense(0, LATENCY_ROWS)
+    batch = test.dense(0, THROUGHPUT_ROWS)
+    for key in grid:
+        result = results[key]
+        if result["latency"] is None:
+            result["latency"] = measure_latency(os.path.join(sweep_dir, key, "model.joblib"), sample, batch)
+            _write_json(os.path.join(sweep_dir, key, "result.json"), result)
+
+    ranked = [results[key] for key in grid]
+    on_frontier = frontier(ranked)
+    for r in ranked:
+        r["frontier"] = r["id"] in on_frontier
+    _write_json(os.path.join(sweep_dir, "report.json"), {"fingerprint": fingerprint, "candidates": ranked})
+    print_report(ranked, on_frontier)
+
+    if args.publish:
+        chosen = choose(ranked, args.max_latency_ms)
+        publish(chosen, sweep_dir, args.encoded, fingerprint, args.isolation_forest, args.promote)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RandomForest hyperparameter sweep with checkpoints and latency report")
+    parser.add_argument("--n-estimators", type=int, nargs="+", default=[100])
+    parser.add_argument("--max-depth", type=int, nargs="+", default=[0], help="0 = unlimited")
+    parser.add_argument("--min-samples-leaf", type=int, nargs="+", default=[1])
+    parser.add_argument("--max-features", nargs="+", default=["sqrt"], help="sqrt, log2 or a fraction")
+    parser.add_argument("--train-rows", type=int, default=0, help="Fit on the first N training rows (0 = all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Candidates fitted at once")
+    parser.add_argument("--jobs-per-fit", type=int, default=1, help="Cores per forest fit")
+    parser.add_argument("--encoded", default=ENCODED_DIR, help="Encoded splits written by notebook 02")
+    parser.add_argument("--sweep", default=None, help="Sweep directory name (default: data fingerprint)")
+    parser.add_argument("--publish", action="store_true", help="Copy the chosen candidate into the model registry")
+    parser.add_argument("--max-latency-ms", type=float, default=None, help="Latency budget (p50) when publishing")
+    parser.add_argument("--isolation-forest", action="store_true", help="Also fit iso_forest.joblib when publishing")
+    parser.add_argument("--promote", action="store_true", help="Point registry/CURRENT at the published version")
+    run(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+Trains the second-stage attack category model.
+
+The binary model (rf_model.joblib) decides Attack vs Normal. This one only
+ever sees flows already flagged as attacks, so it is trained on the attack
+rows of cleaned_data.parquet (Label == 1) and predicts attack_cat: exploits,
+dos, reconnaissance, fuzzers, generic, ... It reuses preprocessor.joblib,
+so at runtime the backend encodes a flow once for both models.
+
+Usage (from the ml_engine folder, after preprocess.py and notebook 02):
+    python train_attack_category.py
+    python train_attack_category.py --data data/processed/cleaned_data.parquet --trees 100
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "models")
+DATA_FILE = os.path.join(BASE_DIR, "data", "processed", "cleaned_data.parquet")
+
+# The raw files spell one class two ways
+CATEGORY_ALIASES = {"backdoors": "backdoor"}
+
+
+def load_attack_rows(path: str):
+    """Only the attack rows are read; the filter runs inside the Parquet reader."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, filters=[("Label", "==", 1)])
+    df = table.to_pandas()
+    y = df["attack_cat"].astype(str).str.strip().str.lower().replace(CATEGORY_ALIASES)
+    X = df.drop(columns=["Label", "attack_cat"])
+    return X, y
+
+
+def train(data_path: str, trees: int, min_class_rows: int):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import classification_report
+    from sklearn.model_selection import train_test_split
+
+    print("Loading attack rows...")
+    X, y = load_attack_rows(data_path)
+    counts = y.value_counts()
+    print(counts.to_string())
+    # Classes too rare to learn are folded into "other" rather than guessed at
+    rare = counts[counts < min_class_rows].index
+    if len(rare):
+        print(f"Folding rare classes into 'other': {', '.join(rare)}")
+        y = y.where(~y.isin(rare), "other")
+
+    preprocessor = joblib.load(os.path.join(MODEL_PATH, "preprocessor.joblib"))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    X_train = preprocessor.transform(X_train).astype(np.float32)
+    X_test = preprocessor.transform(X_test).astype(np.float32)
+
+    print(f"Training category forest on {len(X_train):,} attack rows...")
+    started = time.perf_counter()
+    # balanced_subsample: DoS/Exploits/Generic dominate, the rare classes would never win a vote otherwise
+    model = RandomForestClassifier(n_estimators=trees, class_weight="balanced_subsample",
+                                   min_samples_leaf=2, random_state=42, n_jobs=-1)
+    model.fit(X_train, y_train)
+    print(f"Trained in {time.perf_counter() - started:.1f}s")
+    print(classification_report(y_test, model.predict(X_test), digits=3))
+
+    out = os.path.join(MODEL_PATH, "attack_cat_model.joblib")
+    joblib.dump(model, out, compress=3)
+    print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the attack category model on flagged (Label == 1) flows")
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--min-class-rows", type=int, default=50)
+    args = parser.parse_args()
+    train(args.data, args.trees, args.min_class_rows)